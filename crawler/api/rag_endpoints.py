@@ -1,10 +1,12 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
+import os
 import asyncpg
 from pgvector.asyncpg import register_vector
 import numpy as np
-from ..llm_provider import LLMProvider
+from ..common.llm_provider import LLMProvider
+from ..common.embedding_columns import embedding_column, embedding_search_distance
 
 app = FastAPI()
 llm_provider = LLMProvider()
@@ -46,22 +48,39 @@ async def semantic_search(request: QueryRequest):
     # Get embedding for query
     query_embedding = await llm_provider.get_embedding(request.query)
     
-    # Build SQL query
-    sql = """
-    SELECT 
-        url, title, content, metadata,
-        1 - (embedding <=> $1) as similarity
-    FROM dev_docs_site_pages
-    WHERE 1 - (embedding <=> $1) > $2
-    """
+    # Search the column that holds embeddings of the query's dimension
+    column = embedding_column(len(query_embedding))
+    
+    # Candidates come from the (optionally quantized) index and are re-ranked on the full vectors
+    quantization = os.getenv("VECTOR_QUANTIZATION") or None
+    rerank_factor = max(1, int(os.getenv("VECTOR_RERANK_FACTOR", "4")))
+    candidate_distance = embedding_search_distance(column, len(query_embedding), quantization)
     params = [query_embedding, request.threshold]
     
     # Add source filter if specified
+    source_filter = ""
     if request.sources:
-        sql += " AND metadata->>'source' = ANY($3)"
+        source_filter = "AND metadata->>'source' = ANY($3)"
         params.append(request.sources)
     
-    sql += f" ORDER BY similarity DESC LIMIT {request.limit}"
+    # Build SQL query
+    sql = f"""
+    SELECT url, title, content, metadata, similarity
+    FROM (
+        SELECT 
+            url, title, content, metadata,
+            1 - ({column} <=> $1::vector) as similarity
+        FROM (
+            SELECT url, title, content, metadata, {column}
+            FROM dev_docs_site_pages
+            WHERE {column} IS NOT NULL {source_filter}
+            ORDER BY {candidate_distance}
+            LIMIT {request.limit * rerank_factor}
+        ) candidates
+    ) reranked
+    WHERE similarity > $2
+    ORDER BY similarity DESC LIMIT {request.limit}
+    """
     
     # Execute search
     conn = await get_db_connection()
@@ -0,0 +1,133 @@
+import os
+import copy
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Process names of the browsers Playwright launches, so our own worker processes don't count
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell", "msedge", "firefox", "webkit")
+
+def session_config(config: CrawlerRunConfig, session_id: str) -> CrawlerRunConfig:
+    """Copy a run config to crawl in a leased session's browser context."""
+    leased = copy.copy(config)
+    leased.session_id = session_id
+    return leased
+
+class BrowserContextPool:
+    """Lease browser contexts of one shared browser to concurrent workers.
+
+    Each context is a crawl4ai session (its own browser context and page),
+    so workers never share a page. A context is closed and replaced after
+    max_pages_per_context pages, or as soon as the browser's processes use
+    more than max_memory_mb (needs psutil), which keeps memory steady over
+    long crawls.
+    """
+
+    def __init__(self,
+                 crawler: AsyncWebCrawler,
+                 size: Optional[int] = None,
+                 max_pages_per_context: Optional[int] = None,
+                 max_memory_mb: Optional[float] = None,
+                 memory_check_interval: float = 5.0):
+        self.crawler = crawler
+        self.size = max(1, size or int(os.getenv("BROWSER_POOL_SIZE", "4")))
+        self.max_pages_per_context = max_pages_per_context or int(os.getenv("BROWSER_CONTEXT_MAX_PAGES", "50"))
+        self.max_memory_mb = max_memory_mb or float(os.getenv("BROWSER_MAX_MEMORY_MB", "2048"))
+        self.memory_check_interval = memory_check_interval
+        if psutil is None:
+            print("psutil is not installed, browser contexts are only recycled by page count")
+
+        self.generation = itertools.count()
+        self.available: asyncio.Queue = asyncio.Queue()
+        self.pages: Dict[str, int] = {}
+        for slot in range(self.size):
+            self.available.put_nowait(self._new_session_id(slot))
+
+        self.last_memory_check = 0.0
+        self.last_memory_mb: Optional[float] = None
+        self.recycled = 0
+        self.leases = 0
+
+    def _new_session_id(self, slot: int) -> str:
+        session_id = f"pool-{slot}-{next(self.generation)}"
+        self.pages[session_id] = 0
+        return session_id
+
+    def get_browser_memory_mb(self) -> Optional[float]:
+        """Get the resident memory of the browser processes we started, in MB.
+
+        Only child processes named like a browser count, not e.g. CpuWorkerPool workers.
+        """
+        if psutil is None:
+            return None
+
+        now = time.monotonic()
+        if now - self.last_memory_check < self.memory_check_interval:
+            return self.last_memory_mb
+        self.last_memory_check = now
+
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if not any(name in child.name().lower() for name in BROWSER_PROCESS_NAMES):
+                    continue
+                total += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+        self.last_memory_mb = total / (1024 * 1024)
+        return self.last_memory_mb
+
+    async def _close_session(self, session_id: str):
+        try:
+            await self.crawler.crawler_strategy.kill_session(session_id)
+        except Exception as e:
+            print(f"Error closing browser context {session_id}: {e}")
+        self.pages.pop(session_id, None)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[str]:
+        """Hold a browser context for one page.
+
+        Yields the session_id; crawl with session_config(config, session_id).
+        """
+        session_id = await self.available.get()
+        self.leases += 1
+        try:
+            yield session_id
+        finally:
+            self.pages[session_id] += 1
+            memory_mb = self.get_browser_memory_mb()
+            over_memory = memory_mb is not None and memory_mb > self.max_memory_mb
+            if self.pages[session_id] >= self.max_pages_per_context or over_memory:
+                slot = int(session_id.split("-")[1])
+                await self._close_session(session_id)
+                session_id = self._new_session_id(slot)
+                self.recycled += 1
+                if over_memory:
+                    # Measure again before recycling another context
+                    self.last_memory_mb = None
+            self.available.put_nowait(session_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report pool size, leases, recycled contexts and browser memory."""
+        return {
+            "size": self.size,
+            "in_use": self.size - self.available.qsize(),
+            "leases": self.leases,
+            "recycled": self.recycled,
+            "browser_memory_mb": round(self.last_memory_mb, 1) if self.last_memory_mb is not None else None
+        }
+
+    async def close(self):
+        """Close every idle context. The browser itself belongs to the caller."""
+        while not self.available.empty():
+            await self._close_session(self.available.get_nowait())
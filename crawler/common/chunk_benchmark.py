@@ -0,0 +1,71 @@
+"""Micro-benchmark comparing chunk_text with the streaming iter_chunks chunker.
+
+Run from the repository root:
+    python -m crawler.common.chunk_benchmark
+"""
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List
+
+# Add src directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from crawler.common.text_processing import chunk_text, iter_chunks, estimate_tokens
+
+def build_sample_markdown(sections: int = 200) -> str:
+    """Build a synthetic docs page with headings, prose, code blocks and tables."""
+    parts = []
+    for i in range(sections):
+        parts.append(f"## Section {i}")
+        parts.append(" ".join(f"Sentence {j} of section {i} explains one more detail." for j in range(12)))
+        parts.append("```python\n" + "\n".join(f"value_{j} = compute({i}, {j})" for j in range(25)) + "\n```")
+        parts.append("| name | value |\n|------|-------|\n" + "\n".join(f"| item_{j} | {i * j} |" for j in range(10)))
+    return "\n\n".join(parts)
+
+def run_chunker(name: str, chunker: Callable[[str], List[str]], text: str, repeats: int) -> Dict[str, Any]:
+    """Time a chunker and measure its peak memory."""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = list(chunker(text))
+    elapsed = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    chunk_count = 0
+    sizes = []
+    for chunk in chunker(text):
+        chunk_count += 1
+        sizes.append(estimate_tokens(chunk))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "name": name,
+        "ms_per_run": elapsed * 1000,
+        "chunks": chunk_count,
+        "avg_tokens": sum(sizes) / len(sizes) if sizes else 0,
+        "max_tokens": max(sizes) if sizes else 0,
+        "peak_kb": peak / 1024
+    }
+
+def main():
+    text = build_sample_markdown(int(os.getenv("BENCHMARK_SECTIONS", "200")))
+    repeats = int(os.getenv("BENCHMARK_REPEATS", "20"))
+    print(f"Sample document: {len(text)} characters, ~{estimate_tokens(text)} tokens\n")
+
+    results = [
+        run_chunker("chunk_text (5000 chars)", chunk_text, text, repeats),
+        run_chunker("iter_chunks (1200 tokens)", lambda t: iter_chunks(t, max_tokens=1200, overlap_tokens=0), text, repeats),
+        run_chunker("iter_chunks (1200 tokens, 100 overlap)", lambda t: iter_chunks(t, max_tokens=1200, overlap_tokens=100), text, repeats)
+    ]
+
+    print(f"{'chunker':<42}{'ms/run':>10}{'chunks':>9}{'avg tok':>10}{'max tok':>10}{'peak KB':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<42}{result['ms_per_run']:>10.2f}{result['chunks']:>9}"
+            f"{result['avg_tokens']:>10.0f}{result['max_tokens']:>10}{result['peak_kb']:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
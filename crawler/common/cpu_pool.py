@@ -0,0 +1,86 @@
+import os
+import sys
+import copy
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+class _WorkerProcess(multiprocessing.Process):
+    """Worker process that launches with this module standing in as __main__."""
+
+    def start(self):
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            super().start()
+        finally:
+            sys.modules["__main__"] = main
+
+def _get_worker_context():
+    """Get the multiprocessing context for worker processes.
+
+    Spawned workers (the default on Windows and macOS) re-import the parent's
+    __main__ module, which for the crawler scripts loads .env and opens
+    database clients. Their processes import this side-effect free module
+    as __main__ instead.
+    """
+    context = multiprocessing.get_context()
+    if context.get_start_method() == "fork":
+        return context
+    context = copy.copy(context)
+    context.Process = _WorkerProcess
+    return context
+
+class CpuWorkerPool:
+    """Run CPU-heavy page transforms in worker processes.
+
+    Parsing, markdown conversion and chunking would otherwise block the event
+    loop that drives fetches and LLM calls. At most max_in_flight calls are
+    submitted at once, so a fast crawl can't pile up pages (and their HTML)
+    waiting for a worker. Functions must be module-level and should return
+    compact results, since arguments and results are pickled between
+    processes. With max_workers=0, functions run inline on the event loop.
+    Workers are safe to spawn as well as fork (see _get_worker_context).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_in_flight: Optional[int] = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 1)))
+        self.max_workers = max(0, max_workers)
+        self.max_in_flight = max(1, max_in_flight or int(os.getenv("CPU_MAX_IN_FLIGHT", str(max(1, self.max_workers) * 2))))
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=_get_worker_context()
+        ) if self.max_workers else None
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.in_flight = 0
+        self.completed = 0
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """Run func(*args) in a worker process once an in-flight slot is free."""
+        async with self.semaphore:
+            if self.executor is None:
+                self.completed += 1
+                return func(*args)
+            self.in_flight += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        """Report worker count, calls in flight and calls completed."""
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed
+        }
+
+    def close(self):
+        """Shut the worker processes down."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
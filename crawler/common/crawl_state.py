@@ -0,0 +1,116 @@
+import os
+import asyncio
+import hashlib
+from typing import Dict, List, Any, Optional
+from datetime import datetime, timezone
+
+from .storage import supabase
+from .sitemap import parse_lastmod
+
+# Per-URL crawl state used to skip unchanged pages on recrawls
+# (see database/crawl_state_table.sql)
+
+def get_crawl_state_table() -> str:
+    """Get the crawl state table name from environment variables."""
+    return os.getenv("CRAWL_STATE_TABLE", "crawl_state")
+
+def is_incremental_crawl() -> bool:
+    """Check whether recrawls should skip unchanged pages."""
+    return os.getenv("INCREMENTAL_CRAWL", "true").lower() == "true"
+
+def hash_content(content: str) -> str:
+    """Get the sha256 hex digest of page content."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+async def load_crawl_states(urls: List[str], batch_size: int = 200) -> Dict[str, Dict[str, Any]]:
+    """Load the stored crawl state of each URL that has one."""
+    table_name = get_crawl_state_table()
+    states = {}
+    for start in range(0, len(urls), batch_size):
+        batch = urls[start:start + batch_size]
+        try:
+            result = await asyncio.to_thread(
+                lambda: supabase.table(table_name).select("*").in_("url", batch).execute()
+            )
+            states.update({row["url"]: row for row in result.data or []})
+        except Exception as e:
+            print(f"Error loading crawl state: {e}")
+    return states
+
+async def get_crawl_state(url: str) -> Optional[Dict[str, Any]]:
+    """Load the stored crawl state of one URL."""
+    return (await load_crawl_states([url])).get(url)
+
+async def save_crawl_state(url: str,
+                           source: Optional[str],
+                           content_hash: Optional[str] = None,
+                           headers: Optional[Dict[str, str]] = None,
+                           status_code: Optional[int] = None,
+                           changed: bool = True):
+    """Record what we know about a URL after checking or crawling it."""
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    now = datetime.now(timezone.utc).isoformat()
+
+    row = {
+        "url": url,
+        "source": source,
+        "status_code": status_code,
+        "last_checked_at": now
+    }
+    # Only overwrite validators and hash when we actually have new ones
+    if headers.get("etag"):
+        row["etag"] = headers["etag"]
+    if headers.get("last-modified"):
+        row["last_modified"] = headers["last-modified"]
+    if content_hash:
+        row["content_hash"] = content_hash
+    if changed:
+        row["last_changed_at"] = now
+
+    try:
+        await asyncio.to_thread(
+            lambda: supabase.table(get_crawl_state_table()).upsert(row, on_conflict="url").execute()
+        )
+    except Exception as e:
+        print(f"Error saving crawl state for {url}: {e}")
+
+async def clear_crawl_state(source: str):
+    """Forget the crawl state of every URL of a source."""
+    try:
+        await asyncio.to_thread(
+            lambda: supabase.table(get_crawl_state_table()).delete().eq("source", source).execute()
+        )
+    except Exception as e:
+        print(f"Error clearing crawl state: {e}")
+
+def get_conditional_headers(state: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Build the validators that make a request for a URL conditional on it having changed."""
+    headers = {}
+    if state and state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state and state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    return headers
+
+def filter_changed_urls(urls: List[str],
+                        states: Dict[str, Dict[str, Any]],
+                        lastmods: Optional[Dict[str, Optional[str]]] = None) -> List[str]:
+    """Drop URLs whose sitemap lastmod is no later than their last check.
+
+    This takes no requests. The remaining URLs can be fetched with
+    get_conditional_headers, so the server tells whether they changed on the
+    same request that fetches them.
+    """
+    lastmods = lastmods or {}
+
+    def changed(url: str) -> bool:
+        state = states.get(url)
+        if not state:
+            return True
+        lastmod = parse_lastmod(lastmods.get(url))
+        last_checked = parse_lastmod(state.get("last_checked_at"))
+        return not (lastmod and last_checked and lastmod <= last_checked)
+
+    changed_urls = [url for url in urls if changed(url)]
+    print(f"Skipping {len(urls) - len(changed_urls)} URLs unchanged in the sitemap, {len(changed_urls)} to crawl")
+    return changed_urls
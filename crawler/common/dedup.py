@@ -0,0 +1,180 @@
+import os
+import re
+import sqlite3
+import hashlib
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+SIMHASH_BITS = 64
+BAND_BITS = 8
+BAND_COUNT = SIMHASH_BITS // BAND_BITS
+
+WORD = re.compile(r"\w+", re.UNICODE)
+
+def is_near_duplicate_detection() -> bool:
+    """Check whether near-duplicate pages should be skipped."""
+    return os.getenv("NEAR_DUPLICATE_DETECTION", "true").lower() == "true"
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """Get the 64-bit SimHash of a text's word shingles.
+
+    Texts that share most of their shingles get fingerprints that differ in
+    only a few bits, so near-duplicates can be found by Hamming distance.
+    """
+    words = WORD.findall(text.lower())
+    if len(words) < shingle_size:
+        shingles = Counter([" ".join(words)])
+    else:
+        shingles = Counter(" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1))
+
+    weights = [0] * SIMHASH_BITS
+    for shingle, count in shingles.items():
+        value = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += count if value >> bit & 1 else -count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+def fingerprint_text(text: str, min_words: int) -> Optional[int]:
+    """Get a page's SimHash, or None if it has fewer than min_words words."""
+    if len(WORD.findall(text)) < min_words:
+        return None
+    return simhash(text)
+
+def hamming_distance(a: int, b: int) -> int:
+    """Count the bits two fingerprints differ in."""
+    return bin(a ^ b).count("1")
+
+def _bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [fingerprint >> (band * BAND_BITS) & mask for band in range(BAND_COUNT)]
+
+def _to_signed(fingerprint: int) -> int:
+    # SQLite integers are signed 64-bit
+    return fingerprint - (1 << SIMHASH_BITS) if fingerprint >= 1 << (SIMHASH_BITS - 1) else fingerprint
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << SIMHASH_BITS) if value < 0 else value
+
+class NearDuplicateIndex:
+    """Persistent SimHash index of the pages of one source.
+
+    Each page's fingerprint is stored in SQLite, split into eight 8-bit
+    bands. Two fingerprints within 7 bits of each other share at least one
+    band, so candidates are found by band lookup and confirmed by Hamming
+    distance. Unrelated pages differ in about 32 bits, a page with a few
+    percent of its words changed in under 10. The first page seen with some
+    content is its canonical copy, and later near-duplicates are recorded
+    as links to it.
+    """
+
+    def __init__(self,
+                 source: str,
+                 path: Optional[str] = None,
+                 max_distance: Optional[int] = None,
+                 min_words: Optional[int] = None):
+        self.source = source
+        self.path = path or os.getenv("NEAR_DUPLICATE_INDEX_PATH", "data/crawler/fingerprints.sqlite")
+        self.max_distance = max_distance if max_distance is not None else int(os.getenv("NEAR_DUPLICATE_DISTANCE", "6"))
+        # The band lookup only guarantees matches up to BAND_COUNT - 1 differing bits
+        self.max_distance = min(self.max_distance, BAND_COUNT - 1)
+        self.min_words = min_words if min_words is not None else int(os.getenv("NEAR_DUPLICATE_MIN_WORDS", "50"))
+        self.stats: Dict[str, int] = {"unique": 0, "duplicates": 0, "too_short": 0}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            create table if not exists fingerprints (
+                source text not null,
+                url text not null,
+                simhash integer not null,
+                band0 integer not null,
+                band1 integer not null,
+                band2 integer not null,
+                band3 integer not null,
+                band4 integer not null,
+                band5 integer not null,
+                band6 integer not null,
+                band7 integer not null,
+                duplicate_of text,
+                updated_at text not null,
+                primary key (source, url)
+            )
+        """)
+        for band in range(BAND_COUNT):
+            self.conn.execute(
+                f"create index if not exists fingerprints_band{band}_idx on fingerprints (source, band{band})"
+            )
+        self.conn.commit()
+
+    def find_canonical(self, url: str, fingerprint: int) -> Optional[str]:
+        """Find a canonical page within max_distance bits of a fingerprint, other than url itself."""
+        bands = _bands(fingerprint)
+        rows = self.conn.execute(
+            f"""select url, simhash from fingerprints
+                where source = ? and duplicate_of is null and url != ?
+                and ({" or ".join(f"band{band} = ?" for band in range(BAND_COUNT))})""",
+            (self.source, url, *bands)
+        ).fetchall()
+
+        best_url, best_distance = None, None
+        for candidate_url, value in rows:
+            distance = hamming_distance(fingerprint, _to_unsigned(value))
+            if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                best_url, best_distance = candidate_url, distance
+        return best_url
+
+    def check(self, url: str, text: str) -> Optional[str]:
+        """Record a page's fingerprint. Returns the canonical URL if it is a near-duplicate.
+
+        Pages shorter than min_words are never treated as duplicates, since
+        short boilerplate pages look alike without sharing content.
+        """
+        return self.check_fingerprint(url, fingerprint_text(text, self.min_words))
+
+    def check_fingerprint(self, url: str, fingerprint: Optional[int]) -> Optional[str]:
+        """Like check, for a fingerprint already computed with fingerprint_text (None if too short)."""
+        if fingerprint is None:
+            self.stats["too_short"] += 1
+            return None
+
+        canonical = self.find_canonical(url, fingerprint)
+        self.conn.execute(
+            """insert or replace into fingerprints
+               (source, url, simhash, band0, band1, band2, band3, band4, band5, band6, band7, duplicate_of, updated_at)
+               values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (self.source, url, _to_signed(fingerprint), *_bands(fingerprint), canonical,
+             datetime.now(timezone.utc).isoformat())
+        )
+        self.conn.commit()
+
+        self.stats["duplicates" if canonical else "unique"] += 1
+        return canonical
+
+    def get_duplicates(self) -> Dict[str, str]:
+        """Get each duplicate URL of the source with its canonical URL."""
+        rows = self.conn.execute(
+            "select url, duplicate_of from fingerprints where source = ? and duplicate_of is not null",
+            (self.source,)
+        )
+        return dict(rows)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Report unique, duplicate and too-short pages checked."""
+        return dict(self.stats)
+
+    def reset(self):
+        """Forget every fingerprint of the source."""
+        self.conn.execute("delete from fingerprints where source = ?", (self.source,))
+        self.conn.commit()
+
+    def close(self):
+        """Close the SQLite connection."""
+        self.conn.close()
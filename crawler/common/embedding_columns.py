@@ -0,0 +1,30 @@
+from typing import Optional
+
+# Vector column names and search expressions, matching the SQL helpers in
+# database/embedding_dimensions.sql
+
+# Dimensions the vector tables have a column for
+EMBEDDING_COLUMN_DIMENSIONS = (768, 1536)
+
+def embedding_column(dimension: int) -> str:
+    """Get the table column that stores embeddings of a given dimension.
+
+    1536-dim vectors live in the original `embedding` column, every other
+    size in `embedding_<dimension>` (see database/embedding_dimensions.sql).
+    """
+    return "embedding" if dimension == 1536 else f"embedding_{dimension}"
+
+def embedding_search_distance(column: str, dimension: int, quantization: Optional[str] = None) -> str:
+    """Get the SQL distance expression used to find search candidates.
+
+    Mirrors embedding_search_distance() in database/embedding_dimensions.sql.
+    $1 is the query embedding. With 'halfvec' or 'binary' quantization the
+    expression matches the compact index from database/quantized_embeddings.sql.
+    """
+    if not quantization or quantization == "none":
+        return f"({column} <=> $1::vector)"
+    if quantization == "halfvec":
+        return f"({column}::halfvec({dimension}) <=> $1::vector::halfvec({dimension}))"
+    if quantization == "binary":
+        return f"(binary_quantize({column})::bit({dimension}) <~> binary_quantize($1::vector))"
+    raise ValueError(f"Unknown quantization: {quantization}")
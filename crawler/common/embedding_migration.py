@@ -0,0 +1,118 @@
+"""Move padded 1536-dim embeddings into native-dimension columns.
+
+Older crawls stored 768-dim nomic-embed-text vectors padded (or repeated) to
+1536 dimensions. Their first 768 values are the real embedding, so this tool
+copies that prefix into the embedding_768 column, clears the padded copy and
+builds the index for the new column.
+
+Run database/embedding_dimensions.sql first, then from the repository root:
+    python -m crawler.common.embedding_migration
+Afterwards re-run the match_* function definitions from database/*_table.sql.
+
+Configuration (environment variables):
+    EMBEDDING_MIGRATION_TABLES       comma-separated tables (default: all vector tables)
+    EMBEDDING_MIGRATION_MODEL        embedding_model value of rows to move (default: nomic-embed-text)
+    EMBEDDING_MIGRATION_DIMENSION    native dimension of that model (default: 768)
+    EMBEDDING_MIGRATION_BATCH_SIZE   rows updated per statement (default: 1000)
+    EMBEDDING_MIGRATION_KEEP_LEGACY  keep the padded 1536-dim copy (default: false)
+"""
+import os
+import sys
+import asyncio
+from typing import List
+
+# Add src directory to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import asyncpg
+from dotenv import load_dotenv
+
+from crawler.api.config import config
+from crawler.common.embedding_columns import embedding_column
+
+load_dotenv(override=True)
+
+VECTOR_TABLES = [
+    "dev_docs_site_pages",
+    "repo_content",
+    "media_content",
+    "messages",
+    "social_posts",
+    "social_comments",
+    "social_articles"
+]
+
+async def migrate_table(conn: asyncpg.Connection, table: str, model: str, dimension: int, batch_size: int, keep_legacy: bool) -> int:
+    """Copy one table's padded embeddings into its native-dimension column. Returns rows moved."""
+    column = embedding_column(dimension)
+
+    await conn.execute(f'alter table {table} add column if not exists {column} vector({dimension})')
+    await conn.execute(f'alter table {table} alter column embedding drop not null')
+
+    clear_legacy = "" if keep_legacy else ", embedding = null"
+    moved = 0
+    while True:
+        # Batches keep each transaction and its row locks short
+        status = await conn.execute(f"""
+            with batch as (
+                select id from {table}
+                where embedding is not null and {column} is null and embedding_model = $1
+                limit $2
+            )
+            update {table}
+            set {column} = ((embedding::real[])[1:{dimension}])::vector({dimension}){clear_legacy}
+            from batch
+            where {table}.id = batch.id
+        """, model, batch_size)
+        updated = int(status.split()[-1])
+        moved += updated
+        if updated:
+            print(f"  {table}: moved {moved} rows")
+        if updated < batch_size:
+            break
+
+    await conn.execute(
+        f'create index if not exists idx_{table}_{column} on {table} using ivfflat ({column} vector_cosine_ops)'
+    )
+
+    # Drop the 1536-dim index once nothing is left in the legacy column
+    remaining = await conn.fetchval(f'select count(*) from {table} where embedding is not null')
+    if remaining == 0:
+        await conn.execute(f'drop index if exists {table}_embedding_idx')
+        print(f"  {table}: legacy embedding column is empty, dropped its index")
+
+    return moved
+
+async def main():
+    tables: List[str] = [
+        t.strip() for t in os.getenv("EMBEDDING_MIGRATION_TABLES", ",".join(VECTOR_TABLES)).split(",") if t.strip()
+    ]
+    model = os.getenv("EMBEDDING_MIGRATION_MODEL", "nomic-embed-text")
+    dimension = int(os.getenv("EMBEDDING_MIGRATION_DIMENSION", "768"))
+    batch_size = int(os.getenv("EMBEDDING_MIGRATION_BATCH_SIZE", "1000"))
+    keep_legacy = os.getenv("EMBEDDING_MIGRATION_KEEP_LEGACY", "").lower() == "true"
+
+    print(f"Moving {model} embeddings to {embedding_column(dimension)} in: {', '.join(tables)}")
+
+    conn = await asyncpg.connect(
+        host=config.database.host,
+        port=config.database.port,
+        database=config.database.database,
+        user=config.database.user,
+        password=config.database.password
+    )
+    try:
+        for table in tables:
+            try:
+                moved = await migrate_table(conn, table, model, dimension, batch_size, keep_legacy)
+                print(f"{table}: {moved} rows migrated")
+            except Exception as e:
+                print(f"Error migrating {table}: {e}")
+    finally:
+        await conn.close()
+
+    print("\nDone. Re-run the match_* function definitions from database/*_table.sql,")
+    print("then VACUUM the migrated tables to reclaim the space of the padded vectors.")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from crawl4ai import AsyncWebCrawler, CrawlerRunConfig
+
+from .politeness import get_user_agent
+from .browser_pool import BrowserContextPool, session_config
+from .html_parsing import convert_html, get_link_hrefs
+from .cpu_pool import CpuWorkerPool
+
+# Sent when CRAWLER_USER_AGENT is unset, since many sites refuse httpx's default agent
+BROWSER_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+@dataclass
+class FetchResult:
+    """Outcome of fetching one page, over HTTP or through the browser."""
+    url: str
+    success: bool
+    markdown: str = ""
+    html: str = ""
+    status_code: Optional[int] = None
+    response_headers: Dict[str, str] = field(default_factory=dict)
+    error_message: Optional[str] = None
+    rendered: bool = False  # True if the browser produced it
+    links: Optional[List[str]] = None  # hrefs already extracted from the page, if any
+    title: str = ""  # Set on the HTTP path, from the same parse as links and markdown
+
+class HttpFirstFetcher:
+    """Fetch pages over plain HTTP and render in the browser only when needed.
+
+    Static pages are fetched through a pooled httpx client and converted to
+    markdown in-process. A page goes to the browser when its HTML looks like
+    a client-side rendered shell (see find_js_shell_reason), is not HTML or
+    text, is refused with a status bot protection uses (BROWSER_RETRY_STATUSES),
+    or the HTTP fetch fails outright. With cpu_pool, the HTML checks
+    and markdown conversion run in its worker processes.
+    """
+
+    # Often sent to non-browser clients only, so the browser may still get the page
+    BROWSER_RETRY_STATUSES = {401, 403, 429}
+
+    def __init__(self,
+                 enabled: Optional[bool] = None,
+                 max_connections: Optional[int] = None,
+                 min_text_length: Optional[int] = None,
+                 timeout: float = 30.0,
+                 cpu_pool: Optional[CpuWorkerPool] = None):
+        if enabled is None:
+            enabled = os.getenv("HTTP_FIRST_FETCH", "true").lower() == "true"
+        self.enabled = enabled
+        self.max_connections = max_connections or int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+        self.min_text_length = min_text_length if min_text_length is not None else int(os.getenv("JS_SHELL_MIN_TEXT_LENGTH", "200"))
+        self.client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections
+            ),
+            # Identify as the agent robots.txt rules are matched against, when one is set
+            headers={"User-Agent": get_user_agent() if get_user_agent() != "*" else BROWSER_USER_AGENT}
+        )
+        self.cpu_pool = cpu_pool
+        self.stats: Dict[str, Any] = {"http": 0, "browser": 0, "fallback_reasons": {}}
+
+    async def fetch_http(self, url: str, validators: Optional[Dict[str, str]] = None) -> Tuple[Optional[FetchResult], str]:
+        """Fetch a page over HTTP, conditionally if validators are given.
+
+        Returns (result, final_url), where final_url is the URL after
+        redirects. result is None when the page needs the browser instead.
+        A page unchanged since validators were issued comes back with status
+        304 and no content.
+        """
+        try:
+            response = await self.client.get(url, headers=validators)
+        except Exception as e:
+            return self._needs_browser(f"http error: {type(e).__name__}"), url
+
+        headers = dict(response.headers)
+        final_url = str(response.url)
+        if response.status_code == 304:
+            return FetchResult(
+                url=final_url,
+                success=False,
+                status_code=response.status_code,
+                response_headers=headers,
+                error_message="Not modified"
+            ), final_url
+        if response.status_code in self.BROWSER_RETRY_STATUSES:
+            return self._needs_browser(f"HTTP {response.status_code}"), final_url
+        if response.status_code >= 400:
+            # The browser would get the same answer
+            return FetchResult(
+                url=final_url,
+                success=False,
+                status_code=response.status_code,
+                response_headers=headers,
+                error_message=f"HTTP {response.status_code}"
+            ), final_url
+
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in ("text/markdown", "text/x-markdown", "text/plain"):
+            return FetchResult(url=final_url, success=True, markdown=response.text,
+                               status_code=response.status_code, response_headers=headers), final_url
+        if content_type not in ("text/html", "application/xhtml+xml"):
+            return self._needs_browser(f"content type {content_type or 'unknown'}"), final_url
+
+        html = response.text
+        if self.cpu_pool:
+            reason, page = await self.cpu_pool.run(convert_html, html, final_url, self.min_text_length)
+        else:
+            reason, page = convert_html(html, final_url, self.min_text_length)
+        if reason:
+            return self._needs_browser(reason), final_url
+
+        return FetchResult(
+            url=final_url,
+            success=True,
+            markdown=page.markdown,
+            html=html,
+            status_code=response.status_code,
+            response_headers=headers,
+            links=page.links,
+            title=page.title
+        ), final_url
+
+    def _needs_browser(self, reason: str) -> None:
+        reasons = self.stats["fallback_reasons"]
+        reasons[reason] = reasons.get(reason, 0) + 1
+        return None
+
+    async def fetch_browser(self,
+                            url: str,
+                            crawler: AsyncWebCrawler,
+                            config: CrawlerRunConfig,
+                            pool: Optional[BrowserContextPool] = None,
+                            **arun_kwargs) -> FetchResult:
+        """Render a page in the browser, in a context leased from pool if given.
+
+        crawl4ai doesn't report where redirects led, so pass the final URL
+        when it is known (fetch does, from the HTTP attempt).
+        """
+        if pool:
+            async with pool.lease() as session_id:
+                result = await crawler.arun(url=url, config=session_config(config, session_id), **arun_kwargs)
+        else:
+            result = await crawler.arun(url=url, config=config, **arun_kwargs)
+        markdown_v2 = getattr(result, "markdown_v2", None)
+        return FetchResult(
+            url=url,
+            success=result.success,
+            markdown=(markdown_v2.raw_markdown if markdown_v2 else result.markdown) or "",
+            html=result.html or "",
+            status_code=getattr(result, "status_code", None),
+            response_headers=getattr(result, "response_headers", None) or {},
+            error_message=result.error_message,
+            rendered=True,
+            links=get_link_hrefs(getattr(result, "links", None))
+        )
+
+    async def fetch(self,
+                    url: str,
+                    crawler: AsyncWebCrawler,
+                    config: CrawlerRunConfig,
+                    pool: Optional[BrowserContextPool] = None,
+                    validators: Optional[Dict[str, str]] = None,
+                    **arun_kwargs) -> FetchResult:
+        """Fetch a page over HTTP, falling back to the browser for JavaScript-rendered pages.
+
+        The browser renders the URL the HTTP redirects ended at, so the result's
+        url is the final one on both paths. With validators (see
+        get_conditional_headers), the HTTP request is conditional and an
+        unchanged page returns a 304 result without reaching the browser, even
+        when HTTP-first fetching is disabled.
+        """
+        if self.enabled or validators:
+            result, url = await self.fetch_http(url, validators)
+            if result is not None and (self.enabled or result.status_code == 304):
+                self.stats["http"] += 1
+                return result
+
+        self.stats["browser"] += 1
+        return await self.fetch_browser(url, crawler, config, pool, **arun_kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report how many pages took the HTTP path and why others needed the browser."""
+        return {
+            "http": self.stats["http"],
+            "browser": self.stats["browser"],
+            "fallback_reasons": dict(self.stats["fallback_reasons"])
+        }
+
+    async def close(self):
+        """Close the HTTP connection pool."""
+        await self.client.aclose()
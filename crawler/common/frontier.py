@@ -0,0 +1,235 @@
+import os
+import sqlite3
+import asyncio
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+class CrawlFrontier:
+    """Disk-backed crawl frontier.
+
+    Every URL a crawl discovers is stored in SQLite with its state
+    (queued, in_flight, done or failed), attempt count and discovery depth,
+    keyed by a crawl id so several crawls can share one file. A crawl that
+    stops midway picks up where it left off: URLs still in flight when it
+    stopped go back to the queue, done URLs are never fetched again.
+    """
+
+    def __init__(self, crawl_id: str, path: Optional[str] = None, max_attempts: int = 3):
+        self.crawl_id = crawl_id
+        self.path = path or os.getenv("CRAWL_FRONTIER_PATH", "data/crawler/frontier.sqlite")
+        self.max_attempts = max_attempts
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            create table if not exists frontier (
+                crawl_id text not null,
+                url text not null,
+                state text not null,
+                depth integer not null default 0,
+                attempts integer not null default 0,
+                last_error text,
+                updated_at text not null,
+                primary key (crawl_id, url)
+            )
+        """)
+        self.conn.execute("create index if not exists frontier_queue_idx on frontier (crawl_id, state, depth)")
+        self.conn.commit()
+
+        # URLs left in flight by a crash or Ctrl-C are queued again
+        self._set_state_where(IN_FLIGHT, QUEUED)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _set_state_where(self, old_state: str, new_state: str, reset_attempts: bool = False) -> int:
+        attempts = ", attempts = 0" if reset_attempts else ""
+        cursor = self.conn.execute(
+            f"update frontier set state = ?, updated_at = ?{attempts} where crawl_id = ? and state = ?",
+            (new_state, self._now(), self.crawl_id, old_state)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def start(self, resume: bool = True, retry_failed: bool = False):
+        """Prepare for a run: resume an unfinished crawl or start over.
+
+        A crawl that ran out of queued URLs starts over, unless retry_failed
+        is set, in which case only its failed URLs are crawled again.
+        """
+        counts = self.get_counts()
+        if retry_failed:
+            print(f"Retrying {self.retry_failed()} failed URLs")
+        elif not resume or (counts[QUEUED] == 0 and counts[DONE] + counts[FAILED] > 0):
+            self.reset()
+        elif counts[QUEUED]:
+            print(f"Resuming crawl: {counts[DONE]} done, {counts[QUEUED]} queued, {counts[FAILED]} failed")
+
+    def add(self, url: str, depth: int = 0) -> bool:
+        """Queue a URL unless the crawl has already seen it. Returns True if it was new."""
+        return self.add_many([url], depth) == 1
+
+    def add_many(self, urls: Iterable[str], depth: int = 0, state: str = QUEUED) -> int:
+        """Queue every URL the crawl hasn't seen yet. Returns how many were new.
+
+        Pass state=DONE to record URLs that shouldn't be crawled even when linked.
+        """
+        now = self._now()
+        cursor = self.conn.executemany(
+            "insert or ignore into frontier (crawl_id, url, state, depth, updated_at) values (?, ?, ?, ?, ?)",
+            [(self.crawl_id, url, state, depth, now) for url in urls]
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def next(self) -> Optional[Tuple[str, int]]:
+        """Claim the next queued URL, shallowest first. Returns (url, depth) or None."""
+        row = self.conn.execute(
+            "select url, depth from frontier where crawl_id = ? and state = ? order by depth, rowid limit 1",
+            (self.crawl_id, QUEUED)
+        ).fetchone()
+        if row is None:
+            return None
+
+        self.conn.execute(
+            "update frontier set state = ?, attempts = attempts + 1, updated_at = ? where crawl_id = ? and url = ?",
+            (IN_FLIGHT, self._now(), self.crawl_id, row[0])
+        )
+        self.conn.commit()
+        return row[0], row[1]
+
+    def mark_done(self, url: str):
+        """Record that a URL was crawled successfully."""
+        self.conn.execute(
+            "update frontier set state = ?, last_error = null, updated_at = ? where crawl_id = ? and url = ?",
+            (DONE, self._now(), self.crawl_id, url)
+        )
+        self.conn.commit()
+
+    def mark_failed(self, url: str, error: str, retry: bool = True) -> bool:
+        """Record a failed attempt. The URL is queued again until it runs out of attempts,
+        unless retry is False.
+
+        Returns True if the URL will be retried.
+        """
+        row = self.conn.execute(
+            "select attempts from frontier where crawl_id = ? and url = ?",
+            (self.crawl_id, url)
+        ).fetchone()
+        retry = retry and row is not None and row[0] < self.max_attempts
+
+        self.conn.execute(
+            "update frontier set state = ?, last_error = ?, updated_at = ? where crawl_id = ? and url = ?",
+            (QUEUED if retry else FAILED, error, self._now(), self.crawl_id, url)
+        )
+        self.conn.commit()
+        return retry
+
+    def retry_failed(self) -> int:
+        """Queue every failed URL again with a fresh attempt count. Returns how many."""
+        return self._set_state_where(FAILED, QUEUED, reset_attempts=True)
+
+    def reset(self):
+        """Forget everything about this crawl."""
+        self.conn.execute("delete from frontier where crawl_id = ?", (self.crawl_id,))
+        self.conn.commit()
+
+    def get_state(self, url: str) -> Optional[str]:
+        """Get a URL's state, or None if the crawl hasn't seen it."""
+        row = self.conn.execute(
+            "select state from frontier where crawl_id = ? and url = ?",
+            (self.crawl_id, url)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_counts(self) -> Dict[str, int]:
+        """Get the number of URLs in each state."""
+        counts = {QUEUED: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        for state, count in self.conn.execute(
+            "select state, count(*) from frontier where crawl_id = ? group by state",
+            (self.crawl_id,)
+        ):
+            counts[state] = count
+        return counts
+
+    def get_urls(self, state: Optional[str] = None) -> List[str]:
+        """Get every URL of the crawl, or only those in one state."""
+        if state:
+            rows = self.conn.execute(
+                "select url from frontier where crawl_id = ? and state = ?",
+                (self.crawl_id, state)
+            )
+        else:
+            rows = self.conn.execute("select url from frontier where crawl_id = ?", (self.crawl_id,))
+        return [row[0] for row in rows]
+
+    def get_failed(self) -> Dict[str, str]:
+        """Get each failed URL with its last error."""
+        rows = self.conn.execute(
+            "select url, last_error from frontier where crawl_id = ? and state = ?",
+            (self.crawl_id, FAILED)
+        )
+        return {url: error or "" for url, error in rows}
+
+    def close(self):
+        """Close the SQLite connection."""
+        self.conn.close()
+
+async def run_frontier_workers(frontier: CrawlFrontier,
+                               crawl_page: Callable[[str, int], Awaitable[bool]],
+                               workers: int,
+                               max_pages: Optional[int] = None,
+                               pages_done: int = 0) -> int:
+    """Crawl a frontier's queued URLs with several workers until none are left.
+
+    crawl_page(url, depth) crawls one claimed URL, records its outcome in the
+    frontier and queues the links it finds. It returns True if the page counts
+    as crawled. A worker that finds the queue empty waits while other pages are
+    in progress, since they may still queue links. With max_pages, the crawl
+    stops once pages_done plus this run's crawled pages reach it; pages in
+    progress hold their slot until they finish. Returns the pages done in total.
+    """
+    in_progress = 0
+    # Woken whenever a page finishes, since it may have queued new links
+    page_finished = asyncio.Condition()
+
+    async def worker():
+        nonlocal pages_done, in_progress
+        while True:
+            async with page_finished:
+                if max_pages is not None and pages_done + in_progress >= max_pages:
+                    if in_progress == 0:
+                        return
+                    await page_finished.wait()
+                    continue
+
+                next_url = frontier.next()
+                if next_url is None:
+                    # Nothing queued; done unless another worker may still find links
+                    if in_progress == 0:
+                        return
+                    await page_finished.wait()
+                    continue
+                in_progress += 1
+
+            url, depth = next_url
+            success = False
+            try:
+                success = await crawl_page(url, depth)
+            finally:
+                async with page_finished:
+                    in_progress -= 1
+                    if success:
+                        pages_done += 1
+                    page_finished.notify_all()
+
+    await asyncio.gather(*[worker() for _ in range(max(1, workers))])
+    return pages_done
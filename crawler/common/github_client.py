@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import tarfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+JSON_ACCEPT = "application/vnd.github+json"
+RAW_ACCEPT = "application/vnd.github.raw+json"
+
+def iter_archive_files(archive: BinaryIO, max_file_bytes: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """Yield (path, content) for each text file of a repository tarball.
+    
+    The tarball is read as a stream, so only one file is decompressed at a
+    time. Binary files and files over max_file_bytes are skipped.
+    """
+    max_file_bytes = max_file_bytes or int(os.getenv("REPO_MAX_FILE_BYTES", "1000000"))
+    with tarfile.open(fileobj=archive, mode="r|gz") as tar:
+        for member in tar:
+            if not member.isfile() or member.size > max_file_bytes:
+                continue
+            # Member names start with the archive's "<owner>-<repo>-<sha>/" directory
+            file_path = member.name.split("/", 1)[-1]
+            data = tar.extractfile(member).read()
+            if b"\0" in data:
+                continue
+            try:
+                yield file_path, data.decode("utf-8")
+            except UnicodeDecodeError:
+                continue
+
+class GitHubClient:
+    """Concurrent GitHub REST client that stays inside the API rate limit.
+
+    At most concurrency requests run at once. Every response's
+    X-RateLimit-* headers update the known quota: once fewer than slowdown
+    of the hourly limit is left, request starts are spread over the rest of
+    the window, and at reserve requests left, new requests wait for the
+    reset. Secondary rate limits (403/429 with Retry-After) are waited out
+    and retried. Conditional GETs send the ETag of the last response for the
+    same URL, kept in SQLite across runs, and a 304 (which GitHub doesn't
+    count against the limit) returns the stored body.
+    """
+
+    def __init__(self,
+                 token: Optional[str] = None,
+                 concurrency: Optional[int] = None,
+                 reserve: Optional[int] = None,
+                 slowdown: float = 0.1,
+                 cache_path: Optional[str] = None,
+                 max_retries: int = 3):
+        self.concurrency = max(1, concurrency or int(os.getenv("GITHUB_CONCURRENCY", "8")))
+        self.reserve = reserve if reserve is not None else int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50"))
+        self.slowdown = slowdown
+        self.max_retries = max_retries
+        token = token or os.getenv("GITHUB_TOKEN")
+        self.client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=30.0,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            headers={"Authorization": f"token {token}"} if token else None
+        )
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.lock = asyncio.Lock()
+
+        # Quota from the latest response, unknown until the first one
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.next_request_at = 0.0
+        self.stats: Dict[str, float] = {"requests": 0, "not_modified": 0, "retries": 0, "waited_seconds": 0.0}
+
+        self.cache_path = cache_path or os.getenv("GITHUB_ETAG_CACHE_PATH", "data/crawler/github_etags.sqlite")
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.cache_path)
+        self.conn.execute("""
+            create table if not exists etags (
+                key text primary key,
+                etag text not null,
+                body blob not null,
+                updated_at text not null
+            )
+        """)
+        self.conn.commit()
+
+    async def _wait(self, seconds: float):
+        self.stats["waited_seconds"] += seconds
+        await asyncio.sleep(seconds)
+
+    async def _wait_for_quota(self, count: bool = True):
+        """Wait until the quota allows another request to start.
+
+        With count, the request is subtracted from the known quota right away.
+        Conditional requests aren't, since a 304 doesn't use quota.
+        """
+        async with self.lock:
+            now = time.time()
+            if self.remaining is not None and self.remaining <= self.reserve and self.reset_at and self.reset_at > now:
+                # Hold every request until the window resets
+                wait = self.reset_at - now + 1
+                print(f"GitHub rate limit nearly used ({self.remaining} left), waiting {wait:.0f}s for the reset")
+                await self._wait(wait)
+                self.remaining = None
+                now = time.time()
+
+            start_at = max(now, self.next_request_at)
+            interval = 0.0
+            if self.remaining is not None and self.limit and self.reset_at and self.remaining < self.limit * self.slowdown:
+                # Spread what is left over the rest of the window, which ends the spacing
+                start_at = max(now, min(start_at, self.reset_at))
+                interval = max(0.0, self.reset_at - now) / max(1, self.remaining - self.reserve)
+            self.next_request_at = start_at + interval
+            if count and self.remaining is not None:
+                # Count the request before its response arrives, so concurrent requests see it
+                self.remaining -= 1
+        if start_at > now:
+            await self._wait(start_at - now)
+
+    def _update_quota(self, response: httpx.Response):
+        headers = response.headers
+        if "x-ratelimit-remaining" not in headers:
+            return
+        try:
+            limit = int(headers.get("x-ratelimit-limit", self.limit or 0)) or None
+            remaining = int(headers["x-ratelimit-remaining"])
+            reset_at = float(headers.get("x-ratelimit-reset", self.reset_at or 0)) or None
+        except ValueError:
+            return
+        if self.remaining is not None and reset_at == self.reset_at:
+            # Responses arrive out of order; keep counting requests started since
+            remaining = min(remaining, self.remaining)
+        self.limit, self.remaining, self.reset_at = limit, remaining, reset_at
+
+    def _get_retry_wait(self, response: httpx.Response) -> Optional[float]:
+        """Get how long to wait before retrying a rate-limited response, or None if it wasn't."""
+        if response.status_code not in (403, 429):
+            return None
+        retry_after = response.headers.get("retry-after", "")
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        if response.headers.get("x-ratelimit-remaining") == "0" and self.reset_at:
+            return max(1.0, self.reset_at - time.time() + 1)
+        if response.status_code == 429:
+            return 60.0
+        return None
+
+    async def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """Send one request within the quota, waiting out and retrying rate-limit responses."""
+        conditional = bool(headers) and "If-None-Match" in headers
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_quota(count=not conditional)
+            async with self.semaphore:
+                response = await self.client.request(method, url, headers=headers)
+            self.stats["requests"] += 1
+            self._update_quota(response)
+
+            wait = self._get_retry_wait(response)
+            if wait is None or attempt == self.max_retries:
+                return response
+            self.stats["retries"] += 1
+            print(f"GitHub rate limited {url} (status {response.status_code}), retrying in {wait:.0f}s")
+            await self._wait(wait)
+        return response
+
+    async def get(self, url: str, accept: str = JSON_ACCEPT, conditional: bool = True) -> bytes:
+        """GET a URL's body, raising httpx.HTTPStatusError on errors.
+
+        With conditional, the stored ETag is sent and a 304 returns the stored body.
+        """
+        key = f"{accept} {url}"
+        headers = {"Accept": accept}
+        cached = None
+        if conditional:
+            cached = self.conn.execute("select etag, body from etags where key = ?", (key,)).fetchone()
+            if cached:
+                headers["If-None-Match"] = cached[0]
+
+        response = await self.request("GET", url, headers)
+        if response.status_code == 304 and cached:
+            self.stats["not_modified"] += 1
+            return cached[1]
+        response.raise_for_status()
+
+        etag = response.headers.get("etag")
+        if conditional and etag:
+            self.conn.execute(
+                "insert or replace into etags (key, etag, body, updated_at) values (?, ?, ?, ?)",
+                (key, etag, response.content, datetime.now(timezone.utc).isoformat())
+            )
+            self.conn.commit()
+        return response.content
+
+    async def get_json(self, url: str) -> Any:
+        """GET a URL's JSON body with a conditional request."""
+        return json.loads(await self.get(url))
+
+    async def get_tree(self, owner: str, repo: str, tree_sha: str, recursive: bool = True) -> Dict[str, Any]:
+        """Get one git tree of a repository, by branch name or tree SHA."""
+        api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}"
+        if recursive:
+            api_url += "?recursive=1"
+        return await self.get_json(api_url)
+
+    async def walk_tree(self, owner: str, repo: str, tree_sha: str, prefix: str = "") -> List[Dict[str, Any]]:
+        """Get every blob under a tree, with paths relative to the repository root.
+
+        A recursive listing that GitHub truncates is replaced by a listing of the
+        tree's own entries, and each subtree is walked on its own.
+        """
+        data = await self.get_tree(owner, repo, tree_sha)
+        if not data.get("truncated", False):
+            return [
+                dict(item, path=prefix + item["path"])
+                for item in data["tree"] if item["type"] == "blob"
+            ]
+
+        print(f"Tree {prefix or '/'} was truncated, walking its subtrees")
+        blobs = []
+        for item in (await self.get_tree(owner, repo, tree_sha, recursive=False))["tree"]:
+            if item["type"] == "blob":
+                blobs.append(dict(item, path=prefix + item["path"]))
+            elif item["type"] == "tree":
+                blobs.extend(await self.walk_tree(owner, repo, item["sha"], f"{prefix}{item['path']}/"))
+        return blobs
+
+    @asynccontextmanager
+    async def stream(self, url: str, timeout: float = 300.0) -> AsyncIterator[httpx.Response]:
+        """Stream a large download, like a repository archive, within the quota."""
+        await self._wait_for_quota()
+        async with self.semaphore:
+            async with self.client.stream("GET", url, timeout=timeout) as response:
+                self.stats["requests"] += 1
+                self._update_quota(response)
+                response.raise_for_status()
+                yield response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report requests sent, 304s, retries, waiting time summed over requests and the known quota."""
+        return {
+            "requests": self.stats["requests"],
+            "not_modified": self.stats["not_modified"],
+            "retries": self.stats["retries"],
+            "waited_seconds": round(self.stats["waited_seconds"], 1),
+            "remaining": self.remaining,
+            "limit": self.limit
+        }
+
+    async def close(self):
+        """Close the HTTP connection pool and the ETag cache."""
+        await self.client.aclose()
+        self.conn.close()
@@ -0,0 +1,201 @@
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import lxml.html
+from lxml.etree import ParserError
+
+from .urls import canonicalize_url
+from .dedup import fingerprint_text
+from .text_processing import split_chunks
+
+WHITESPACE = re.compile(r"\s+")
+
+# Tags that never hold page text
+NON_CONTENT_TAGS = ("script", "style", "noscript", "template", "svg", "iframe")
+
+# Phrases sites put in <noscript> when the page is rendered client-side
+NOSCRIPT_WARNING = re.compile(r"enable javascript|javascript (is )?(required|disabled)|requires javascript", re.I)
+
+# Mount points of common client-side frameworks
+APP_ROOT_IDS = ("root", "app", "__next", "__nuxt", "___gatsby", "svelte")
+
+@dataclass
+class ParsedPage:
+    """Title, text and links of one page."""
+    title: str = ""
+    text: str = ""
+    links: List[str] = field(default_factory=list)
+    markdown: str = ""  # Set by convert_html
+    fingerprint: Optional[int] = None  # SimHash, set by transform_page
+    chunks: List[str] = field(default_factory=list)  # Set by transform_page
+
+def clean_text(text: str) -> str:
+    """Collapse all whitespace to single spaces."""
+    return WHITESPACE.sub(" ", text).strip()
+
+def get_link_hrefs(links: Optional[Dict[str, List[Dict[str, Any]]]]) -> Optional[List[str]]:
+    """Get the hrefs of a crawl4ai result's links, or None if it has none."""
+    if not links:
+        return None
+    return [
+        link["href"] for kind in ("internal", "external")
+        for link in links.get(kind) or [] if link.get("href")
+    ]
+
+def _parse_document(html: str):
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input that declares an XML encoding
+        return lxml.html.document_fromstring(html.encode("utf-8"))
+
+def _parse_root(html: str):
+    if not html or not html.strip():
+        return None
+    try:
+        return _parse_document(html)
+    except ParserError:
+        return None
+
+def _get_title(root) -> str:
+    title = clean_text(root.findtext(".//title") or "")
+    if not title:
+        h1 = root.find(".//h1")
+        if h1 is not None:
+            title = clean_text(h1.text_content())
+    return title
+
+def _get_links(root, page_url: str, links: Optional[Iterable[str]] = None) -> List[str]:
+    if links is None:
+        links = root.xpath("//a/@href") if root is not None else []
+    page_links = []
+    seen = set()
+    for href in links:
+        href = href.strip()
+        if not href or href.startswith("#"):
+            continue
+        try:
+            url = canonicalize_url(href, page_url)
+        except ValueError:
+            continue
+        if url.startswith(("http://", "https://")) and url not in seen:
+            seen.add(url)
+            page_links.append(url)
+    return page_links
+
+def _drop_tags(root, tags: Iterable[str]):
+    for element in root.xpath(" | ".join(f"//{tag}" for tag in tags)):
+        element.drop_tree()
+
+def _get_body_text(root) -> str:
+    body = root.find("body")
+    return clean_text(" ".join((body if body is not None else root).itertext()))
+
+def parse_html(html: str,
+               page_url: str,
+               markdown: Optional[str] = None,
+               links: Optional[Iterable[str]] = None) -> ParsedPage:
+    """Read a page's title, text and links from a single lxml parse of its HTML.
+
+    The text is taken from markdown when given, otherwise from the HTML body
+    without scripts and styles. Links someone already extracted (like
+    crawl4ai's result.links) are used instead of reading them again. Links
+    are resolved against page_url and canonicalized, and only http(s) links
+    are kept.
+    """
+    root = _parse_root(html)
+    title = _get_title(root) if root is not None else ""
+    page_links = _get_links(root, page_url, links)
+
+    if markdown:
+        text = clean_text(markdown)
+    elif root is not None:
+        _drop_tags(root, NON_CONTENT_TAGS)
+        text = _get_body_text(root)
+    else:
+        text = ""
+
+    return ParsedPage(title=title, text=text, links=page_links)
+
+def find_js_shell_reason(root, min_text_length: int) -> Optional[str]:
+    """Check whether a page's HTML is an empty shell that needs JavaScript to render.
+
+    Expects an lxml document with scripts and styles already removed, except
+    <noscript>. Returns why the page looks like a shell, or None if it looks
+    complete.
+    """
+    for noscript in root.iter("noscript"):
+        if NOSCRIPT_WARNING.search(noscript.text_content()):
+            return "noscript warning"
+
+    main = root.find(".//main")
+    if main is None:
+        main = next(iter(root.xpath("//*[@role='main']")), None)
+    if main is not None and not main.text_content().strip():
+        return "empty main"
+
+    for root_id in APP_ROOT_IDS:
+        app_root = next(iter(root.xpath("//*[@id=$id]", id=root_id)), None)
+        if app_root is not None and not app_root.text_content().strip():
+            return f"empty #{root_id}"
+
+    text_length = len(_get_body_text(root))
+    if text_length < min_text_length:
+        return f"only {text_length} characters of text"
+
+    return None
+
+# Created on first use, once per worker process
+_markdown_generator = None
+
+def html_to_markdown(html: str, url: str) -> str:
+    """Convert a page's HTML to markdown without the browser."""
+    global _markdown_generator
+    if _markdown_generator is None:
+        # Imported here so parsing alone doesn't load crawl4ai into every worker
+        from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+        _markdown_generator = DefaultMarkdownGenerator()
+    return _markdown_generator.generate_markdown(html, base_url=url).raw_markdown
+
+def convert_html(html: str, page_url: str, min_text_length: int) -> Tuple[Optional[str], ParsedPage]:
+    """Check fetched HTML for a JavaScript shell and convert it to markdown.
+
+    The HTML is parsed once with lxml, and that tree gives the page's title,
+    links, shell check and the cleaned HTML the markdown is generated from.
+    Returns (reason, empty page) when the page needs the browser, else
+    (None, page) with title, text, links and markdown set. Only strings
+    cross the process boundary, so this can run in a CpuWorkerPool.
+    """
+    root = _parse_root(html)
+    if root is None:
+        return "empty document", ParsedPage()
+
+    title = _get_title(root)
+    links = _get_links(root, page_url)
+    _drop_tags(root, [name for name in NON_CONTENT_TAGS if name != "noscript"])
+    reason = find_js_shell_reason(root, min_text_length)
+    if reason:
+        return reason, ParsedPage()
+
+    _drop_tags(root, ["noscript"])
+    markdown = html_to_markdown(lxml.html.tostring(root, encoding="unicode"), page_url)
+    return None, ParsedPage(title=title, text=_get_body_text(root), links=links, markdown=markdown)
+
+def transform_page(html: str,
+                   page_url: str,
+                   markdown: Optional[str] = None,
+                   links: Optional[Iterable[str]] = None,
+                   min_words: Optional[int] = None) -> ParsedPage:
+    """Parse a page and prepare it for storage, in one call for a CpuWorkerPool.
+
+    On top of parse_html, fingerprints the page for near-duplicate detection
+    (unless min_words is None) and splits its markdown (or text, without
+    markdown) into chunks with iter_chunks. Only these results go back to the
+    caller, not the parsed document.
+    """
+    page = parse_html(html, page_url, markdown, links)
+    if min_words is not None:
+        page.fingerprint = fingerprint_text(markdown or page.text, min_words)
+    page.chunks = split_chunks(markdown or page.text)
+    return page
@@ -0,0 +1,118 @@
+import os
+import json
+import sqlite3
+import hashlib
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+class LLMCache:
+    """Content-addressed cache for LLM results.
+
+    Entries are keyed by (kind, model, sha256(text)) and stored in SQLite,
+    with an in-memory LRU in front so repeated lookups skip the disk.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_entries: Optional[int] = None):
+        self.path = path or os.getenv("LLM_CACHE_PATH", "data/crawler/llm_cache.sqlite")
+        self.max_memory_entries = max_memory_entries or int(os.getenv("LLM_CACHE_MEMORY_SIZE", "10000"))
+        self.memory: "OrderedDict[Tuple[str, str, str], Any]" = OrderedDict()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("""
+            create table if not exists llm_cache (
+                kind text not null,
+                model text not null,
+                content_hash text not null,
+                value text not null,
+                created_at text not null,
+                primary key (kind, model, content_hash)
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Get the sha256 hex digest of a text."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _count(self, kind: str, outcome: str):
+        kind_stats = self.stats.setdefault(kind, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        kind_stats[outcome] += 1
+
+    def _remember(self, key: Tuple[str, str, str], value: Any):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, kind: str, model: str, text: str) -> Optional[Any]:
+        """Get a cached value, or None on a miss."""
+        key = (kind, model, self.hash_text(text))
+
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self._count(kind, "memory_hits")
+            return self.memory[key]
+
+        try:
+            row = self.conn.execute(
+                "select value from llm_cache where kind = ? and model = ? and content_hash = ?",
+                key
+            ).fetchone()
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            row = None
+
+        if row is None:
+            self._count(kind, "misses")
+            return None
+
+        value = json.loads(row[0])
+        self._remember(key, value)
+        self._count(kind, "disk_hits")
+        return value
+
+    def set(self, kind: str, model: str, text: str, value: Any):
+        """Store a value in memory and on disk."""
+        self.set_many(kind, model, [(text, value)])
+
+    def set_many(self, kind: str, model: str, items: Iterable[Tuple[str, Any]]):
+        """Store (text, value) pairs in memory and on disk, with a single commit."""
+        created_at = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for text, value in items:
+            key = (kind, model, self.hash_text(text))
+            self._remember(key, value)
+            rows.append((*key, json.dumps(value), created_at))
+        if not rows:
+            return
+
+        try:
+            self.conn.executemany(
+                "insert or replace into llm_cache (kind, model, content_hash, value, created_at) values (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get hit/miss counts and hit rate per kind of cached result."""
+        report = {}
+        for kind, kind_stats in self.stats.items():
+            lookups = sum(kind_stats.values())
+            hits = kind_stats["memory_hits"] + kind_stats["disk_hits"]
+            report[kind] = {
+                **kind_stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+            }
+        return report
+
+    def close(self):
+        """Close the SQLite connection."""
+        self.conn.close()
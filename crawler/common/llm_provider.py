@@ -4,9 +4,11 @@ from dotenv import load_dotenv
 import httpx
 from openai import AsyncOpenAI
 from dataclasses import dataclass
-import asyncio
 import json
 
+from .llm_cache import LLMCache
+from .embedding_columns import EMBEDDING_COLUMN_DIMENSIONS, embedding_column
+
 # Load environment variables first
 load_dotenv(override=True)
 
@@ -14,6 +16,16 @@ load_dotenv(override=True)
 if os.getenv("ANTHROPIC_API_KEY"):
     from anthropic import AsyncAnthropic
 
+# Native output dimensions of embedding models the vector tables have a column for.
+# Other models are asked for one embedding at startup to learn their dimension,
+# unless OLLAMA_EMBEDDING_DIMENSION is set. Sizes without a column need an
+# embedding_<dims> column first (see database/embedding_dimensions.sql).
+EMBEDDING_MODEL_DIMENSIONS = {
+    "nomic-embed-text": 768,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536
+}
+
 @dataclass
 class LLMResponse:
     content: str
@@ -32,7 +44,35 @@ class LLMProvider:
         self.LLM_MODEL = os.getenv("OLLAMA_PREFERRED_LLM_MODEL", "llama3.1:latest")
         self.EMBEDDING_MODEL = os.getenv("OLLAMA_PREFERRED_EMBEDDING_MODEL", "nomic-embed-text")
         self.llm_provider = "ollama"
-        self.embedding_provider = "nomic-embed-text"
+        self.embedding_provider = self.EMBEDDING_MODEL
+        dimension = os.getenv("OLLAMA_EMBEDDING_DIMENSION") or EMBEDDING_MODEL_DIMENSIONS.get(self.EMBEDDING_MODEL.split(":")[0])
+        self.EMBEDDING_DIMENSION = int(dimension) if dimension else self._probe_embedding_dimension()
+        if self.EMBEDDING_DIMENSION not in EMBEDDING_COLUMN_DIMENSIONS:
+            print(f"Warning: {self.EMBEDDING_MODEL} embeddings have {self.EMBEDDING_DIMENSION} dimensions, "
+                  f"storing them needs an {embedding_column(self.EMBEDDING_DIMENSION)} column")
+        # Cached embeddings are only valid for the same model and dimension
+        self.embedding_cache_model = f"{self.EMBEDDING_MODEL}/{self.EMBEDDING_DIMENSION}"
+        self.EMBEDDING_BATCH_SIZE = max(1, int(os.getenv("OLLAMA_EMBEDDING_BATCH_SIZE", "32")))
+        self.STRUCTURED_TITLE_SUMMARY = os.getenv("OLLAMA_STRUCTURED_TITLE_SUMMARY", "true").lower() == "true"
+        self.cache = LLMCache() if os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true" else None
+
+    def _probe_embedding_dimension(self) -> int:
+        """Learn the embedding model's dimension from a single embedding request."""
+        try:
+            response = httpx.post(
+                f"{self.OLLAMA_BASE_URL}/api/embed",
+                json={"model": self.EMBEDDING_MODEL, "input": ["dimension probe"]},
+                timeout=30.0
+            )
+            response.raise_for_status()
+            dimension = len(response.json()["embeddings"][0])
+        except Exception as e:
+            raise ValueError(
+                f"Unknown embedding dimension of {self.EMBEDDING_MODEL} and asking Ollama failed ({e}). "
+                f"Set OLLAMA_EMBEDDING_DIMENSION."
+            ) from e
+        print(f"{self.EMBEDDING_MODEL} returns {dimension}-dimensional embeddings")
+        return dimension
 
     async def get_completion(self, prompt: str, system_prompt: Optional[str] = None) -> LLMResponse:
         """Get a completion from Ollama."""
@@ -70,6 +110,67 @@ class LLMProvider:
             return LLMResponse(content="", metadata={})
 
     async def get_title_and_summary(self, chunk: str, url: str) -> Dict[str, str]:
+        """Extract title and summary, using one JSON-format request when enabled."""
+        if self.cache:
+            cached = self.cache.get("title_summary", self.LLM_MODEL, chunk)
+            if cached:
+                return cached
+        
+        extracted = None
+        if self.STRUCTURED_TITLE_SUMMARY:
+            extracted = await self.get_structured_title_and_summary(chunk)
+            if not extracted:
+                print(f"Falling back to separate title and summary requests for {url}")
+        
+        if not extracted:
+            extracted = await self.get_separate_title_and_summary(chunk)
+        
+        # Don't cache error placeholders so they get retried on the next crawl
+        if self.cache and not any(value.startswith("Error processing") for value in extracted.values()):
+            self.cache.set("title_summary", self.LLM_MODEL, chunk, extracted)
+        
+        return extracted
+
+    async def get_structured_title_and_summary(self, chunk: str) -> Optional[Dict[str, str]]:
+        """Get title and summary from a single Ollama request using JSON output.
+        
+        Returns None if the request fails or the response can't be parsed.
+        """
+        prompt = """Create a brief, descriptive title (3-10 words) and a brief summary (10-20 words) for this content.
+        Respond with ONLY a JSON object of the form {"title": "...", "summary": "..."}."""
+        
+        try:
+            response = await self.ollama_client.post(
+                f"{self.OLLAMA_BASE_URL}/api/generate",
+                json={
+                    "model": self.LLM_MODEL,
+                    "prompt": f"{prompt}\n\nContent:\n{chunk[:1000]}...",
+                    "stream": False,
+                    "format": "json",
+                    "options": {
+                        "temperature": 0.1
+                    }
+                },
+                timeout=30.0
+            )
+            response.raise_for_status()
+            result = json.loads(response.json()['response'])
+            
+            title = str(result.get("title", "")).strip()
+            summary = str(result.get("summary", "")).strip()
+            if not title or not summary:
+                print(f"Incomplete title/summary in response: {result}")
+                return None
+                
+            return {
+                "title": title,
+                "summary": summary
+            }
+        except Exception as e:
+            print(f"Error getting structured title and summary: {e}")
+            return None
+
+    async def get_separate_title_and_summary(self, chunk: str) -> Dict[str, str]:
         """Extract title and summary using separate Ollama requests."""
         
         async def get_title() -> str:
@@ -124,16 +225,33 @@ class LLMProvider:
                 print(f"Error getting summary: {e}")
                 return "Error processing summary"
 
-        # Get title and summary in parallel
-        title, summary = await asyncio.gather(get_title(), get_summary())
+        # One after the other, since the caller holds a single scheduler slot
+        title = await get_title()
+        summary = await get_summary()
         
         return {
             "title": title,
             "summary": summary
         }
 
+    def _check_embedding(self, embedding: List[float]) -> List[float]:
+        """Make sure an embedding has the model's native dimension.
+        
+        A vector of another length is not reshaped, since a truncated or
+        padded embedding is meaningless. It raises ValueError, so the text
+        gets the zero vector that marks a failed embedding.
+        """
+        if len(embedding) != self.EMBEDDING_DIMENSION:
+            raise ValueError(f"Expected {self.EMBEDDING_DIMENSION} dimensions from {self.EMBEDDING_MODEL}, got {len(embedding)}")
+        return embedding
+
     async def get_embedding(self, text: str) -> List[float]:
         """Get embedding vector from Ollama."""
+        if self.cache:
+            cached = self.cache.get("embedding", self.embedding_cache_model, text)
+            if cached:
+                return cached
+        
         try:
             response = await self.ollama_client.post(
                 f"{self.OLLAMA_BASE_URL}/api/embeddings",
@@ -150,23 +268,78 @@ class LLMProvider:
             embedding = data["embedding"]
             print(f"Successfully generated embedding of length: {len(embedding)}")
             
-            # Pad if needed
-            if len(embedding) < 1536:
-                embedding.extend([0] * (1536 - len(embedding)))
-                
-            return embedding[:1536]  # Truncate if longer
+            embedding = self._check_embedding(embedding)
+            if self.cache:
+                self.cache.set("embedding", self.embedding_cache_model, text, embedding)
+            return embedding
         except Exception as e:
             print(f"Error getting embedding: {e}")
-            return [0] * 1536  # Return zero vector on error
+            return [0] * self.EMBEDDING_DIMENSION  # Return zero vector on error
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embedding vectors for several texts using Ollama's batch embed endpoint.
+        
+        Texts are sent in batches of OLLAMA_EMBEDDING_BATCH_SIZE. If a batch
+        fails, its texts fall back to one get_embedding call each. Requests
+        are sent one at a time, so a call of at most one batch never has more
+        than one request in flight.
+        """
+        batch_size = self.EMBEDDING_BATCH_SIZE
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        
+        # Only texts missing from the cache are sent to Ollama
+        missing = []
+        for i, text in enumerate(texts):
+            cached = self.cache.get("embedding", self.embedding_cache_model, text) if self.cache else None
+            if cached:
+                embeddings[i] = cached
+            else:
+                missing.append(i)
+        
+        for start in range(0, len(missing), batch_size):
+            batch_indexes = missing[start:start + batch_size]
+            batch = [texts[i] for i in batch_indexes]
+            try:
+                response = await self.ollama_client.post(
+                    f"{self.OLLAMA_BASE_URL}/api/embed",
+                    json={"model": self.EMBEDDING_MODEL, "input": batch},
+                    timeout=30.0 + 5.0 * len(batch)
+                )
+                response.raise_for_status()
+                data = response.json()
+                
+                if len(data.get('embeddings', [])) != len(batch):
+                    raise ValueError(f"Expected {len(batch)} embeddings in response, got: {list(data.keys())}")
+                
+                print(f"Successfully generated {len(batch)} embeddings in one batch")
+                for i, embedding in zip(batch_indexes, data["embeddings"]):
+                    embeddings[i] = self._check_embedding(embedding)
+                if self.cache:
+                    self.cache.set_many("embedding", self.embedding_cache_model,
+                                        [(texts[i], embeddings[i]) for i in batch_indexes])
+            except Exception as e:
+                print(f"Error getting batch embeddings, falling back to single requests: {e}")
+                for i, text in zip(batch_indexes, batch):
+                    embeddings[i] = await self.get_embedding(text)
+        
+        return embeddings
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get hit/miss stats for the LLM result cache."""
+        return self.cache.get_stats() if self.cache else {}
 
     async def close(self):
-        """Close the Ollama client."""
+        """Close the Ollama client and the LLM result cache."""
         await self.ollama_client.aclose()
+        if self.cache:
+            print(f"LLM cache stats: {self.get_cache_stats()}")
+            self.cache.close()
 
     def get_metadata(self) -> Dict[str, Any]:
         """Get metadata about the provider and models being used."""
         return {
             "llm_provider": self.llm_provider,
             "llm_model": self.LLM_MODEL,
-            "embedding_provider": self.embedding_provider
+            "embedding_provider": self.embedding_provider,
+            "embedding_dimension": self.EMBEDDING_DIMENSION
         } 
\ No newline at end of file
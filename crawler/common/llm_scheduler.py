@@ -0,0 +1,74 @@
+import os
+import heapq
+import asyncio
+import itertools
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+class LLMScheduler:
+    """Bound the number of LLM requests in flight across all crawlers.
+
+    Requests over the limit wait in a queue and are started by priority
+    (lower first), then in arrival order.
+    """
+
+    DEFAULT_PRIORITIES = {
+        "embedding": 0,
+        "title_summary": 1,
+        "completion": 2
+    }
+
+    def __init__(self, max_concurrent: Optional[int] = None, priorities: Optional[Dict[str, int]] = None):
+        self.max_concurrent = max(1, max_concurrent or int(os.getenv("LLM_MAX_CONCURRENT_REQUESTS", "4")))
+        self.priorities = {**self.DEFAULT_PRIORITIES, **(priorities or {})}
+        self.active = 0
+        self.waiting: List[Tuple[int, int, asyncio.Future]] = []
+        self.waiting_by_kind: Dict[str, int] = {}
+        self.completed_by_kind: Dict[str, int] = {}
+        self.sequence = itertools.count()
+
+    async def _acquire(self, kind: str):
+        if self.active < self.max_concurrent and not self.waiting:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        priority = self.priorities.get(kind, max(self.priorities.values()) + 1)
+        heapq.heappush(self.waiting, (priority, next(self.sequence), future))
+        self.waiting_by_kind[kind] = self.waiting_by_kind.get(kind, 0) + 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # A slot handed to us just before cancellation must be passed on
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self.waiting_by_kind[kind] -= 1
+
+    def _release(self):
+        # Hand the slot straight to the next live waiter, or free it
+        while self.waiting:
+            _, _, future = heapq.heappop(self.waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    async def run(self, kind: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """Run an LLM request once a slot is free."""
+        await self._acquire(kind)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._release()
+            self.completed_by_kind[kind] = self.completed_by_kind.get(kind, 0) + 1
+
+    def get_queue_depth(self) -> Dict[str, Any]:
+        """Report in-flight and queued requests."""
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "waiting": sum(self.waiting_by_kind.values()),
+            "waiting_by_kind": {kind: count for kind, count in self.waiting_by_kind.items() if count},
+            "completed_by_kind": dict(self.completed_by_kind)
+        }
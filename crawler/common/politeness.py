@@ -0,0 +1,198 @@
+import os
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import httpx
+
+def get_user_agent() -> str:
+    """Get the user agent robots.txt rules are matched against."""
+    return os.getenv("CRAWLER_USER_AGENT", "*")
+
+def get_host(url: str) -> str:
+    """Get the scheme and host of a URL, the unit politeness rules apply to."""
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}".lower()
+
+class RobotsCache:
+    """Fetch and cache robots.txt per host.
+
+    A missing robots.txt (404) allows everything. 401/403 disallow
+    everything. Network errors and 5xx allow everything but are cached for
+    a shorter time so the file is retried soon.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, user_agent: Optional[str] = None):
+        self.ttl = ttl or float(os.getenv("ROBOTS_CACHE_TTL", "3600"))
+        self.user_agent = user_agent or get_user_agent()
+        self.parsers: Dict[str, RobotFileParser] = {}
+        self.expires: Dict[str, float] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _round_crawl_delays(lines: List[str]) -> List[str]:
+        # RobotFileParser ignores fractional Crawl-delay values, round them up instead
+        rounded = []
+        for line in lines:
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "crawl-delay":
+                try:
+                    line = f"Crawl-delay: {math.ceil(float(value.split('#')[0].strip()))}"
+                except ValueError:
+                    pass
+            rounded.append(line)
+        return rounded
+
+    async def _fetch(self, host: str) -> RobotFileParser:
+        parser = RobotFileParser(f"{host}/robots.txt")
+        ttl = self.ttl
+        try:
+            async with httpx.AsyncClient(follow_redirects=True, timeout=15.0) as client:
+                response = await client.get(f"{host}/robots.txt", headers={"User-Agent": self.user_agent})
+            if response.status_code in (401, 403):
+                parser.disallow_all = True
+            elif response.status_code >= 500:
+                parser.allow_all = True
+                ttl = min(ttl, 300)
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(self._round_crawl_delays(response.text.splitlines()))
+        except Exception as e:
+            print(f"Error fetching robots.txt for {host}: {e}")
+            parser.allow_all = True
+            ttl = min(ttl, 300)
+
+        self.expires[host] = time.monotonic() + ttl
+        return parser
+
+    async def get(self, url: str) -> RobotFileParser:
+        """Get the parsed robots.txt of a URL's host."""
+        host = get_host(url)
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            if host not in self.parsers or time.monotonic() >= self.expires[host]:
+                self.parsers[host] = await self._fetch(host)
+        return self.parsers[host]
+
+    async def can_fetch(self, url: str) -> bool:
+        """Check a URL against its host's Allow/Disallow rules."""
+        return (await self.get(url)).can_fetch(self.user_agent, url)
+
+    async def get_crawl_delay(self, url: str) -> Optional[float]:
+        """Get the host's Crawl-delay for our user agent, if it sets one."""
+        delay = (await self.get(url)).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+    async def get_sitemaps(self, url: str) -> List[str]:
+        """Get the Sitemap URLs a host lists in robots.txt."""
+        return (await self.get(url)).site_maps() or []
+
+@dataclass
+class HostState:
+    semaphore: asyncio.Semaphore
+    delay: float
+    next_request_at: float = 0.0
+    crawl_delay: Optional[float] = None
+    throttled: int = 0
+    requests: int = 0
+
+class PolitenessScheduler:
+    """Space out requests per host while crawling many hosts at once.
+
+    Each host gets its own concurrency limit and minimum interval between
+    request starts. The interval is the larger of the configured delay and
+    the host's robots.txt Crawl-delay. It doubles on 429/503 (or follows
+    Retry-After) and eases back after successful responses. Hosts don't
+    wait on each other.
+    """
+
+    SLOWDOWN_STATUSES = (429, 503)
+
+    def __init__(self,
+                 per_host_concurrency: Optional[int] = None,
+                 delay: Optional[float] = None,
+                 max_delay: Optional[float] = None,
+                 robots: Optional[RobotsCache] = None,
+                 respect_robots: Optional[bool] = None):
+        self.per_host_concurrency = max(1, per_host_concurrency or int(os.getenv("PER_HOST_CONCURRENCY", "2")))
+        self.delay = delay if delay is not None else float(os.getenv("PER_HOST_DELAY", "0.5"))
+        self.max_delay = max_delay or float(os.getenv("PER_HOST_MAX_DELAY", "60"))
+        if respect_robots is None:
+            respect_robots = os.getenv("RESPECT_ROBOTS_TXT", "true").lower() == "true"
+        self.respect_robots = respect_robots
+        self.robots = robots or RobotsCache()
+        self.hosts: Dict[str, HostState] = {}
+
+    async def _get_host_state(self, url: str) -> HostState:
+        host = get_host(url)
+        if host not in self.hosts:
+            crawl_delay = await self.robots.get_crawl_delay(url) if self.respect_robots else None
+            # Another task may have created it while we read robots.txt
+            if host not in self.hosts:
+                self.hosts[host] = HostState(
+                    semaphore=asyncio.Semaphore(self.per_host_concurrency),
+                    delay=max(self.delay, crawl_delay or 0.0),
+                    crawl_delay=crawl_delay
+                )
+        return self.hosts[host]
+
+    async def is_allowed(self, url: str) -> bool:
+        """Check whether robots.txt lets us fetch a URL."""
+        if not self.respect_robots:
+            return True
+        return await self.robots.can_fetch(url)
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """Hold one of the host's request slots, starting no sooner than its delay allows."""
+        state = await self._get_host_state(url)
+        async with state.semaphore:
+            # Reserve a start time before sleeping so concurrent waiters space out
+            now = time.monotonic()
+            start_at = max(now, state.next_request_at)
+            state.next_request_at = start_at + state.delay
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            state.requests += 1
+            yield
+
+    def report(self, url: str, status_code: Optional[int], headers: Optional[Dict[str, str]] = None):
+        """Adapt a host's delay to the status (and Retry-After header) of a response from it."""
+        state = self.hosts.get(get_host(url))
+        if state is None or status_code is None:
+            return
+        retry_after = {key.lower(): value for key, value in (headers or {}).items()}.get("retry-after")
+
+        base_delay = max(self.delay, state.crawl_delay or 0.0)
+        if status_code in self.SLOWDOWN_STATUSES:
+            state.throttled += 1
+            delay = min(self.max_delay, max(state.delay * 2, base_delay, 1.0))
+            if retry_after and retry_after.strip().isdigit():
+                wait = min(self.max_delay, float(retry_after))
+                delay = max(delay, wait)
+                # Hold every request to this host until Retry-After has passed
+                state.next_request_at = max(state.next_request_at, time.monotonic() + wait)
+            if delay > state.delay:
+                print(f"{get_host(url)} answered {status_code}, slowing down to one request per {delay:.1f}s")
+            state.delay = delay
+        elif status_code < 400:
+            # Ease back towards the base delay after each success
+            state.delay = max(base_delay, state.delay * 0.9)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Report the current delay, request and throttle counts per host."""
+        return {
+            host: {
+                "delay": round(state.delay, 2),
+                "crawl_delay": state.crawl_delay,
+                "requests": state.requests,
+                "throttled": state.throttled
+            }
+            for host, state in self.hosts.items()
+        }
@@ -1,31 +1,39 @@
 import os
-from typing import Dict, List, Any
+import asyncio
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 from .llm_provider import LLMProvider
+from .llm_cache import LLMCache
+from .llm_scheduler import LLMScheduler
 from .text_processing import ProcessedChunk
 
+# Shared by every crawler in the process
+llm_scheduler = LLMScheduler()
+
 async def get_title_and_summary(chunk: str, url: str, source_name: str, llm_provider: LLMProvider) -> Dict[str, str]:
     """Extract title and summary using the configured LLM provider."""
     try:
         # Use the LLMProvider's built-in method
-        return await llm_provider.get_title_and_summary(chunk, url)
+        return await llm_scheduler.run("title_summary", llm_provider.get_title_and_summary, chunk, url)
             
     except Exception as e:
         print(f"Error getting title and summary: {e}")
         return {"title": "Error processing title", "summary": "Error processing summary"}
 
-async def process_chunk(chunk: str, chunk_number: int, url: str, llm_provider: LLMProvider, metadata: Dict[str, Any] = None) -> ProcessedChunk:
-    """Process a single chunk of text."""
-    # Get title and summary using the local function
-    source_name = os.getenv("CURRENT_SOURCE_NAME", "unknown")
-    extracted = await get_title_and_summary(chunk, url, source_name, llm_provider)
-    
-    # Get embedding and model name
-    embedding = await llm_provider.get_embedding(chunk)
-    embedding_model = llm_provider.embedding_provider
+def has_processing_errors(title: Optional[str], summary: Optional[str], embedding: Optional[List[float]]) -> bool:
+    """Check whether a chunk holds the placeholders a failed LLM call leaves behind.
     
+    Failed title and summary requests leave "Error processing ..." text, and a
+    failed embedding request leaves a zero vector.
+    """
+    if any((value or "").startswith("Error processing") for value in (title, summary)):
+        return True
+    return not embedding or not any(embedding)
+
+def build_processed_chunk(chunk: str, chunk_number: int, url: str, extracted: Dict[str, str], embedding: List[float], llm_provider: LLMProvider, metadata: Dict[str, Any] = None) -> ProcessedChunk:
+    """Assemble a ProcessedChunk from its generated title, summary and embedding."""
     # Get provider metadata
     provider_metadata = llm_provider.get_metadata()
     
@@ -54,5 +62,86 @@ async def process_chunk(chunk: str, chunk_number: int, url: str, llm_provider: L
         document_crawl_date=datetime.now(timezone.utc).isoformat(),
         metadata=base_metadata,
         embedding=embedding,
-        embedding_model=embedding_model
-    ) 
\ No newline at end of file
+        embedding_model=llm_provider.EMBEDDING_MODEL
+    )
+
+async def process_chunk(chunk: str, chunk_number: int, url: str, llm_provider: LLMProvider, metadata: Dict[str, Any] = None) -> ProcessedChunk:
+    """Process a single chunk of text."""
+    # Get title and summary using the local function
+    source_name = os.getenv("CURRENT_SOURCE_NAME", "unknown")
+    extracted = await get_title_and_summary(chunk, url, source_name, llm_provider)
+    
+    # Get embedding
+    embedding = await llm_scheduler.run("embedding", llm_provider.get_embedding, chunk)
+    
+    return build_processed_chunk(chunk, chunk_number, url, extracted, embedding, llm_provider, metadata)
+
+async def process_chunks(chunks: List[str], url: str, llm_provider: LLMProvider, metadata: Dict[str, Any] = None, chunk_numbers: Optional[List[int]] = None) -> List[ProcessedChunk]:
+    """Process all chunks of a document, embedding them in batches.
+    
+    Chunks are numbered from 0 unless chunk_numbers is given.
+    """
+    chunk_numbers = chunk_numbers if chunk_numbers is not None else list(range(len(chunks)))
+    source_name = os.getenv("CURRENT_SOURCE_NAME", "unknown")
+    
+    # Titles and summaries are still generated per chunk, embeddings in batches.
+    # Each batch is one Ollama request, so each takes its own scheduler slot.
+    batch_size = llm_provider.EMBEDDING_BATCH_SIZE
+    batches = [chunks[start:start + batch_size] for start in range(0, len(chunks), batch_size)]
+    extracted_list, embedding_batches = await asyncio.gather(
+        asyncio.gather(*[get_title_and_summary(chunk, url, source_name, llm_provider) for chunk in chunks]),
+        asyncio.gather(*[llm_scheduler.run("embedding", llm_provider.get_embeddings, batch) for batch in batches])
+    )
+    embeddings = [embedding for batch in embedding_batches for embedding in batch]
+    
+    return [
+        build_processed_chunk(chunk, chunk_number, url, extracted, embedding, llm_provider, metadata)
+        for chunk_number, chunk, extracted, embedding in zip(chunk_numbers, chunks, extracted_list, embeddings)
+    ]
+
+async def process_changed_chunks(chunks: List[str], url: str, llm_provider: LLMProvider, stored_rows: List[Dict[str, Any]], metadata: Dict[str, Any] = None) -> List[ProcessedChunk]:
+    """Process only the chunks of a document that differ from its stored rows.
+    
+    Chunks whose content is already stored under the same chunk number are left
+    out entirely. Chunks whose content is stored under another number reuse that
+    row's title, summary and embedding. Everything else goes to the LLM,
+    including chunks whose stored row holds the placeholders of a failed LLM
+    call. Returns the chunks that need to be stored.
+    """
+    # Only rows embedded with the current model, without LLM errors, can be reused
+    reusable = [
+        row for row in stored_rows
+        if row.get("embedding_model") == llm_provider.EMBEDDING_MODEL
+        and not has_processing_errors(row.get("title"), row.get("summary"), row.get("embedding"))
+    ]
+    stored_by_number = {row["chunk_number"]: row for row in reusable}
+    stored_by_hash = {LLMCache.hash_text(row["content"]): row for row in reusable}
+    
+    reused: List[ProcessedChunk] = []
+    changed: List[Tuple[int, str]] = []
+    unchanged = 0
+    for chunk_number, chunk in enumerate(chunks):
+        same_slot = stored_by_number.get(chunk_number)
+        if same_slot and same_slot["content"] == chunk:
+            unchanged += 1
+            continue
+            
+        moved = stored_by_hash.get(LLMCache.hash_text(chunk))
+        if moved:
+            extracted = {"title": moved["title"], "summary": moved["summary"]}
+            reused.append(build_processed_chunk(chunk, chunk_number, url, extracted, moved["embedding"], llm_provider, metadata))
+        else:
+            changed.append((chunk_number, chunk))
+    
+    print(f"{url}: {unchanged} chunks unchanged, {len(reused)} moved, {len(changed)} new or changed")
+    if not changed:
+        return reused
+        
+    processed = await process_chunks(
+        [chunk for _, chunk in changed],
+        url,
+        llm_provider,
+        metadata,
+        chunk_numbers=[chunk_number for chunk_number, _ in changed]
+    )
+    return sorted(reused + processed, key=lambda processed_chunk: processed_chunk.chunk_number)
\ No newline at end of file
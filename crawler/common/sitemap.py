@@ -0,0 +1,156 @@
+import os
+import zlib
+import asyncio
+from xml.etree import ElementTree
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional, Set, Tuple
+
+import httpx
+
+@dataclass
+class SitemapEntry:
+    url: str
+    lastmod: Optional[str] = None
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a sitemap <lastmod> (W3C datetime) into a UTC datetime, or None if it can't be read.
+
+    A bare date means some time that day, so it is read as the end of the day.
+    Times without a zone are taken as UTC.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        if len(value) == 10:
+            return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from a tag."""
+    return tag.rsplit('}', 1)[-1]
+
+async def _iter_sitemap_file(client: httpx.AsyncClient, sitemap_url: str) -> AsyncIterator[Tuple[str, str, Optional[str]]]:
+    """Stream one sitemap file, yielding (kind, loc, lastmod) per entry.
+
+    kind is "url" for pages of a <urlset> and "sitemap" for children of a
+    <sitemapindex>. The file is parsed as it downloads and each entry is
+    dropped from the tree once read, so memory stays flat however large
+    the sitemap is. Gzipped sitemaps are detected by their magic bytes.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    decompressor = None
+    root = None
+    first_chunk = True
+
+    def read_entries():
+        nonlocal root
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                continue
+
+            tag = _local_name(elem.tag)
+            if tag not in ("url", "sitemap"):
+                continue
+
+            loc = lastmod = None
+            for child in elem:
+                name = _local_name(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip() or None
+
+            # Drop the entry so the tree never holds more than one
+            elem.clear()
+            root.clear()
+
+            if loc:
+                yield tag, loc, lastmod
+
+    async with client.stream("GET", sitemap_url) as response:
+        response.raise_for_status()
+        async for data in response.aiter_bytes():
+            if not data:
+                continue
+            if first_chunk:
+                first_chunk = False
+                # httpx already undoes Content-Encoding, so this is a .xml.gz file
+                if data[:2] == b"\x1f\x8b":
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if decompressor:
+                data = decompressor.decompress(data)
+            parser.feed(data)
+            for entry in read_entries():
+                yield entry
+
+        if decompressor:
+            parser.feed(decompressor.flush())
+        parser.close()
+        for entry in read_entries():
+            yield entry
+
+async def iter_sitemap(sitemap_url: str,
+                       max_concurrent: Optional[int] = None,
+                       max_depth: Optional[int] = None,
+                       queue_size: int = 1000) -> AsyncIterator[SitemapEntry]:
+    """Yield every page URL of a sitemap with its lastmod.
+
+    Children of a <sitemapindex> are fetched concurrently and recursively,
+    up to max_depth levels of nesting. Entries are yielded as they are
+    parsed, through a bounded queue so a slow consumer holds back the
+    downloads instead of buffering the whole site.
+    """
+    max_concurrent = max_concurrent or int(os.getenv("SITEMAP_CONCURRENCY", "5"))
+    max_depth = max_depth if max_depth is not None else int(os.getenv("SITEMAP_MAX_DEPTH", "3"))
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    seen_sitemaps: Set[str] = set()
+
+    async with httpx.AsyncClient(follow_redirects=True, timeout=60.0) as client:
+        async def read_sitemap(url: str, depth: int):
+            if url in seen_sitemaps or depth > max_depth:
+                return
+            seen_sitemaps.add(url)
+
+            children = []
+            try:
+                async with semaphore:
+                    async for kind, loc, lastmod in _iter_sitemap_file(client, url):
+                        if kind == "sitemap":
+                            children.append(loc)
+                        else:
+                            await queue.put(SitemapEntry(loc, lastmod))
+            except Exception as e:
+                print(f"Error parsing sitemap {url}: {e}")
+
+            if children:
+                print(f"Sitemap index {url}: {len(children)} child sitemaps")
+                await asyncio.gather(*[read_sitemap(child, depth + 1) for child in children])
+
+        async def produce():
+            await read_sitemap(sitemap_url, 0)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                entry = await queue.get()
+                if entry is None:
+                    break
+                yield entry
+        finally:
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
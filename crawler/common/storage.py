@@ -1,10 +1,13 @@
 import os
-from typing import List, Dict, Any
+import json
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
 from .text_processing import ProcessedChunk
+from .embedding_columns import embedding_column
 
 # Load environment variables first
 load_dotenv(override=True)
@@ -19,67 +22,268 @@ def get_table_name() -> str:
     """Get the table name from environment variables."""
     return os.getenv("CURRENT_SOURCE_TABLE", "dev_docs_site_pages")
 
-async def store_chunks(chunks: List[ProcessedChunk], content_type: str = "doc") -> bool:
-    """Store processed chunks in the database. Returns True if successful."""
+def get_source_branch() -> str:
+    """Get the branch value repository rows are stored under."""
+    return os.getenv("CURRENT_SOURCE_BRANCH", "main")
+
+def build_chunk_row(chunk: ProcessedChunk, table_name: str) -> Tuple[Dict[str, Any], str]:
+    """Build the table row for a chunk. Returns the row and its conflict key."""
+    # Base chunk data that's common across all types
+    chunk_data = {
+        "chunk_number": chunk.chunk_number,
+        "title": chunk.title,
+        "summary": chunk.summary,
+        "content": chunk.content,
+        "metadata": chunk.metadata,
+        embedding_column(len(chunk.embedding)): chunk.embedding,
+        "embedding_model": chunk.embedding_model,
+        "document_creation_date": chunk.document_creation_date,
+        "document_crawl_date": chunk.document_crawl_date
+    }
+
+    # Handle different table schemas
+    if table_name == "repo_content":
+        # Repository content specific fields
+        chunk_data.update({
+            "repo_url": os.getenv("CURRENT_SOURCE_BASE_URL"),
+            "file_path": chunk.metadata.get("file_path", ""),
+            "branch": get_source_branch()
+        })
+        conflict_key = "repo_url,file_path,branch,chunk_number"
+        
+    elif table_name == "media_content":
+        # Media content specific fields
+        chunk_data.update({
+            "media_url": chunk.url,
+            "media_type": chunk.metadata.get("media_type", "unknown"),
+            "description": chunk.metadata.get("description", ""),
+            "transcript": chunk.metadata.get("transcript", ""),
+            "duration": chunk.metadata.get("duration"),
+            "publish_date": chunk.metadata.get("publish_date")
+        })
+        conflict_key = "media_url,chunk_number"
+        
+    else:
+        # Default doc content
+        chunk_data["url"] = chunk.url
+        conflict_key = "url,chunk_number"
+
+    return chunk_data, conflict_key
+
+def group_chunk_rows(chunks: List[ProcessedChunk], table_name: str) -> Dict[Tuple[str, Tuple[str, ...]], List[Dict[str, Any]]]:
+    """Group chunk rows by conflict key and column set so each group can be upserted in one statement.
+
+    Rows with the same conflict values are deduplicated, keeping the last one,
+    since one upsert statement can't update the same row twice.
+    """
+    groups: Dict[Tuple[str, Tuple[str, ...]], Dict[Tuple, Dict[str, Any]]] = {}
+    for chunk in chunks:
+        row, conflict_key = build_chunk_row(chunk, table_name)
+        key_values = tuple(row.get(column) for column in conflict_key.split(","))
+        groups.setdefault((conflict_key, tuple(row.keys())), {})[key_values] = row
+    return {group: list(rows.values()) for group, rows in groups.items()}
+
+def _upsert_rows(table_name: str, rows: List[Dict[str, Any]], conflict_key: str) -> bool:
+    """Upsert rows with one blocking Supabase request."""
+    result = supabase.table(table_name).upsert(rows, on_conflict=conflict_key).execute()
+    if not result.data:
+        print(f"Warning: No data returned from upsert operation")
+        return False
+    return True
+
+async def store_chunks(chunks: List[ProcessedChunk], content_type: str = "doc", batch_size: Optional[int] = None) -> bool:
+    """Store processed chunks in the database. Returns True if successful.
+    
+    Rows are upserted in multi-row batches of STORAGE_BATCH_SIZE, off the event
+    loop. Set STORAGE_USE_COPY=true to load through asyncpg COPY instead.
+    """
+    if not chunks:
+        return True
+        
+    if os.getenv("STORAGE_USE_COPY", "").lower() == "true":
+        return await copy_chunks(chunks)
+        
     table_name = get_table_name()
+    batch_size = batch_size or int(os.getenv("STORAGE_BATCH_SIZE", "100"))
     success = True
     
-    for chunk in chunks:
-        try:
-            # Base chunk data that's common across all types
-            chunk_data = {
-                "chunk_number": chunk.chunk_number,
-                "title": chunk.title,
-                "summary": chunk.summary,
-                "content": chunk.content,
-                "metadata": chunk.metadata,
-                "embedding": chunk.embedding,
-                "embedding_model": chunk.embedding_model,
-                "document_creation_date": chunk.document_creation_date,
-                "document_crawl_date": chunk.document_crawl_date
-            }
-
-            # Handle different table schemas
-            if table_name == "repo_content":
-                # Repository content specific fields
-                chunk_data.update({
-                    "repo_url": os.getenv("CURRENT_SOURCE_BASE_URL"),
-                    "file_path": chunk.metadata.get("file_path", ""),
-                    "branch": os.getenv("CURRENT_SOURCE_BRANCH", "main")
-                })
-                conflict_key = "repo_url,file_path,branch,chunk_number"
-                
-            elif table_name == "media_content":
-                # Media content specific fields
-                chunk_data.update({
-                    "media_url": chunk.url,
-                    "media_type": chunk.metadata.get("media_type", "unknown"),
-                    "description": chunk.metadata.get("description", ""),
-                    "transcript": chunk.metadata.get("transcript", ""),
-                    "duration": chunk.metadata.get("duration"),
-                    "publish_date": chunk.metadata.get("publish_date")
-                })
-                conflict_key = "media_url,chunk_number"
-                
-            else:
-                # Default doc content
-                chunk_data["url"] = chunk.url
-                conflict_key = "url,chunk_number"
-
-            # Upsert the chunk with appropriate conflict key
-            result = supabase.table(table_name).upsert(
-                chunk_data,
-                on_conflict=conflict_key
-            ).execute()
-            
-            if not result.data:
-                print(f"Warning: No data returned from upsert operation")
-                success = False
-
-        except Exception as e:
-            print(f"Error storing chunk: {e}")
-            print(f"Table: {table_name}")
-            print(f"Data keys: {list(chunk_data.keys())}")
-            success = False
+    for (conflict_key, _), rows in group_chunk_rows(chunks, table_name).items():
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                success = await asyncio.to_thread(_upsert_rows, table_name, batch, conflict_key) and success
+            except Exception as e:
+                print(f"Error storing batch of {len(batch)} chunks, retrying one by one: {e}")
+                print(f"Table: {table_name}")
+                print(f"Data keys: {list(batch[0].keys())}")
+                for row in batch:
+                    try:
+                        success = await asyncio.to_thread(_upsert_rows, table_name, [row], conflict_key) and success
+                    except Exception as e:
+                        print(f"Error storing chunk: {e}")
+                        success = False
             
-    return success 
\ No newline at end of file
+    return success
+
+async def load_document_chunks(match: Dict[str, Any], embedding_col: str) -> List[Dict[str, Any]]:
+    """Load the stored chunks of one document, with embeddings parsed to lists.
+    
+    match holds the columns identifying the document, e.g. {"url": url}.
+    """
+    table_name = get_table_name()
+    
+    def query():
+        request = supabase.table(table_name).select(
+            f"chunk_number,title,summary,content,embedding_model,{embedding_col}"
+        )
+        for column, value in match.items():
+            request = request.eq(column, value)
+        return request.execute()
+    
+    try:
+        result = await asyncio.to_thread(query)
+    except Exception as e:
+        print(f"Error loading stored chunks for {match}: {e}")
+        return []
+        
+    rows = result.data or []
+    for row in rows:
+        # PostgREST returns vectors as "[...]" strings
+        embedding = row.pop(embedding_col, None)
+        row["embedding"] = json.loads(embedding) if isinstance(embedding, str) else embedding
+    return rows
+
+async def delete_stale_chunks(match: Dict[str, Any], chunk_count: int) -> bool:
+    """Delete a document's rows numbered chunk_count and up, left over from a longer version."""
+    table_name = get_table_name()
+    
+    def query():
+        request = supabase.table(table_name).delete()
+        for column, value in match.items():
+            request = request.eq(column, value)
+        return request.gte("chunk_number", chunk_count).execute()
+    
+    try:
+        result = await asyncio.to_thread(query)
+        if result.data:
+            print(f"Deleted {len(result.data)} stale chunks for {match}")
+        return True
+    except Exception as e:
+        print(f"Error deleting stale chunks for {match}: {e}")
+        return False
+
+async def set_document_fields(match: Dict[str, Any], values: Dict[str, Any]) -> bool:
+    """Set columns on every stored row of one document."""
+    table_name = get_table_name()
+    
+    def query():
+        request = supabase.table(table_name).update(values)
+        for column, value in match.items():
+            request = request.eq(column, value)
+        return request.execute()
+    
+    try:
+        await asyncio.to_thread(query)
+        return True
+    except Exception as e:
+        print(f"Error updating {list(values)} for {match}: {e}")
+        return False
+
+async def load_file_shas(match: Dict[str, Any], page_size: int = 1000) -> Dict[str, Optional[str]]:
+    """Load the blob SHA stored with each file of a repository, read from its first chunk.
+    
+    match holds the columns identifying the repository, e.g. {"repo_url": url, "branch": branch}.
+    """
+    table_name = get_table_name()
+    shas: Dict[str, Optional[str]] = {}
+    start = 0
+    
+    def query():
+        request = supabase.table(table_name).select("file_path,blob_sha").eq("chunk_number", 0)
+        for column, value in match.items():
+            request = request.eq(column, value)
+        return request.order("id").range(start, start + page_size - 1).execute()
+    
+    try:
+        while True:
+            rows = (await asyncio.to_thread(query)).data or []
+            shas.update({row["file_path"]: row["blob_sha"] for row in rows})
+            if len(rows) < page_size:
+                break
+            start += page_size
+    except Exception as e:
+        print(f"Error loading stored file SHAs for {match}: {e}")
+    return shas
+
+# Direct Postgres pool for COPY-based bulk loads, created on first use
+_pg_pool = None
+
+async def get_pg_pool():
+    """Get the asyncpg pool used for COPY-based bulk loads."""
+    global _pg_pool
+    if _pg_pool is None:
+        import asyncpg
+        from pgvector.asyncpg import register_vector
+
+        from ..api.config import config
+
+        _pg_pool = await asyncpg.create_pool(
+            host=config.database.host,
+            port=config.database.port,
+            database=config.database.database,
+            user=config.database.user,
+            password=config.database.password,
+            init=register_vector
+        )
+    return _pg_pool
+
+async def close_pg_pool():
+    """Close the asyncpg pool if it was opened."""
+    global _pg_pool
+    if _pg_pool is not None:
+        await _pg_pool.close()
+        _pg_pool = None
+
+def _to_copy_value(column: str, value: Any) -> Any:
+    """Convert a row value to the Python type asyncpg's COPY expects for its column."""
+    if column == "metadata":
+        return json.dumps(value or {})
+    if isinstance(value, str) and column.endswith("_date"):
+        return datetime.fromisoformat(value)
+    return value
+
+async def copy_chunks(chunks: List[ProcessedChunk]) -> bool:
+    """Bulk load chunks with COPY into a staging table, then merge into the target table.
+    
+    Much faster than PostgREST upserts for large backfills. Needs direct Postgres
+    access, configured through crawler.api.config (SUPABASE_HOST, SUPABASE_PORT, ...).
+    """
+    table_name = get_table_name()
+    
+    try:
+        pool = await get_pg_pool()
+        async with pool.acquire() as conn:
+            for (conflict_key, columns), rows in group_chunk_rows(chunks, table_name).items():
+                conflict_columns = conflict_key.split(",")
+                updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in conflict_columns)
+                
+                async with conn.transaction():
+                    await conn.execute(
+                        f"create temp table {table_name}_staging (like {table_name} including defaults) on commit drop"
+                    )
+                    await conn.copy_records_to_table(
+                        f"{table_name}_staging",
+                        records=[tuple(_to_copy_value(column, row[column]) for column in columns) for row in rows],
+                        columns=list(columns)
+                    )
+                    await conn.execute(f"""
+                        insert into {table_name} ({", ".join(columns)})
+                        select {", ".join(columns)} from {table_name}_staging
+                        on conflict ({conflict_key}) do update set {updates}
+                    """)
+                print(f"Copied {len(rows)} chunks into {table_name}")
+        return True
+        
+    except Exception as e:
+        print(f"Error bulk copying chunks into {table_name}: {e}")
+        return False
@@ -0,0 +1,154 @@
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .text_processing import ProcessedChunk
+
+class StorageWriter:
+    """Write-behind buffer that stores chunks in the background.
+
+    Crawlers hand chunks to put() and carry on while the writer flushes them
+    with store (storage.store_chunks unless given) once STORAGE_FLUSH_SIZE
+    chunks are buffered or STORAGE_FLUSH_INTERVAL seconds have passed. put()
+    waits when STORAGE_MAX_PENDING chunks are already queued, failed batches
+    are retried with backoff from STORAGE_RETRY_DELAY seconds, and close()
+    drains everything that was queued. A put()'s
+    on_stored callback is awaited once all of its chunks are stored, and
+    never if any of them is given up on.
+
+    Usage:
+        async with StorageWriter() as writer:
+            await writer.put(processed_chunks, on_stored=remember_page)
+    """
+
+    _CLOSE = object()
+
+    def __init__(self,
+                 flush_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 max_pending: Optional[int] = None,
+                 max_retries: Optional[int] = None,
+                 retry_delay: Optional[float] = None,
+                 store: Optional[Callable[[List[ProcessedChunk]], Awaitable[bool]]] = None):
+        self.flush_size = flush_size or int(os.getenv("STORAGE_FLUSH_SIZE", "200"))
+        self.flush_interval = flush_interval or float(os.getenv("STORAGE_FLUSH_INTERVAL", "2.0"))
+        self.max_pending = max_pending or int(os.getenv("STORAGE_MAX_PENDING", "2000"))
+        self.max_retries = max_retries or int(os.getenv("STORAGE_MAX_RETRIES", "3"))
+        self.retry_delay = retry_delay or float(os.getenv("STORAGE_RETRY_DELAY", "1.0"))
+        if store is None:
+            # Imported here so the writer can be used without a Supabase client
+            from .storage import store_chunks as store
+        self.store = store
+        self.queue: Optional[asyncio.Queue] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stored = 0
+        self.failed_chunks: List[ProcessedChunk] = []
+
+    async def __aenter__(self) -> "StorageWriter":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def start(self):
+        """Start the background flush task."""
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self.task = asyncio.create_task(self._run())
+
+    async def put(self, chunks: List[ProcessedChunk], on_stored: Optional[Callable[[], Awaitable[None]]] = None):
+        """Queue chunks for storage, waiting while the buffer is full.
+        
+        on_stored is awaited by the writer once every one of these chunks is
+        stored, or right away when there are none.
+        """
+        if self.task is None:
+            raise RuntimeError("StorageWriter.start() must be called before put()")
+        if self.task.done():
+            raise RuntimeError("StorageWriter is closed")
+        if not chunks:
+            if on_stored:
+                await self._notify(on_stored)
+            return
+        ticket = _PutTicket(len(chunks), on_stored)
+        for chunk in chunks:
+            await self.queue.put((chunk, ticket))
+
+    async def close(self):
+        """Flush everything queued so far and stop the background task."""
+        if self.task is None:
+            return
+        if not self.task.done():
+            await self.queue.put(self._CLOSE)
+        await self.task
+        print(f"Storage writer closed: {self.stored} chunks stored, {len(self.failed_chunks)} failed")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Report stored, failed and queued chunk counts."""
+        return {
+            "stored": self.stored,
+            "failed": len(self.failed_chunks),
+            "pending": self.queue.qsize() if self.queue else 0
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            item = await self.queue.get()
+            if item is self._CLOSE:
+                break
+            batch = [item]
+
+            # Keep filling the batch until it is full or the flush interval is up
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.flush_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _notify(self, on_stored: Callable[[], Awaitable[None]]):
+        try:
+            await on_stored()
+        except Exception as e:
+            print(f"Error in storage callback: {e}")
+
+    async def _flush(self, batch: List[Tuple[ProcessedChunk, "_PutTicket"]]):
+        chunks = [chunk for chunk, _ in batch]
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                if await self.store(chunks):
+                    self.stored += len(chunks)
+                    for _, ticket in batch:
+                        ticket.pending -= 1
+                        if ticket.pending == 0 and not ticket.failed and ticket.on_stored:
+                            await self._notify(ticket.on_stored)
+                    return
+                print(f"Storing batch of {len(chunks)} chunks failed (attempt {attempt}/{self.max_retries})")
+            except Exception as e:
+                print(f"Error storing batch of {len(chunks)} chunks (attempt {attempt}/{self.max_retries}): {e}")
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        print(f"Giving up on batch of {len(chunks)} chunks")
+        self.failed_chunks.extend(chunks)
+        for _, ticket in batch:
+            ticket.failed = True
+
+class _PutTicket:
+    """Chunks of one StorageWriter.put() call still waiting to be stored."""
+
+    def __init__(self, pending: int, on_stored: Optional[Callable[[], Awaitable[None]]]):
+        self.pending = pending
+        self.failed = False
+        self.on_stored = on_stored
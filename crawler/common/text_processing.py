@@ -1,4 +1,6 @@
-from typing import List, Dict, Any, Optional
+import os
+import re
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -61,4 +63,179 @@ def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
 
         start = max(start + 1, end)
 
-    return chunks 
\ No newline at end of file
+    return chunks 
+
+# Rough average for English text and code with common LLM tokenizers
+CHARS_PER_TOKEN = 4
+
+HEADING_PATTERN = re.compile(r'#{1,6}\s')
+TABLE_SEPARATOR_PATTERN = re.compile(r'\|?\s*:?-{3,}')
+SENTENCE_BREAK_PATTERN = re.compile(r'(?<=[.!?])\s+')
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of a text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """Yield lines without building a list of the whole text."""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def _iter_blocks(text: str) -> Iterator[Tuple[str, str]]:
+    """Yield (kind, block) pairs for markdown headings, code blocks, tables and paragraphs."""
+    lines: List[str] = []
+    kind = None
+    fence = None
+
+    for line in _iter_lines(text):
+        stripped = line.strip()
+
+        # Inside a fenced code block everything belongs to the block
+        if fence:
+            lines.append(line)
+            if stripped.startswith(fence):
+                yield 'code', '\n'.join(lines)
+                lines, kind, fence = [], None, None
+            continue
+
+        if stripped.startswith('```') or stripped.startswith('~~~'):
+            if lines:
+                yield kind, '\n'.join(lines)
+            lines, kind, fence = [line], 'code', stripped[:3]
+            continue
+
+        if HEADING_PATTERN.match(stripped):
+            if lines:
+                yield kind, '\n'.join(lines)
+            yield 'heading', line
+            lines, kind = [], None
+            continue
+
+        if not stripped:
+            if lines:
+                yield kind, '\n'.join(lines)
+            lines, kind = [], None
+            continue
+
+        line_kind = 'table' if stripped.startswith('|') else 'paragraph'
+        if lines and line_kind != kind:
+            yield kind, '\n'.join(lines)
+            lines = []
+        lines.append(line)
+        kind = line_kind
+
+    # Also flushes an unterminated code block
+    if lines:
+        yield kind, '\n'.join(lines)
+
+def _group_pieces(pieces: List[str], max_chars: int, separator: str) -> Iterator[str]:
+    """Join pieces into groups of at most max_chars, hard-splitting any piece that is too long."""
+    group: List[str] = []
+    group_len = 0
+    for piece in pieces:
+        while len(piece) > max_chars:
+            if group:
+                yield separator.join(group)
+                group, group_len = [], 0
+            yield piece[:max_chars]
+            piece = piece[max_chars:]
+        if group and group_len + len(separator) + len(piece) > max_chars:
+            yield separator.join(group)
+            group, group_len = [], 0
+        group.append(piece)
+        group_len += len(piece) + len(separator)
+    if group:
+        yield separator.join(group)
+
+def _split_block(kind: str, block: str, max_chars: int) -> Iterator[str]:
+    """Split a block that is too large for one chunk, keeping code fences and table headers intact."""
+    if len(block) <= max_chars:
+        yield block
+        return
+
+    lines = block.split('\n')
+
+    if kind == 'code':
+        opener = lines[0]
+        closer = lines[-1] if len(lines) > 1 and lines[-1].strip().startswith(opener.strip()[:3]) else opener.strip()[:3]
+        body = lines[1:-1] if closer == lines[-1] else lines[1:]
+        budget = max(1, max_chars - len(opener) - len(closer) - 2)
+        for piece in _group_pieces(body, budget, '\n'):
+            yield f"{opener}\n{piece}\n{closer}"
+
+    elif kind == 'table':
+        # Repeat the header row and separator in every piece
+        header_len = 2 if len(lines) > 1 and TABLE_SEPARATOR_PATTERN.match(lines[1].strip()) else 1
+        header = '\n'.join(lines[:header_len])
+        budget = max(1, max_chars - len(header) - 1)
+        for piece in _group_pieces(lines[header_len:], budget, '\n'):
+            yield f"{header}\n{piece}"
+
+    else:
+        yield from _group_pieces(SENTENCE_BREAK_PATTERN.split(block), max_chars, ' ')
+
+def iter_chunks(text: str, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None) -> Iterator[str]:
+    """Lazily split markdown into chunks of roughly max_tokens tokens.
+
+    Chunks break between markdown blocks, preferring to start a new chunk at a
+    heading. Fenced code blocks and tables are only split when they are too big
+    for one chunk on their own. With overlap_tokens, each chunk starts with the
+    trailing blocks of the previous one that fit in that budget.
+    """
+    max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "1200"))
+    overlap_tokens = overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    current: List[Tuple[str, str]] = []
+    current_len = 0
+    carried = 0  # Number of leading blocks in current that overlap the previous chunk
+
+    for kind, block in _iter_blocks(text):
+        for piece in _split_block(kind, block, max_chars):
+            has_new_content = len(current) > carried
+            too_big = current_len + len(piece) > max_chars
+            at_section_break = kind == 'heading' and current_len >= max_chars * 3 // 4
+
+            if has_new_content and (too_big or at_section_break):
+                # Don't leave a heading dangling at the end of a chunk
+                moved = []
+                if (current[-1][0] == 'heading' and len(current) - carried > 1
+                        and len(current[-1][1]) + len(piece) + 2 <= max_chars):
+                    moved.append(current.pop())
+
+                yield '\n\n'.join(block_text for _, block_text in current).strip()
+
+                overlap: List[Tuple[str, str]] = []
+                overlap_len = 0
+                for previous in reversed(current):
+                    if overlap_len + len(previous[1]) + 2 > overlap_chars:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_len += len(previous[1]) + 2
+
+                current = overlap + moved
+                carried = len(overlap)
+                current_len = sum(len(block_text) + 2 for _, block_text in current)
+
+            # Drop the overlap if it leaves no room for the new block
+            if carried and current_len + len(piece) > max_chars:
+                current = current[carried:]
+                carried = 0
+                current_len = sum(len(block_text) + 2 for _, block_text in current)
+
+            current.append((kind, piece))
+            current_len += len(piece) + 2
+
+    if len(current) > carried:
+        yield '\n\n'.join(block_text for _, block_text in current).strip()
+
+def split_chunks(text: str) -> List[str]:
+    """Split markdown with iter_chunks into a list, e.g. to run in a worker process."""
+    return list(iter_chunks(text))
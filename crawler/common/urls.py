@@ -0,0 +1,172 @@
+import os
+import re
+import math
+import hashlib
+import posixpath
+from typing import Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Query parameters that only track where a visitor came from
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_ga", "_gl", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "spm"
+}
+TRACKING_PREFIXES = ("utm_",)
+
+CANONICAL_LINK = re.compile(r"<link\b[^>]*>", re.I)
+REL_CANONICAL = re.compile(r"""\brel\s*=\s*["']?[^"'>]*\bcanonical\b""", re.I)
+HREF = re.compile(r"""\bhref\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.I)
+
+def get_tracking_params() -> set:
+    """Get the tracking parameters to strip, including any listed in URL_TRACKING_PARAMS."""
+    extra = {p.strip().lower() for p in os.getenv("URL_TRACKING_PARAMS", "").split(",") if p.strip()}
+    return TRACKING_PARAMS | extra
+
+def _is_tracking_param(name: str, tracking_params: set) -> bool:
+    name = name.lower()
+    return name in tracking_params or name.startswith(TRACKING_PREFIXES)
+
+def canonicalize_url(url: str, base_url: Optional[str] = None) -> str:
+    """Normalize a URL so equivalent spellings compare equal.
+
+    Resolves it against base_url, lowercases scheme and host, drops default
+    ports, fragments and tracking parameters, resolves dot segments and
+    sorts the remaining query parameters. Meaningful query strings and
+    trailing slashes are kept.
+    """
+    if base_url:
+        url = urljoin(base_url, url)
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    host = (parts.hostname or "").lower().rstrip(".")
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+    if "/." in path or "//" in path:
+        trailing_slash = path.endswith("/")
+        path = posixpath.normpath(path)
+        if path.startswith("//"):
+            path = "/" + path.lstrip("/")
+        if trailing_slash and not path.endswith("/"):
+            path += "/"
+
+    tracking_params = get_tracking_params()
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name, tracking_params)
+    ))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def extract_canonical_link(html: str, page_url: str) -> Optional[str]:
+    """Get the canonical URL a page declares with <link rel="canonical">, if any."""
+    # The tag belongs in <head>, so don't scan the whole body
+    head_end = html.lower().find("</head>")
+    head = html[:head_end] if head_end != -1 else html[:100000]
+    for tag in CANONICAL_LINK.findall(head):
+        if not REL_CANONICAL.search(tag):
+            continue
+        match = HREF.search(tag)
+        if match:
+            href = next(group for group in match.groups() if group is not None).strip()
+            if href:
+                return canonicalize_url(href, page_url)
+    return None
+
+def get_canonical_url(requested_url: str, final_url: Optional[str] = None, html: Optional[str] = None) -> str:
+    """Get the URL a fetched page should be known by.
+
+    A <link rel="canonical"> on the same host wins, then the URL redirects
+    ended at, then the URL that was requested.
+    """
+    page_url = canonicalize_url(final_url or requested_url)
+    if html:
+        declared = extract_canonical_link(html, page_url)
+        if declared and urlsplit(declared).hostname == urlsplit(page_url).hostname:
+            return declared
+    return page_url
+
+def is_url_in_scope(url: str, base_url: str, url_patterns: Optional[List[str]] = None) -> bool:
+    """Check whether a URL is under base_url and matches one of url_patterns.
+
+    Host and path are compared after canonicalization, http and https count
+    as the same site, and the base path only matches whole path segments,
+    so /docs covers /docs/api but not /docs-old.
+    """
+    candidate = urlsplit(canonicalize_url(url))
+    base = urlsplit(canonicalize_url(base_url))
+    if candidate.scheme not in ("http", "https") or candidate.netloc != base.netloc:
+        return False
+
+    base_path = base.path.rstrip("/")
+    if base_path and candidate.path != base_path and not candidate.path.startswith(base_path + "/"):
+        return False
+
+    if not url_patterns:
+        return True
+    return any(pattern in url for pattern in url_patterns)
+
+class BloomFilter:
+    """Fixed-size probabilistic set: never misses an added item, wrongly
+    reports an unseen one with probability about false_positive_rate."""
+
+    def __init__(self, expected_items: int, false_positive_rate: float = 0.001):
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: k positions from two independent 64-bit hashes
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> bool:
+        """Add an item. Returns True if it was (certainly) not in the filter before."""
+        new = False
+        for position in self._positions(item):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position // 8] & (1 << position % 8) for position in self._positions(item))
+
+class VisitedSet:
+    """Memory-bounded set of canonical URLs, backed by a bloom filter.
+
+    Uses about 1.8 MB per million URLs at the default 0.1% false positive
+    rate, however long the URLs are. A false positive means a new URL is
+    taken for one already seen and skipped.
+    """
+
+    def __init__(self, expected_urls: Optional[int] = None, false_positive_rate: Optional[float] = None):
+        self.filter = BloomFilter(
+            expected_urls or int(os.getenv("VISITED_EXPECTED_URLS", "1000000")),
+            false_positive_rate or float(os.getenv("VISITED_FALSE_POSITIVE_RATE", "0.001"))
+        )
+        self.count = 0
+
+    def add(self, url: str) -> bool:
+        """Add a URL. Returns True if it had not been seen before."""
+        new = self.filter.add(canonicalize_url(url))
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, url: str) -> bool:
+        return canonicalize_url(url) in self.filter
+
+    def __len__(self) -> int:
+        return self.count
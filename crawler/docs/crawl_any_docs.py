@@ -10,16 +10,27 @@ from xml.etree import ElementTree
 from typing import List, Dict, Any, Optional, Set
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from urllib.parse import urlparse, urljoin
+from urllib.parse import urljoin
 from dotenv import load_dotenv
-from bs4 import BeautifulSoup
 import httpx
 
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
 from crawler.common.llm_provider import LLMProvider
-from crawler.common.text_processing import chunk_text, RawContent, ProcessedChunk
-from crawler.common.storage import store_chunks, supabase
-from crawler.common.processing import process_chunk, get_title_and_summary
+from crawler.common.text_processing import split_chunks, RawContent, ProcessedChunk
+from crawler.common.embedding_columns import embedding_column
+from crawler.common.storage import store_chunks, close_pg_pool, supabase, load_document_chunks, delete_stale_chunks
+from crawler.common.storage_writer import StorageWriter
+from crawler.common.crawl_state import is_incremental_crawl, hash_content, get_crawl_state, save_crawl_state, clear_crawl_state, load_crawl_states, filter_changed_urls, get_conditional_headers
+from crawler.common.sitemap import iter_sitemap
+from crawler.common.frontier import CrawlFrontier, DONE, run_frontier_workers
+from crawler.common.politeness import PolitenessScheduler
+from crawler.common.fetching import HttpFirstFetcher, FetchResult
+from crawler.common.html_parsing import parse_html, get_link_hrefs
+from crawler.common.browser_pool import BrowserContextPool, session_config
+from crawler.common.dedup import NearDuplicateIndex, is_near_duplicate_detection, fingerprint_text
+from crawler.common.cpu_pool import CpuWorkerPool
+from crawler.common.urls import canonicalize_url, get_canonical_url, is_url_in_scope
+from crawler.common.processing import process_changed_chunks, has_processing_errors, llm_scheduler
 
 # Force reload of .env file
 load_dotenv(override=True)
@@ -27,11 +38,14 @@ load_dotenv(override=True)
 # Initialize clients
 llm_provider = LLMProvider()
 
+# Shared by discovery and crawling so robots.txt is read once per host
+scheduler = PolitenessScheduler()
+
 # Configure browser with viewport settings
 browser_config = BrowserConfig(
     headless=True,
     ignore_https_errors=True,
-    extra_args=['--disable-gpu', '--no-sandbox']
+    extra_args=['--disable-gpu', '--disable-dev-shm-usage', '--no-sandbox']
 )
 
 # Debug prints
@@ -48,70 +62,73 @@ class CrawlSource:
     url_patterns: Optional[List[str]] = None
     exclude_patterns: Optional[List[str]] = None
 
-async def get_urls_from_sitemap(sitemap_url: str) -> Set[str]:
-    """Extract URLs from a sitemap XML."""
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(sitemap_url)
-            response.raise_for_status()
-            root = ElementTree.fromstring(response.content)
-            
-            # Extract URLs from sitemap
-            urls = set()
-            for url in root.findall('.//{http://www.sitemaps.org/schemas/sitemap/0.9}loc'):
-                urls.add(url.text)
-                
-            return urls
-    except Exception as e:
-        print(f"Error parsing sitemap {sitemap_url}: {e}")
-        return set()
+async def get_urls_from_sitemap(sitemap_url: str) -> Dict[str, Optional[str]]:
+    """Get every page URL of a sitemap (following sitemap indexes), mapped to its lastmod."""
+    urls = {}
+    async for entry in iter_sitemap(sitemap_url):
+        urls[entry.url] = entry.lastmod
+    return urls
 
-async def process_and_store_document(url: str, markdown: str, llm_provider: LLMProvider):
-    """Process a document and store its chunks."""
+async def process_and_store_document(url: str, markdown: str, llm_provider: LLMProvider, writer: Optional[StorageWriter] = None, response_headers: Optional[Dict[str, str]] = None, cpu_pool: Optional[CpuWorkerPool] = None):
+    """Process a document and store its chunks, through the write-behind writer if given.
+    
+    On incremental crawls, pages whose markdown hash matches the last crawl are skipped.
+    The page's hash and validators are only recorded once all its chunks are
+    stored without LLM errors, so a page that failed is processed again on the
+    next crawl. With cpu_pool, chunking runs in its worker processes.
+    """
     try:
+        source_name = os.getenv("CURRENT_SOURCE_NAME")
+        content_hash = hash_content(markdown)
+        if is_incremental_crawl():
+            state = await get_crawl_state(url)
+            if state and state.get("content_hash") == content_hash:
+                print(f"\nContent unchanged, skipping {url}")
+                await save_crawl_state(url, source_name, headers=response_headers, status_code=200, changed=False)
+                return
+        
         # Split into chunks
-        chunks = chunk_text(markdown)
+        chunks = await cpu_pool.run(split_chunks, markdown) if cpu_pool else split_chunks(markdown)
         print(f"\nProcessing {len(chunks)} chunks for {url}")
         
-        # Process chunks in parallel
-        tasks = [
-            process_chunk(chunk, i, url, llm_provider) 
-            for i, chunk in enumerate(chunks)
-        ]
-        processed_chunks = await asyncio.gather(*tasks)
+        # Reuse stored results for chunks whose content hasn't changed
+        stored_rows = []
+        if is_incremental_crawl():
+            stored_rows = await load_document_chunks({"url": url}, embedding_column(llm_provider.EMBEDDING_DIMENSION))
+        processed_chunks = await process_changed_chunks(chunks, url, llm_provider, stored_rows)
+        
+        async def remember_page():
+            # Remember validators and content hash for the next recrawl
+            await save_crawl_state(url, source_name, content_hash, response_headers, status_code=200)
+        
+        complete = not any(
+            has_processing_errors(chunk.title, chunk.summary, chunk.embedding) for chunk in processed_chunks
+        )
+        if not complete:
+            print(f"LLM errors in {url}, it will be processed again on the next crawl")
         
         # Store chunks
-        store_chunks(processed_chunks)
+        if writer:
+            await writer.put(processed_chunks, on_stored=remember_page if complete else None)
+        elif await store_chunks(processed_chunks) and complete:
+            await remember_page()
+        
+        # Drop rows left over from a longer version of the page
+        await delete_stale_chunks({"url": url}, len(chunks))
         
     except Exception as e:
         print(f"Error processing document {url}: {e}")
 
-async def get_urls_from_robots(base_url: str) -> List[str]:
-    """Get URLs from robots.txt."""
-    try:
-        parsed = urlparse(base_url)
-        robots_url = f"{parsed.scheme}://{parsed.netloc}/robots.txt"
-        
-        async with httpx.AsyncClient(follow_redirects=True) as client:
-            response = await client.get(robots_url)
-            response.raise_for_status()
-            
-            if response.url != robots_url:
-                print(f"Followed redirect from {robots_url} to {response.url}")
-            
-            urls = set()
-            for line in response.text.split('\n'):
-                if line.startswith('Allow:') or line.startswith('Disallow:'):
-                    path = line.split(': ')[1].strip()
-                    if path and not path == '/':
-                        url = urljoin(base_url, path)
-                        urls.add(url)
-            return list(urls)
-    except Exception as e:
-        print(f"Error fetching robots.txt: {e}")
-        if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 301:
-            print(f"Redirect location: '{e.response.headers.get('location')}'")
-        return []
+async def get_urls_from_robots(base_url: str, skip_sitemaps: Optional[Set[str]] = None) -> Dict[str, Optional[str]]:
+    """Get URLs from the sitemaps listed in robots.txt, mapped to their lastmod."""
+    urls = {}
+    sitemaps = await scheduler.robots.get_sitemaps(base_url)
+    for sitemap_url in sitemaps:
+        if skip_sitemaps and sitemap_url in skip_sitemaps:
+            continue
+        print(f"Reading sitemap from robots.txt: {sitemap_url}")
+        urls.update(await get_urls_from_sitemap(sitemap_url))
+    return urls
 
 async def get_urls_from_feed(base_url: str) -> List[str]:
     """Get URLs from RSS/Atom feeds."""
@@ -141,96 +158,153 @@ async def get_urls_from_feed(base_url: str) -> List[str]:
                 
     return list(urls)
 
-async def get_urls_from_html_discovery(base_url: str, url_patterns: Optional[List[str]] = None) -> Set[str]:
-    """Discover URLs by crawling HTML pages, with special handling for SPAs."""
-    discovered_urls = set()
-    async with httpx.AsyncClient(follow_redirects=True) as client:
-        try:
-            # Configure browser for SPA crawling
-            browser_config = BrowserConfig(
-                headless=True,
-                ignore_https_errors=True,
-                extra_args=['--disable-gpu', '--no-sandbox']
-            )
-            
-            # Configure crawler for SPAs
-            crawl_config = CrawlerRunConfig(
-                cache_mode=CacheMode.BYPASS,
-                wait_for_selector=os.getenv('WAIT_FOR_SELECTOR', 'main'),
-                wait_for_timeout=int(os.getenv('JS_RENDER_TIMEOUT', '5000')),
-                scroll_for_dynamic=os.getenv('SCROLL_FOR_DYNAMIC', 'true').lower() == 'true'
-            )
+async def get_urls_from_html_discovery(base_url: str,
+                                      url_patterns: Optional[List[str]] = None,
+                                      crawler: Optional[AsyncWebCrawler] = None,
+                                      pool: Optional[BrowserContextPool] = None) -> Set[str]:
+    """Discover URLs by crawling HTML pages, with special handling for SPAs.
+    
+    The frontier is kept on disk, so an interrupted discovery resumes where it
+    stopped. Set CRAWL_RESUME=false to start over anyway. Pages are rendered
+    in the given browser and context pool, or in a browser of its own.
+    """
+    frontier = CrawlFrontier(
+        crawl_id=f"discovery:{base_url}",
+        max_attempts=int(os.getenv("MAX_RETRIES", "2"))
+    )
+    frontier.start(
+        resume=os.getenv("CRAWL_RESUME", "true").lower() == "true",
+        retry_failed=os.getenv("CRAWL_RETRY_FAILED", "").lower() == "true"
+    )
+    
+    own_crawler = crawler is None
+    try:
+        if own_crawler:
+            crawler = AsyncWebCrawler(config=browser_config)
+            await crawler.start()
+        if pool is None:
+            pool = BrowserContextPool(crawler, size=1)
+        
+        # Configure crawler for SPAs
+        crawl_config = CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS,
+            wait_for=f"css:{os.getenv('WAIT_FOR_SELECTOR', 'main')}",
+            page_timeout=int(os.getenv('JS_RENDER_TIMEOUT', '30000')),
+            scan_full_page=os.getenv('SCROLL_FOR_DYNAMIC', 'true').lower() == 'true'
+        )
 
-            async with AsyncWebCrawler(browser_config) as crawler:
-                # Start with base URL
-                urls_to_check = {base_url}
-                
-                while urls_to_check:
-                    current_url = urls_to_check.pop()
-                    if not should_process_url(current_url, base_url, url_patterns):
-                        continue
+        # Start with base URL
+        frontier.add(canonicalize_url(base_url))
+        
+        while True:
+            next_url = frontier.next()
+            if next_url is None:
+                break
+            current_url, depth = next_url
+            if not should_process_url(current_url, base_url, url_patterns):
+                frontier.mark_done(current_url)
+                continue
+            if not await scheduler.is_allowed(current_url):
+                frontier.mark_failed(current_url, "disallowed by robots.txt", retry=False)
+                continue
 
-                    print(f"\nChecking URL: {current_url}")
-                    try:
-                        # Get page content with JavaScript rendering
-                        response = await crawler.get_page_content(current_url, config=crawl_config)
-                        
-                        # Extract links from rendered content
-                        soup = BeautifulSoup(response, 'html.parser')
-                        for link in soup.find_all('a', href=True):
-                            href = link['href']
-                            full_url = urljoin(current_url, href)
-                            
-                            if should_process_url(full_url, base_url, url_patterns):
-                                urls_to_check.add(full_url)
-                                discovered_urls.add(full_url)
-                                print(f"Found URL: {full_url}")
-                    
-                    except Exception as e:
-                        print(f"Error processing {current_url}: {str(e)}")
-                        continue
+            print(f"\nChecking URL: {current_url}")
+            try:
+                # Get page content with JavaScript rendering
+                async with scheduler.slot(current_url):
+                    async with pool.lease() as session_id:
+                        result = await crawler.arun(url=current_url, config=session_config(crawl_config, session_id))
+                if not result.success:
+                    raise RuntimeError(result.error_message or "crawl failed")
+                
+                # Extract links from rendered content
+                links = get_link_hrefs(getattr(result, "links", None))
+                for full_url in extract_links(result.html, current_url, base_url, url_patterns, links):
+                    if frontier.add(full_url, depth + 1):
+                        print(f"Found URL: {full_url}")
+                
+                frontier.mark_done(current_url)
+            
+            except Exception as e:
+                print(f"Error processing {current_url}: {str(e)}")
+                frontier.mark_failed(current_url, str(e))
+                continue
 
-        except Exception as e:
-            print(f"Error during HTML discovery: {str(e)}")
+    except Exception as e:
+        print(f"Error during HTML discovery: {str(e)}")
+    finally:
+        if own_crawler and crawler is not None:
+            await pool.close()
+            await crawler.close()
     
+    # Everything found so far, including URLs found before an earlier run stopped
+    discovered_urls = {
+        url for url in frontier.get_urls()
+        if url != canonicalize_url(base_url) and should_process_url(url, base_url, url_patterns)
+    }
+    frontier.close()
     return discovered_urls
 
 def should_process_url(url: str, base_url: str, url_patterns: Optional[List[str]] = None) -> bool:
     """Check if a URL should be processed based on patterns and base URL."""
-    if not url.startswith(base_url):
-        return False
-        
-    if not url_patterns:
-        return True
-        
-    return any(pattern in url for pattern in url_patterns)
+    return is_url_in_scope(url, base_url, url_patterns)
+
+def extract_links(html: str,
+                  page_url: str,
+                  base_url: str,
+                  url_patterns: Optional[List[str]] = None,
+                  links: Optional[List[str]] = None) -> Set[str]:
+    """Get the canonical URLs of a page's links that should be processed.
 
-async def get_urls_for_source(source: CrawlSource) -> List[str]:
-    """Get URLs based on source configuration using multiple discovery methods."""
+    Pass the links the fetch already extracted (FetchResult.links or
+    crawl4ai's result.links) to skip parsing the HTML again.
+    """
+    if links is None and not html:
+        return set()
+    return {
+        url for url in parse_html(html if links is None else "", page_url, links=links).links
+        if should_process_url(url, base_url, url_patterns)
+    }
+
+async def get_urls_for_source(source: CrawlSource,
+                              crawler: Optional[AsyncWebCrawler] = None,
+                              pool: Optional[BrowserContextPool] = None,
+                              html_discovery: bool = True,
+                              lastmods: Optional[Dict[str, Optional[str]]] = None) -> List[str]:
+    """Get URLs based on source configuration using multiple discovery methods.
+    
+    With html_discovery=False, pages are not rendered to find links; the crawl
+    is expected to follow links itself (see crawl_parallel's frontier). If
+    lastmods is given, the sitemap lastmod of each URL that has one is added
+    to it.
+    """
     urls = set()
     
     print(f"\nDiscovering URLs for {source.name}:")
     
-    # Try sitemap if provided
+    # Try sitemap if provided, then sitemaps listed in robots.txt
+    sitemap_urls = {}
     if source.sitemap_url:
         sitemap_urls = await get_urls_from_sitemap(source.sitemap_url)
         print(f"- Found {len(sitemap_urls)} URLs from sitemap")
-        urls.update(sitemap_urls)
-    
-    # Try robots.txt
-    robots_urls = await get_urls_from_robots(source.base_url)
+    robots_urls = await get_urls_from_robots(source.base_url, skip_sitemaps={source.sitemap_url})
     print(f"- Found {len(robots_urls)} URLs from robots.txt")
-    urls.update(robots_urls)
+    for url, lastmod in {**sitemap_urls, **robots_urls}.items():
+        url = canonicalize_url(url)
+        urls.add(url)
+        if lastmods is not None and lastmod:
+            lastmods[url] = lastmod
     
     # Try feeds
     feed_urls = await get_urls_from_feed(source.base_url)
     print(f"- Found {len(feed_urls)} URLs from feeds")
-    urls.update(feed_urls)
+    urls.update(canonicalize_url(url) for url in feed_urls)
     
     # Try HTML discovery
-    html_urls = await get_urls_from_html_discovery(source.base_url, source.url_patterns)
-    print(f"- Found {len(html_urls)} URLs from HTML discovery")
-    urls.update(html_urls)
+    if html_discovery:
+        html_urls = await get_urls_from_html_discovery(source.base_url, source.url_patterns, crawler, pool)
+        print(f"- Found {len(html_urls)} URLs from HTML discovery")
+        urls.update(html_urls)
     
     # Filter URLs
     filtered_urls = list(urls)
@@ -240,6 +314,13 @@ async def get_urls_for_source(source: CrawlSource) -> List[str]:
             if not any(pattern in url for pattern in source.exclude_patterns)
         ]
     
+    # Drop URLs robots.txt disallows
+    allowed = await asyncio.gather(*[scheduler.is_allowed(url) for url in filtered_urls])
+    disallowed = len(filtered_urls) - sum(allowed)
+    if disallowed:
+        print(f"- Skipping {disallowed} URLs disallowed by robots.txt")
+    filtered_urls = [url for url, is_allowed in zip(filtered_urls, allowed) if is_allowed]
+    
     print(f"\nFinal results:")
     print(f"- Total unique URLs: {len(filtered_urls)}")
     print("- First few URLs:")
@@ -248,56 +329,182 @@ async def get_urls_for_source(source: CrawlSource) -> List[str]:
     
     return filtered_urls
 
-async def crawl_parallel(urls: List[str], source: CrawlSource, max_concurrent: int = 5):
-    """Crawl multiple URLs in parallel with a concurrency limit."""
-    # Initialize crawler with separate browser and crawler configs
-    browser_config = BrowserConfig(
-        headless=True,
-        verbose=False,
-        extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"]
-    )
+async def crawl_parallel(urls: List[str],
+                         source: CrawlSource,
+                         max_concurrent: int = 5,
+                         crawler: Optional[AsyncWebCrawler] = None,
+                         pool: Optional[BrowserContextPool] = None,
+                         frontier: Optional[CrawlFrontier] = None,
+                         crawl_states: Optional[Dict[str, Dict[str, Any]]] = None):
+    """Crawl multiple URLs in parallel with a concurrency limit.
+    
+    Pages that need the browser each lease their own context from pool. Without
+    a crawler and pool, a browser and a pool of max_concurrent contexts are
+    started for this call and closed at the end.
+    
+    With a frontier, urls only seed it: links found on each crawled page are
+    queued in it and crawled too, so every page is fetched once for both
+    discovery and content.
+    
+    URLs with a stored crawl state in crawl_states are fetched conditionally,
+    so a page the server reports unchanged is skipped on the same request.
+    """
     crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
 
-    # Create crawler with browser config
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
+    own_crawler = crawler is None
+    if own_crawler:
+        crawler = AsyncWebCrawler(config=browser_config)
+        await crawler.start()
+    own_pool = pool is None
+    if own_pool:
+        pool = BrowserContextPool(crawler, size=max_concurrent)
+    
+    # Store chunks in the background so pages don't wait on the database
+    writer = StorageWriter()
+    await writer.start()
+    
+    # Markdown conversion, fingerprints and chunking run in worker processes
+    cpu_pool = CpuWorkerPool()
+    
+    # Static pages skip the browser
+    fetcher = HttpFirstFetcher(cpu_pool=cpu_pool)
+    
+    # Copies of a page under other URLs are linked to it instead of processed again
+    dedup = NearDuplicateIndex(source.name) if is_near_duplicate_detection() else None
 
     try:
         semaphore = asyncio.Semaphore(max_concurrent)
         total_urls = len(urls)
         successful = 0
         failed = 0
+        duplicates = 0
+        unchanged = 0
+        # Canonical URLs crawled or about to be, so a page reached through an alias is stored once
+        claimed = set(urls)
+        
+        def claim(page_url: str) -> bool:
+            """Claim a canonical URL for the page being processed. False if it is crawled on its own."""
+            if frontier is not None:
+                if not frontier.add(page_url):
+                    return False
+                frontier.mark_done(page_url)
+                return True
+            if page_url in claimed:
+                return False
+            claimed.add(page_url)
+            return True
         
-        async def process_url(url: str):
-            nonlocal successful, failed
+        async def process_url(url: str) -> Optional[FetchResult]:
+            """Crawl and store one page. Returns the fetch result if the page was fetched."""
+            nonlocal total_urls, successful, failed, duplicates, unchanged
             try:
+                if not await scheduler.is_allowed(url):
+                    failed += 1
+                    print(f"Skipping {url}: disallowed by robots.txt")
+                    return None
+                    
                 async with semaphore:
-                    result = await crawler.arun(
-                        url=url,
-                        config=crawl_config,
-                        session_id="session1"
-                    )
-                    if result.success:
-                        await process_and_store_document(url, result.markdown_v2.raw_markdown, llm_provider)
+                    validators = get_conditional_headers(crawl_states.get(url)) if crawl_states else None
+                    async with scheduler.slot(url):
+                        result = await fetcher.fetch(url, crawler, crawl_config, pool, validators=validators)
+                    scheduler.report(url, result.status_code, result.response_headers)
+                    if result.status_code in PolitenessScheduler.SLOWDOWN_STATUSES:
+                        failed += 1
+                        print(f"Throttled crawling {url} (status {result.status_code})")
+                    elif result.status_code == 304:
+                        unchanged += 1
+                        print(f"Skipping {url}: not modified since the last crawl")
+                        await save_crawl_state(url, source.name, headers=result.response_headers, status_code=304, changed=False)
+                        return result
+                    elif result.success:
+                        # Store the page under the URL it declares or redirected to
+                        page_url = get_canonical_url(url, result.url, result.html)
+                        if page_url != url:
+                            if not claim(page_url):
+                                duplicates += 1
+                                print(f"Skipping {url}: same page as {page_url}")
+                                return result
+                            url = page_url
+                            
+                        canonical = None
+                        if dedup:
+                            fingerprint = await cpu_pool.run(fingerprint_text, result.markdown, dedup.min_words)
+                            canonical = dedup.check_fingerprint(url, fingerprint)
+                        if canonical:
+                            duplicates += 1
+                            print(f"Skipping {url}: near-duplicate of {canonical}")
+                            # Drop rows stored before the page was known to be a copy
+                            await delete_stale_chunks({"url": url}, 0)
+                            return result
+                            
+                        await process_and_store_document(
+                            url,
+                            result.markdown,
+                            llm_provider,
+                            writer,
+                            response_headers=result.response_headers,
+                            cpu_pool=cpu_pool
+                        )
                         successful += 1
+                        if frontier is not None:
+                            total_urls = successful + failed + frontier.get_counts()["queued"]
                         print(f"\nProgress: {successful + failed}/{total_urls} URLs processed")
                         print(f"Success: {successful}, Failed: {failed}")
+                        print(f"LLM queue: {llm_scheduler.get_queue_depth()}")
+                        print(f"Storage: {writer.get_stats()}")
+                        return result
                     else:
                         failed += 1
                         print(f"Failed to crawl {url}: {result.error_message}")
             except Exception as e:
                 failed += 1
                 print(f"Error processing {url}: {e}")
+            return None
         
-        await asyncio.gather(*[process_url(url) for url in urls])
+        if frontier is None:
+            await asyncio.gather(*[process_url(url) for url in urls])
+        else:
+            frontier.add_many(urls)
+            
+            async def crawl_page(url: str, depth: int) -> bool:
+                result = await process_url(url)
+                if result is None:
+                    frontier.mark_failed(url, "crawl failed")
+                    return False
+                links = extract_links(result.html, result.url, source.base_url, source.url_patterns, result.links)
+                if source.exclude_patterns:
+                    links = {
+                        link for link in links
+                        if not any(pattern in link for pattern in source.exclude_patterns)
+                    }
+                frontier.add_many(links, depth + 1)
+                frontier.mark_done(url)
+                return True
+            
+            await run_frontier_workers(frontier, crawl_page, max_concurrent)
+            total_urls = successful + failed + unchanged
         
         print(f"\nCrawl completed:")
         print(f"Total URLs: {total_urls}")
         print(f"Successful: {successful}")
         print(f"Failed: {failed}")
+        print(f"Unchanged: {unchanged}")
+        print(f"Near-duplicates skipped: {duplicates}")
+        print(f"Hosts: {scheduler.get_stats()}")
+        print(f"Fetching: {fetcher.get_stats()}")
+        print(f"CPU workers: {cpu_pool.get_stats()}")
+        print(f"Browser contexts: {pool.get_stats()}")
         
     finally:
-        await crawler.close()
+        await writer.close()
+        await fetcher.close()
+        cpu_pool.close()
+        if dedup:
+            dedup.close()
+        if own_pool:
+            await pool.close()
+        if own_crawler:
+            await crawler.close()
 
 async def clear_database(source_name: str):
     """Clear existing entries for a specific source from the database."""
@@ -305,6 +512,10 @@ async def clear_database(source_name: str):
         table_name = os.getenv("CURRENT_SOURCE_TABLE", "dev_docs_site_pages")
         # Delete all entries where metadata->source equals our source_name
         result = supabase.from_(table_name).delete().eq('metadata->>source', source_name).execute()
+        await clear_crawl_state(source_name)
+        dedup = NearDuplicateIndex(source_name)
+        dedup.reset()
+        dedup.close()
         print(f"Cleared existing entries for source: {source_name}")
     except Exception as e:
         print(f"Error clearing database: {e}")
@@ -332,9 +543,6 @@ async def get_source_config() -> CrawlSource:
 async def main():
     """Main entry point."""
     try:
-        # Initialize LLM provider
-        llm_provider = LLMProvider()
-        
         # Get source configuration
         source = await get_source_config()
         if not source.name:
@@ -348,42 +556,65 @@ async def main():
                 print(f"Clearing existing entries for {source.name}")
                 await clear_database(source.name)
         
-        # Initialize crawler with separate browser and crawler configs
-        browser_config = BrowserConfig(
-            headless=True,
-            ignore_https_errors=True,
-            extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"]
-        )
-        crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
-        
-        # Create crawler with browser config
+        # One browser for discovery and crawling, shared through a pool of contexts
         crawler = AsyncWebCrawler(config=browser_config)
         await crawler.start()
+        pool = BrowserContextPool(crawler)
         
-        # Get URLs to crawl
-        urls = await get_urls_for_source(source)
-        print(f"Found {len(urls)} URLs to crawl")
-        
-        # Process each URL
-        for url in urls:
-            try:
-                print(f"\nProcessing {url}")
-                result = await crawler.arun(
-                    url=url,
-                    config=crawl_config,
-                    session_id="session1"
-                )
-                if result.success:
-                    await process_and_store_document(url, result.markdown_v2.raw_markdown, llm_provider)
-                else:
-                    print(f"No content found for {url}")
-            except Exception as e:
-                print(f"Error processing {url}: {e}")
-                continue
+        # Follow links while crawling instead of rendering every page twice
+        frontier = None
+        if os.getenv("SINGLE_PASS_CRAWL", "true").lower() == "true":
+            frontier = CrawlFrontier(
+                crawl_id=f"crawl:{source.name}",
+                max_attempts=int(os.getenv("MAX_RETRIES", "2"))
+            )
+            frontier.start(
+                resume=os.getenv("CRAWL_RESUME", "true").lower() == "true",
+                retry_failed=os.getenv("CRAWL_RETRY_FAILED", "").lower() == "true"
+            )
         
-        # Cleanup
-        await crawler.close()
-        await llm_provider.close()
+        try:
+            # Get URLs to crawl
+            lastmods = {}
+            urls = await get_urls_for_source(source, crawler, pool, html_discovery=frontier is None, lastmods=lastmods)
+            print(f"Found {len(urls)} URLs to crawl")
+            
+            # Skip pages the sitemap reports unchanged since the last crawl;
+            # the rest are fetched conditionally against their stored validators
+            start_url = canonicalize_url(source.base_url)
+            crawl_states = None
+            if is_incremental_crawl():
+                crawl_states = await load_crawl_states(urls)
+                changed_urls = filter_changed_urls(urls, crawl_states, lastmods=lastmods)
+                if frontier is not None:
+                    # Don't fetch unchanged pages when links lead to them either
+                    changed = set(changed_urls)
+                    frontier.add_many([url for url in urls if url not in changed and url != start_url], state=DONE)
+                urls = changed_urls
+            
+            if frontier is not None:
+                # Link discovery starts from the base URL, so always fetch its content
+                urls = [start_url] + [url for url in urls if url != start_url]
+                if crawl_states:
+                    crawl_states.pop(start_url, None)
+            
+            await crawl_parallel(
+                urls,
+                source,
+                max_concurrent=int(os.getenv("CRAWL_CONCURRENCY", str(pool.size))),
+                crawler=crawler,
+                pool=pool,
+                frontier=frontier,
+                crawl_states=crawl_states
+            )
+        finally:
+            # Cleanup
+            if frontier is not None:
+                frontier.close()
+            await pool.close()
+            await crawler.close()
+            await llm_provider.close()
+            await close_pg_pool()
         
     except Exception as e:
         print(f"Error in main: {e}")
@@ -1,40 +1,72 @@
 import asyncio
-import re
 import os
 import sys
 # Add src directory to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
-from typing import Set, Dict, Any, Optional, List, Tuple
-from urllib.parse import urljoin, urlparse
-from bs4 import BeautifulSoup, Tag
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+from urllib.parse import urlparse
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
 from crawl4ai.extraction_strategy import JsonCssExtractionStrategy
 import datetime
 from dotenv import load_dotenv
 
 # Import common modules
-from crawler.common.storage import store_chunks
+from crawler.common.storage import store_chunks, close_pg_pool
 from crawler.common.text_processing import ProcessedChunk
 from crawler.common.llm_provider import LLMProvider
-from crawler.common.processing import process_chunk
+from crawler.common.processing import process_chunks
+from crawler.common.frontier import CrawlFrontier, DONE, IN_FLIGHT, run_frontier_workers
+from crawler.common.politeness import PolitenessScheduler
+from crawler.common.fetching import HttpFirstFetcher, FetchResult
+from crawler.common.browser_pool import BrowserContextPool
+from crawler.common.dedup import NearDuplicateIndex, is_near_duplicate_detection
+from crawler.common.urls import canonicalize_url, get_canonical_url, VisitedSet
+from crawler.common.html_parsing import ParsedPage, transform_page, clean_text
+from crawler.common.cpu_pool import CpuWorkerPool
 
 class GenericCrawler:
     def __init__(self, 
                  start_url: str, 
                  max_pages: int = 100,
                  min_content_length: int = 100,
-                 chunk_size: int = 5000,
                  max_retries: int = 3,
-                 delay_between_requests: float = 0.5):
-        self.start_url = start_url
+                 delay_between_requests: float = 0.5,
+                 max_depth: Optional[int] = None,
+                 resume: bool = True,
+                 retry_failed: bool = False,
+                 workers: int = 4):
+        self.start_url = canonicalize_url(start_url)
         self.max_pages = max_pages
-        self.chunk_size = chunk_size
         self.max_retries = max_retries
         self.delay_between_requests = delay_between_requests
-        self.visited_urls: Set[str] = set()
+        self.max_depth = max_depth
+        self.resume = resume
+        self.retry_failed = retry_failed
+        self.workers = max(1, workers)
+        # Every URL queued or crawled this run, so known links skip the frontier lookup
+        self.visited_urls = VisitedSet()
         self.failed_urls: Dict[str, str] = {}  # URL -> error message
-        self.base_domain = urlparse(start_url).netloc
+        self.base_domain = urlparse(self.start_url).netloc
+        
+        # URL states live on disk so an interrupted crawl can resume
+        self.frontier = CrawlFrontier(crawl_id=self.start_url, max_attempts=max_retries)
+        
+        # Per-host delay, robots.txt rules and slowdown on 429/503.
+        # We crawl a single domain, so by default every worker may use it.
+        self.scheduler = PolitenessScheduler(
+            per_host_concurrency=int(os.getenv("PER_HOST_CONCURRENCY", str(self.workers))),
+            delay=delay_between_requests
+        )
+        
+        # Copies of a page under other URLs are crawled for links but not stored
+        self.dedup = NearDuplicateIndex(self.base_domain) if is_near_duplicate_detection() else None
+        
+        # Parsing, markdown conversion and chunking run in worker processes
+        self.cpu_pool = CpuWorkerPool()
+        
+        # Static pages are fetched over HTTP, the browser only renders JavaScript shells
+        self.fetcher = HttpFirstFetcher(cpu_pool=self.cpu_pool)
         
         # Configure Crawl4AI
         self.browser_config = BrowserConfig(
@@ -44,68 +76,39 @@ class GenericCrawler:
         
     def is_same_domain(self, url: str) -> bool:
         """Check if URL belongs to the same domain we're crawling"""
-        return urlparse(url).netloc == self.base_domain
+        return urlparse(canonicalize_url(url)).netloc == self.base_domain
         
     def normalize_url(self, url: str, base_url: str) -> str:
-        """Normalize URL to absolute form"""
-        # Remove fragments and query parameters
-        url = url.split('#')[0].split('?')[0]
-        # Convert to absolute URL
-        normalized = urljoin(base_url, url)
-        # Remove trailing slashes for consistency
-        return normalized.rstrip('/')
+        """Normalize URL to absolute, canonical form"""
+        return canonicalize_url(url, base_url)
         
     def clean_content(self, content: str) -> str:
         """Clean and normalize content"""
-        # Remove excessive whitespace
-        content = re.sub(r'\s+', ' ', content)
-        # Remove empty lines
-        content = '\n'.join(
-            line.strip() for line in content.split('\n') 
-            if line.strip()
-        )
-        return content.strip()
-        
-    async def extract_links(self, html_content: str, current_url: str) -> Set[str]:
-        """Extract and normalize all links from a page"""
-        links = set()
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find all links
-        for a_tag in soup.find_all('a', href=True):
-            href = a_tag['href']
-            # Skip non-http links and anchors
-            if href.startswith(('http://', 'https://', '/')):
-                try:
-                    normalized_url = self.normalize_url(href, current_url)
-                    links.add(normalized_url)
-                except Exception:
-                    continue
-                
-        return links
+        return clean_text(content)
         
-    async def process_page(self, url: str, content: str) -> Dict[str, Any]:
-        """Process a single page and extract relevant information"""
-        soup = BeautifulSoup(content, 'html.parser')
-        
-        # Get title
-        title = ""
-        title_tag = soup.find('title')
-        if title_tag:
-            title = title_tag.text.strip()
-        else:
-            h1_tag = soup.find('h1')
-            if h1_tag:
-                title = h1_tag.text.strip()
+    async def parse_page(self, result: FetchResult) -> ParsedPage:
+        """Get a fetched page's title, text, links, fingerprint and chunks from one parse of its HTML
         
-        # Get content (entire page)
-        clean_text = self.clean_content(soup.get_text())
+        The text comes from the page's markdown, and links crawl4ai already
+        extracted are reused, so the HTML is only parsed for what is missing.
+        Runs in a worker process.
+        """
+        return await self.cpu_pool.run(
+            transform_page,
+            result.html,
+            result.url,
+            result.markdown,
+            result.links,
+            self.dedup.min_words if self.dedup else None
+        )
         
+    async def process_page(self, url: str, page: ParsedPage) -> Dict[str, Any]:
+        """Process a single page and extract relevant information"""
         # Structure the page data
         page_data = {
             "url": url,
-            "title": title,
-            "chunks": [{"text": clean_text}],
+            "title": page.title,
+            "chunks": [{"text": chunk} for chunk in page.chunks],
             "metadata": {
                 "domain": self.base_domain,
                 "crawl_time": datetime.datetime.now().isoformat(),
@@ -115,67 +118,125 @@ class GenericCrawler:
         
         return page_data
         
-    async def crawl(self) -> Dict[str, Any]:
-        """Main crawling logic"""
+    async def crawl_url(self,
+                        crawler: AsyncWebCrawler,
+                        run_config: CrawlerRunConfig,
+                        current_url: str,
+                        depth: int,
+                        results: Dict[str, Any],
+                        page_handler: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+                        pool: Optional[BrowserContextPool] = None) -> bool:
+        """Crawl one claimed URL and record the outcome in the frontier. Returns True on success."""
+        if not await self.scheduler.is_allowed(current_url):
+            print(f"Skipping {current_url}: disallowed by robots.txt")
+            self.frontier.mark_failed(current_url, "disallowed by robots.txt", retry=False)
+            return False
+            
+        print(f"Crawling: {current_url} (depth {depth})")
+        
+        try:
+            # Crawl the page once the host's delay allows
+            async with self.scheduler.slot(current_url):
+                result = await self.fetcher.fetch(current_url, crawler, run_config, pool)
+            self.scheduler.report(current_url, result.status_code, result.response_headers)
+            if result.status_code in PolitenessScheduler.SLOWDOWN_STATUSES:
+                raise RuntimeError(f"throttled with status {result.status_code}")
+            if not result.success:
+                raise RuntimeError(result.error_message or "crawl failed")
+                
+            # The page may be known by another URL, through a redirect or <link rel="canonical">
+            page_url = get_canonical_url(current_url, result.url, result.html)
+            if page_url != current_url and self.is_same_domain(page_url):
+                self.visited_urls.add(page_url)
+                if self.frontier.get_state(page_url) in (DONE, IN_FLIGHT):
+                    print(f"Skipping {current_url}: same page as {page_url}")
+                    self.frontier.mark_done(current_url)
+                    return True
+            else:
+                page_url = current_url
+                
+            # Process the page, unless it is a copy of one we already have
+            page = await self.parse_page(result)
+            canonical = self.dedup.check_fingerprint(page_url, page.fingerprint) if self.dedup else None
+            if canonical:
+                print(f"Skipping {page_url}: near-duplicate of {canonical}")
+            else:
+                page_data = await self.process_page(page_url, page)
+                if page_handler:
+                    await page_handler(page_url, page_data)
+                results[page_url] = page_data
+            
+            # Queue new links one level deeper
+            if self.max_depth is None or depth < self.max_depth:
+                self.frontier.add_many(
+                    (url for url in page.links if self.is_same_domain(url) and self.visited_urls.add(url)),
+                    depth=depth + 1
+                )
+            
+            if page_url != current_url:
+                # Don't crawl the canonical URL again when we reach it through a link
+                self.frontier.add(page_url, depth)
+                self.frontier.mark_done(page_url)
+            self.frontier.mark_done(current_url)
+            return True
+            
+        except Exception as e:
+            if self.frontier.mark_failed(current_url, str(e)):
+                print(f"Error crawling {current_url}, will retry: {e}")
+            else:
+                print(f"Error crawling {current_url} after {self.max_retries} attempts: {e}")
+                self.failed_urls[current_url] = str(e)
+            return False
+        
+    async def crawl(self, page_handler: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """Main crawling logic
+        
+        Runs self.workers workers over the shared frontier and one browser.
+        page_handler, if given, is awaited with each page as it is crawled, and
+        the page only counts as done once it returns. Pages crawled before a
+        restart are not crawled again, so results only holds this run's pages.
+        """
         results = {}
         
+        self.frontier.start(resume=self.resume, retry_failed=self.retry_failed)
+        self.frontier.add(self.start_url, depth=0)
+        self.visited_urls.add(self.start_url)
+        
+        # Pages done in earlier runs count towards max_pages
+        pages_done = self.frontier.get_counts()["done"]
+        
+        # Configure the crawler run
+        run_config = CrawlerRunConfig(
+            cache_mode=CacheMode.BYPASS,
+            word_count_threshold=1,
+            page_timeout=30000  # 30 second timeout
+        )
+        
         async with AsyncWebCrawler(config=self.browser_config) as crawler:
-            urls_to_visit = {self.start_url}
+            # Each worker rendering a page leases its own browser context
+            pool = BrowserContextPool(crawler, size=self.workers)
             
-            while urls_to_visit and len(self.visited_urls) < self.max_pages:
-                current_url = urls_to_visit.pop()
+            async def crawl_page(current_url: str, depth: int) -> bool:
+                return await self.crawl_url(crawler, run_config, current_url, depth, results, page_handler, pool)
                 
-                if current_url in self.visited_urls:
-                    continue
-                    
-                print(f"Crawling: {current_url}")
-                
-                # Implement retry logic
-                for attempt in range(self.max_retries):
-                    try:
-                        # Configure the crawler run
-                        run_config = CrawlerRunConfig(
-                            cache_mode=CacheMode.BYPASS,
-                            word_count_threshold=1,
-                            page_timeout=30000  # 30 second timeout
-                        )
-                        
-                        # Crawl the page
-                        result = await crawler.arun(current_url, config=run_config)
-                        
-                        if result.success:
-                            # Process the page
-                            page_data = await self.process_page(current_url, result.markdown)
-                            results[current_url] = page_data
-                            
-                            # Extract new links
-                            new_links = await self.extract_links(result.markdown, current_url)
-                            urls_to_visit.update(
-                                url for url in new_links 
-                                if url not in self.visited_urls 
-                                and self.is_same_domain(url)
-                            )
-                            
-                            # Success - break retry loop
-                            break
-                            
-                    except Exception as e:
-                        if attempt == self.max_retries - 1:  # Last attempt
-                            print(f"Error crawling {current_url} after {self.max_retries} attempts: {e}")
-                            self.failed_urls[current_url] = str(e)
-                        await asyncio.sleep(self.delay_between_requests * (attempt + 1))
-                        continue
-                    
-                self.visited_urls.add(current_url)
-                await asyncio.sleep(self.delay_between_requests)
-                    
+            try:
+                await run_frontier_workers(self.frontier, crawl_page, self.workers, self.max_pages, pages_done)
+            finally:
+                print(f"Browser contexts: {pool.get_stats()}")
+                await pool.close()
+        
+        print(f"Fetching: {self.fetcher.get_stats()}")
+        print(f"CPU workers: {self.cpu_pool.get_stats()}")
+        counts = self.frontier.get_counts()
         return {
             "results": results,
             "stats": {
-                "total_pages_crawled": len(self.visited_urls),
-                "successful_pages": len(results),
-                "failed_pages": len(self.failed_urls),
-                "failed_urls": self.failed_urls
+                "total_pages_crawled": counts["done"] + counts["failed"],
+                "successful_pages": counts["done"],
+                "failed_pages": counts["failed"],
+                "queued_pages": counts["queued"],
+                "duplicate_pages": self.dedup.get_stats()["duplicates"] if self.dedup else 0,
+                "failed_urls": self.frontier.get_failed()
             }
         }
 
@@ -187,9 +248,12 @@ async def main():
     start_url = os.getenv("CURRENT_SOURCE")
     max_pages = int(os.getenv("MAX_PAGES", "50"))
     min_content_length = int(os.getenv("MIN_CONTENT_LENGTH", "200"))
-    chunk_size = int(os.getenv("CHUNK_SIZE", "5000"))
     max_retries = int(os.getenv("MAX_RETRIES", "2"))
     delay_between_requests = float(os.getenv("DELAY_BETWEEN_REQUESTS", "0.5"))
+    max_depth = int(os.getenv("MAX_DEPTH")) if os.getenv("MAX_DEPTH") else None
+    resume = os.getenv("CRAWL_RESUME", "true").lower() == "true"
+    retry_failed = os.getenv("CRAWL_RETRY_FAILED", "").lower() == "true"
+    workers = int(os.getenv("CRAWL_WORKERS", "4"))
     
     if not start_url:
         print("Error: CURRENT_SOURCE not set in .env file")
@@ -199,9 +263,11 @@ async def main():
     print(f"Configuration:")
     print(f"- Max pages: {max_pages}")
     print(f"- Min content length: {min_content_length}")
-    print(f"- Chunk size: {chunk_size}")
     print(f"- Max retries: {max_retries}")
-    print(f"- Delay between requests: {delay_between_requests}s\n")
+    print(f"- Delay between requests: {delay_between_requests}s")
+    print(f"- Max depth: {max_depth if max_depth is not None else 'unlimited'}")
+    print(f"- Workers: {workers}")
+    print(f"- Resume: {resume}, retry failed: {retry_failed}\n")
     
     # Initialize LLM provider
     llm_provider = LLMProvider()
@@ -211,25 +277,26 @@ async def main():
         start_url=start_url,
         max_pages=max_pages,
         min_content_length=min_content_length,
-        chunk_size=chunk_size,
         max_retries=max_retries,
-        delay_between_requests=delay_between_requests
+        delay_between_requests=delay_between_requests,
+        max_depth=max_depth,
+        resume=resume,
+        retry_failed=retry_failed,
+        workers=workers
     )
     
+    async def store_page(url: str, data: Dict[str, Any]):
+        # Store each page as it is crawled so a resumed crawl doesn't lose it
+        chunks = data.get('chunks', [])
+        processed_chunks = await process_chunks(
+            [chunk['text'] for chunk in chunks],
+            url,
+            llm_provider
+        )
+        await store_chunks(processed_chunks)
+    
     try:
-        results = await crawler.crawl()
-        
-        # Process and store results using common modules
-        for url, data in results['results'].items():
-            chunks = data.get('chunks', [])
-            for i, chunk in enumerate(chunks):
-                processed_chunk = await process_chunk(
-                    chunk['text'], 
-                    i,
-                    url,
-                    llm_provider
-                )
-                await store_chunks([processed_chunk])
+        results = await crawler.crawl(page_handler=store_page)
         
         # Print summary
         print(f"\nCrawl Summary:")
@@ -244,7 +311,13 @@ async def main():
                 
     finally:
         # Cleanup
+        crawler.frontier.close()
+        if crawler.dedup:
+            crawler.dedup.close()
+        await crawler.fetcher.close()
+        crawler.cpu_pool.close()
         await llm_provider.close()
+        await close_pg_pool()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -8,16 +8,21 @@ src_dir = str(Path(__file__).parent.parent.parent)
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
+import io
 import asyncio
 import httpx
 from dotenv import load_dotenv
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
 
-from crawler.common.text_processing import chunk_text, RawContent, ProcessedChunk
-from crawler.common.storage import store_chunks, supabase
+from crawler.common.text_processing import iter_chunks, RawContent, ProcessedChunk
+from crawler.common.embedding_columns import embedding_column
+from crawler.common.storage import store_chunks, close_pg_pool, supabase, load_document_chunks, delete_stale_chunks, set_document_fields, load_file_shas, get_source_branch
+from crawler.common.storage_writer import StorageWriter
 from crawler.common.llm_provider import LLMProvider
-from crawler.common.processing import process_chunk, get_title_and_summary
+from crawler.common.processing import process_changed_chunks, has_processing_errors, llm_scheduler
+from crawler.common.crawl_state import is_incremental_crawl
+from crawler.common.github_client import GitHubClient, RAW_ACCEPT, iter_archive_files
 
 # Force reload of .env file
 load_dotenv(override=True)
@@ -36,77 +41,99 @@ if not REPO_URL:
     raise ValueError("CURRENT_SOURCE_BASE_URL environment variable not set")
 print(f"Using repository: {REPO_URL}")
 
-# Initialize HTTP client
-client = httpx.AsyncClient()
-headers = {"Authorization": f"token {GITHUB_TOKEN}"}
+# Initialize GitHub API client: concurrent, rate-limit aware, with conditional requests
+github = GitHubClient(GITHUB_TOKEN)
 
-async def get_repo_structure(repo_url: str) -> List[str]:
-    """Get the repository structure."""
-    # Extract owner and repo from URL
+# Files that never hold text worth indexing
+BINARY_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".pdf",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".jar", ".whl",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+    ".mp3", ".mp4", ".wav", ".ogg", ".mov", ".avi", ".webm",
+    ".exe", ".dll", ".so", ".dylib", ".bin", ".pyc", ".class", ".o"
+)
+
+def parse_repo_url(repo_url: str) -> Tuple[str, str]:
+    """Get the owner and repository name from a repository URL."""
     parts = repo_url.rstrip("/").split("/")
-    owner = parts[-2]
-    repo = parts[-1]
-
-    # Try main branch first, then master
-    for branch in ['main', 'master']:
-        try:
-            # Set up GitHub API request
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}?recursive=1"
-            print(f"Fetching repo structure from: {api_url}")
-            
-            response = await client.get(api_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            if data.get("truncated", False):
-                print("Warning: Repository tree was truncated due to size!")
-
-            # Extract file paths
-            files = [item["path"] for item in data["tree"] if item["type"] == "blob"]
-            print(f"Found {len(files)} files in repository")
-            return files
-
-        except Exception as e:
-            if branch == 'master':  # Only print error if both branches fail
-                print(f"Error getting repo structure: {e}")
-                if isinstance(e, httpx.HTTPStatusError):
-                    print(f"HTTP Status: {e.response.status_code}")
-                    print(f"Response: {e.response.text}")
+    return parts[-2], parts[-1]
+
+async def get_default_branch(repo_url: str) -> str:
+    """Get the repository's default branch, falling back to main."""
+    owner, repo = parse_repo_url(repo_url)
+    try:
+        data = await github.get_json(f"https://api.github.com/repos/{owner}/{repo}")
+        return data["default_branch"]
+    except Exception as e:
+        print(f"Error getting default branch, assuming main: {e}")
+        return "main"
+
+async def get_repo_structure(repo_url: str, branch: str) -> Optional[Dict[str, str]]:
+    """Get the repository structure, mapping each file worth processing to its blob SHA.
     
-    return []
+    Files over REPO_MAX_FILE_BYTES and files with binary extensions are left
+    out. Returns None if the tree can't be read.
+    """
+    max_file_bytes = int(os.getenv("REPO_MAX_FILE_BYTES", "1000000"))
+    try:
+        print(f"Fetching repo structure for branch {branch}")
+        owner, repo = parse_repo_url(repo_url)
+        blobs = await github.walk_tree(owner, repo, branch)
+    except Exception as e:
+        print(f"Error getting repo structure: {e}")
+        if isinstance(e, httpx.HTTPStatusError):
+            print(f"HTTP Status: {e.response.status_code}")
+            print(f"Response: {e.response.text}")
+        return None
+        
+    files = {
+        item["path"]: item["sha"] for item in blobs
+        if 0 < item.get("size", 0) <= max_file_bytes
+        and not item["path"].lower().endswith(BINARY_EXTENSIONS)
+    }
+    print(f"Found {len(files)} files in repository ({len(blobs) - len(files)} binary, empty or too large)")
+    return files
 
-async def get_file_content(repo_url: str, file_path: str) -> str:
+async def get_file_content(repo_url: str, file_path: str, branch: str) -> str:
     """Get the content of a file from the repository."""
-    # Extract owner and repo from URL
-    parts = repo_url.rstrip("/").split("/")
-    owner = parts[-2]
-    repo = parts[-1]
-
-    # Try main branch first, then master
-    for branch in ['main', 'master']:
-        try:
-            # Set up GitHub API request
-            api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}?ref={branch}"
-
-            response = await client.get(api_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
-
-            # Get raw content
-            if "content" in data:
-                import base64
-                content = base64.b64decode(data["content"]).decode("utf-8")
-                return content
-            return ""
-
-        except Exception as e:
-            if branch == 'master':  # Only print error if both branches fail
-                print(f"Error getting file content: {e}")
+    owner, repo = parse_repo_url(repo_url)
+    try:
+        # Set up GitHub API request
+        api_url = f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}?ref={branch}"
+
+        # Ask for the raw file instead of base64 JSON. The blob SHA already
+        # tells whether it changed, so don't keep a conditional copy of it.
+        data = await github.get(api_url, accept=RAW_ACCEPT, conditional=False)
+        return data.decode("utf-8")
+
+    except Exception as e:
+        print(f"Error getting file content: {e}")
     
     return ""
 
-async def process_and_store_document(content: str, file_path: str, repo_url: str):
-    """Process a document and store its chunks."""
+async def download_repo_archive(repo_url: str, branch: str) -> io.BytesIO:
+    """Download the repository at a branch as a single tarball, kept in memory."""
+    owner, repo = parse_repo_url(repo_url)
+    api_url = f"https://api.github.com/repos/{owner}/{repo}/tarball/{branch}"
+    print(f"Downloading repository archive from: {api_url}")
+    
+    archive = io.BytesIO()
+    # GitHub redirects to the archive host
+    async with github.stream(api_url) as response:
+        async for data in response.aiter_bytes():
+            archive.write(data)
+    archive.seek(0)
+    print(f"Downloaded {archive.getbuffer().nbytes} bytes")
+    return archive
+
+async def process_and_store_document(content: str, file_path: str, repo_url: str, writer: Optional[StorageWriter] = None, branch: str = "main", blob_sha: Optional[str] = None):
+    """Process a document and store its chunks, through the write-behind writer if given.
+    
+    On incremental syncs, chunks the file already had keep their stored rows.
+    Once all of the file's chunks are stored without LLM errors, every row of
+    the file is stamped with its new blob SHA, so an interrupted or failed
+    sync leaves the old SHA and the file is processed again next time.
+    """
     try:
         # Create metadata
         metadata = {
@@ -114,29 +141,49 @@ async def process_and_store_document(content: str, file_path: str, repo_url: str
             "owner": os.getenv("CURRENT_SOURCE_OWNER"),
             "file_path": file_path,
             "repository": repo_url,
+            "branch": branch,
             "crawled_at": datetime.now().isoformat()
         }
+        match = {"repo_url": repo_url, "branch": get_source_branch(), "file_path": file_path}
 
         # Split into chunks
-        chunks = chunk_text(content)
+        chunks = list(iter_chunks(content))
         print(f"\nProcessing {len(chunks)} chunks for {file_path}")
         
-        # Process chunks in parallel
-        tasks = [
-            process_chunk(
-                chunk, 
-                i, 
-                f"{repo_url}/blob/main/{file_path}", 
-                llm_provider,
-                metadata=metadata
-            ) 
-            for i, chunk in enumerate(chunks)
-        ]
-        processed_chunks = await asyncio.gather(*tasks)
+        # Process chunks, embedding them in batches and reusing unchanged ones
+        stored_rows = []
+        if is_incremental_crawl():
+            stored_rows = await load_document_chunks(match, embedding_column(llm_provider.EMBEDDING_DIMENSION))
+        processed_chunks = await process_changed_chunks(
+            chunks,
+            f"{repo_url}/blob/{branch}/{file_path}",
+            llm_provider,
+            stored_rows,
+            metadata=metadata
+        )
+        
+        async def stamp_sha():
+            # Marks the file as synced at this version
+            await set_document_fields(match, {"blob_sha": blob_sha})
+        
+        complete = blob_sha is not None and not any(
+            has_processing_errors(chunk.title, chunk.summary, chunk.embedding) for chunk in processed_chunks
+        )
+        if blob_sha and not complete:
+            print(f"LLM errors in {file_path}, it will be processed again on the next sync")
         
         # Store chunks - properly awaiting the async function
-        await store_chunks(processed_chunks)
-        print(f"Successfully stored {len(processed_chunks)} chunks for {file_path}")
+        if writer:
+            await writer.put(processed_chunks, on_stored=stamp_sha if complete else None)
+            print(f"Queued {len(processed_chunks)} chunks for {file_path}")
+        elif await store_chunks(processed_chunks):
+            print(f"Successfully stored {len(processed_chunks)} chunks for {file_path}")
+            if complete:
+                await stamp_sha()
+        print(f"LLM queue: {llm_scheduler.get_queue_depth()}")
+        
+        # Drop rows left over from a longer version of the file
+        await delete_stale_chunks(match, len(chunks))
         
     except Exception as e:
         print(f"\nError processing document {file_path}:")
@@ -144,7 +191,6 @@ async def process_and_store_document(content: str, file_path: str, repo_url: str
         print(f"Error message: {str(e)}")
         print(f"Processing state:")
         print(f"- Chunks created: {len(chunks) if 'chunks' in locals() else 'Not created'}")
-        print(f"- Tasks created: {len(tasks) if 'tasks' in locals() else 'Not created'}")
         print(f"- Processed chunks: {len(processed_chunks) if 'processed_chunks' in locals() else 'Not created'}")
         print("Full traceback:")
         print(traceback.format_exc())
@@ -170,21 +216,79 @@ async def check_source_exists(source_name: str) -> bool:
         return False
 
 async def download_repo(repo_url: str):
-    """Download all files from a repository."""
+    """Download all files from a repository.
+    
+    Each file's blob SHA from the git tree is compared with the SHA stored
+    with its rows, so only added and changed files are processed and rows of
+    removed files are deleted. Set INCREMENTAL_CRAWL=false to process every
+    file. Many changed files are read from one tarball download (unless
+    REPO_FETCH_MODE=api), a few are fetched one by one through the contents
+    API.
+    """
     try:
+        branch = await get_default_branch(repo_url)
+        print(f"Using branch: {branch}")
+        
         # Get repository structure
         print(f"Getting structure for {repo_url}...")
-        files = await get_repo_structure(repo_url)
-        print(f"Found {len(files)} files")
+        files = await get_repo_structure(repo_url, branch)
+        if files is None:
+            print("Could not read the repository tree, nothing synced")
+            return
+        
+        # Compare blob SHAs with the last sync
+        match = {"repo_url": repo_url, "branch": get_source_branch()}
+        stored_shas = await load_file_shas(match) if is_incremental_crawl() else {}
+        changed = {path: sha for path, sha in files.items() if stored_shas.get(path) != sha}
+        removed = [path for path in stored_shas if path not in files]
+        print(f"{len(changed)} files added or changed, {len(removed)} removed, {len(files) - len(changed)} unchanged")
+        
+        for file_path in removed:
+            print(f"Deleting rows of removed file {file_path}")
+            await delete_stale_chunks(dict(match, file_path=file_path), 0)
+        if not changed:
+            return
+        
+        archive = None
+        archive_threshold = int(os.getenv("REPO_ARCHIVE_MIN_FILES", "50"))
+        if os.getenv("REPO_FETCH_MODE", "archive").lower() == "archive" and len(changed) >= archive_threshold:
+            try:
+                archive = await download_repo_archive(repo_url, branch)
+            except Exception as e:
+                print(f"Error downloading repository archive, falling back to the contents API: {e}")
+        
+        # Changed files the archive holds are read from it, the rest come from the contents API
+        contents = {}
+        if archive is not None:
+            contents = {
+                file_path: content for file_path, content in iter_archive_files(archive)
+                if file_path in changed
+            }
+            print(f"Extracted {len(contents)}/{len(changed)} changed files from the archive")
         
-        # Download and process each file
-        for i, file_path in enumerate(files, 1):
-            print(f"\nDownloading {i}/{len(files)}: {file_path}")
-            content = await get_file_content(repo_url, file_path)
-            print(f"Downloaded {len(content)} characters")
+        # Process several files at once, storing chunks in the background; the client keeps within the rate limit
+        semaphore = asyncio.Semaphore(int(os.getenv("REPO_FILE_CONCURRENCY", str(github.concurrency))))
+        async with StorageWriter() as writer:
+            async def sync_file(i: int, file_path: str, blob_sha: str):
+                async with semaphore:
+                    if archive is not None:
+                        content = contents.pop(file_path, "")
+                        print(f"\nProcessing {i}/{len(changed)}: {file_path} ({len(content)} characters)")
+                    else:
+                        print(f"\nDownloading {i}/{len(changed)}: {file_path}")
+                        content = await get_file_content(repo_url, file_path, branch)
+                        print(f"Downloaded {len(content)} characters")
+                    if not content:
+                        # Keep the stored rows; the file is retried on the next sync
+                        return
+                    
+                    # Process and store the content
+                    await process_and_store_document(content, file_path, repo_url, writer, branch, blob_sha)
             
-            # Process and store the content
-            await process_and_store_document(content, file_path, repo_url)
+            await asyncio.gather(*[
+                sync_file(i, file_path, blob_sha)
+                for i, (file_path, blob_sha) in enumerate(changed.items(), 1)
+            ])
     
     except Exception as e:
         print(f"Error downloading repo: {e}")
@@ -211,8 +315,10 @@ async def main():
         print(f"Error: {e}")
     
     finally:
-        await client.aclose()
+        print(f"GitHub API: {github.get_stats()}")
+        await github.close()
         await llm_provider.close()
+        await close_pg_pool()
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
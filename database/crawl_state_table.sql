@@ -0,0 +1,41 @@
+-- Create the crawl state table
+--  Tracks what each crawled URL looked like last time so recrawls can send
+--  conditional requests and skip pages whose content hasn't changed.
+
+create table crawl_state (
+    url text primary key,                                       -- Crawled URL
+    source text,                                                -- Source name (CURRENT_SOURCE_NAME)
+    etag text,                                                  -- ETag from the last fetch
+    last_modified text,                                         -- Last-Modified from the last fetch
+    content_hash text,                                          -- sha256 of the extracted markdown
+    status_code integer,                                        -- HTTP status of the last check
+    last_checked_at timestamp with time zone default timezone('utc'::text, now()) not null,  -- Last request
+    last_changed_at timestamp with time zone default timezone('utc'::text, now()) not null   -- Last content change
+);
+
+-- Create indexes for common queries
+create index idx_crawl_state_source on crawl_state(source);
+create index idx_crawl_state_checked on crawl_state(last_checked_at);
+
+-- Enable RLS
+alter table crawl_state enable row level security;
+
+-- Create a policy that allows anyone to read
+create policy "Allow public read access"
+  on crawl_state
+  for select
+  to public
+  using (true);
+
+-- Create a policy that allows authenticated users to insert/update
+create policy "Allow authenticated insert"
+  on crawl_state
+  for insert
+  to authenticated
+  with check (true);
+
+create policy "Allow authenticated update"
+  on crawl_state
+  for update
+  to authenticated
+  using (true);
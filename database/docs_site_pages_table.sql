@@ -9,6 +9,8 @@
 -- Enable the pgvector extension
 create extension if not exists vector;
 
+-- Run embedding_dimensions.sql first: match functions use its embedding_column() helper
+
 -- Create the documentation chunks table
 create table dev_docs_site_pages (
     id bigserial primary key,
@@ -21,7 +23,8 @@ create table dev_docs_site_pages (
                                                                -- ↳ source: str
                                                                -- ↳ owner: str
                                                                -- ↳ crawled_at: timestamp
-    embedding vector(1536) not null,                           -- Content embedding
+    embedding vector(1536),                                    -- Content embedding (1536-dim models)
+    embedding_768 vector(768),                                 -- Content embedding (768-dim models, e.g. nomic-embed-text)
     embedding_model varchar not null,                          -- Model used for embedding
     document_creation_date timestamp with time zone,           -- Original doc date
     document_crawl_date timestamp with time zone default timezone('utc'::text, now()) not null,  -- Last crawl date
@@ -33,6 +36,7 @@ create table dev_docs_site_pages (
 
 -- Create an index for better vector similarity search performance
 create index on dev_docs_site_pages using ivfflat (embedding vector_cosine_ops);
+create index on dev_docs_site_pages using ivfflat (embedding_768 vector_cosine_ops);
 
 -- Create an index on metadata for faster filtering
 create index idx_dev_docs_site_pages_metadata on dev_docs_site_pages using gin (metadata);
@@ -43,10 +47,14 @@ create index idx_dev_docs_site_pages_created on dev_docs_site_pages(created_at);
 create index idx_dev_docs_site_pages_crawl_date on dev_docs_site_pages(document_crawl_date);
 
 -- Create a function to search for documentation chunks
+drop function if exists match_dev_docs_site_pages(vector, int, jsonb);
+drop function if exists match_dev_docs_site_pages(vector, int, jsonb, text, int);
 create function match_dev_docs_site_pages (
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default null,                          -- 'halfvec' or 'binary', see quantized_embeddings.sql
+  rerank_factor int default 4                              -- Candidates fetched per result when quantized
 ) returns table (
     id bigint,
     url varchar,
@@ -62,25 +70,33 @@ create function match_dev_docs_site_pages (
 )
 language plpgsql
 as $$
-#variable_conflict use_column
 begin
-  return query
-  select
-    id,
-    url,
-    chunk_number,
-    title,
-    summary,
-    content,
-    metadata,
-    document_creation_date,
-    document_crawl_date,
-    created_at,
-    1 - (dev_docs_site_pages.embedding <=> query_embedding) as similarity
-  from dev_docs_site_pages
-  where metadata @> filter
-  order by dev_docs_site_pages.embedding <=> query_embedding
-  limit match_count;
+  -- Find candidates in the column that holds embeddings of the query's dimension,
+  -- through the quantized index if asked, then re-rank them on the full vectors
+  return query execute format(
+    'select
+        id,
+        url,
+        chunk_number,
+        title,
+        summary,
+        content,
+        metadata,
+        document_creation_date,
+        document_crawl_date,
+        created_at,
+        1 - (%1$I <=> $1) as similarity
+      from (
+        select * from dev_docs_site_pages
+        where metadata @> $2 and %1$I is not null
+        order by %2$s
+        limit $4
+      ) dev_docs_site_pages
+      order by %1$I <=> $1
+      limit $3',
+    embedding_column(vector_dims(query_embedding)),
+    embedding_search_distance(embedding_column(vector_dims(query_embedding)), vector_dims(query_embedding), quantization)
+  ) using query_embedding, filter, match_count, match_count * greatest(rerank_factor, 1);
 end;
 $$;
 
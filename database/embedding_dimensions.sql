@@ -0,0 +1,47 @@
+-- Native embedding dimension support
+--  Run this once before the *_table.sql scripts.
+--  Open supabase studio.  localhost:3001
+--  Select SQL Editor from the left menu.
+--  Copy code from this script and paste into the editor window.
+--  Click Run.
+--
+-- Each vector table keeps one column per embedding dimension so vectors are
+-- stored at their real size instead of being padded to 1536:
+--   embedding       vector(1536)   -- 1536-dim models (e.g. OpenAI text-embedding-3-small)
+--   embedding_768   vector(768)    -- 768-dim models (e.g. nomic-embed-text)
+-- The match_* functions pick the column from the query vector's dimension.
+--
+-- To support another dimension, add an embedding_<dims> vector(<dims>) column
+-- and ivfflat index to each table. Existing installs can move their padded
+-- rows over with: python -m crawler.common.embedding_migration
+
+-- Enable the pgvector extension
+create extension if not exists vector;
+
+-- Get the column that stores embeddings of a given dimension
+create or replace function embedding_column(dims int)
+returns text
+language sql immutable
+as $$
+  select case when dims = 1536 then 'embedding' else 'embedding_' || dims end;
+$$;
+
+-- Get the distance expression used to find search candidates in a column.
+-- $1 stands for the query embedding. With a quantization ('halfvec' or
+-- 'binary', see quantized_embeddings.sql) the expression matches the compact
+-- expression index instead of the full-precision one.
+create or replace function embedding_search_distance(column_name text, dims int, quantization text default null)
+returns text
+language plpgsql immutable
+as $$
+begin
+  if quantization is null or quantization = 'none' then
+    return format('(%I <=> $1)', column_name);
+  elsif quantization = 'halfvec' then
+    return format('(%1$I::halfvec(%2$s) <=> $1::halfvec(%2$s))', column_name, dims);
+  elsif quantization = 'binary' then
+    return format('(binary_quantize(%1$I)::bit(%2$s) <~> binary_quantize($1))', column_name, dims);
+  end if;
+  raise exception 'Unknown quantization: %', quantization;
+end;
+$$;
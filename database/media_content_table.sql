@@ -1,6 +1,8 @@
 -- Enable the pgvector extension
 create extension if not exists vector;
 
+-- Run embedding_dimensions.sql first: match functions use its embedding_column() helper
+
 -- Create the media content table
 create table media_content (
     id bigserial primary key,
@@ -18,7 +20,8 @@ create table media_content (
                                                                -- ↳ views: int
                                                                -- ↳ likes: int
                                                                -- ↳ tags: string[]
-    embedding vector(1536) not null,                           -- Content embedding
+    embedding vector(1536),                                    -- Content embedding (1536-dim models)
+    embedding_768 vector(768),                                 -- Content embedding (768-dim models, e.g. nomic-embed-text)
     embedding_model varchar not null,                          -- Model used for embedding
     chunk_number integer not null,                             -- For chunked content
     publish_date timestamp with time zone,                     -- Original publish date
@@ -32,6 +35,7 @@ create table media_content (
 
 -- Create an index for better vector similarity search performance
 create index on media_content using ivfflat (embedding vector_cosine_ops);
+create index on media_content using ivfflat (embedding_768 vector_cosine_ops);
 
 -- Create an index on metadata for faster filtering
 create index idx_media_content_metadata on media_content using gin (metadata);
@@ -46,10 +50,14 @@ create index idx_media_content_created on media_content(created_at);
 create index idx_media_content_crawl_date on media_content(document_crawl_date);
 
 -- Create a function to search for media content
+drop function if exists match_media_content(vector, int, jsonb);
+drop function if exists match_media_content(vector, int, jsonb, text, int);
 create function match_media_content (
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default null,                          -- 'halfvec' or 'binary', see quantized_embeddings.sql
+  rerank_factor int default 4                              -- Candidates fetched per result when quantized
 ) returns table (
     id bigint,
     media_url text,
@@ -71,31 +79,39 @@ create function match_media_content (
 )
 language plpgsql
 as $$
-#variable_conflict use_column
 begin
-  return query
-  select
-    id,
-    media_url,
-    media_type,
-    platform,
-    author_id,
-    author_handle,
-    title,
-    description,
-    transcript,
-    summary,
-    metadata,
-    chunk_number,
-    publish_date,
-    document_creation_date,
-    document_crawl_date,
-    created_at,
-    1 - (media_content.embedding <=> query_embedding) as similarity
-  from media_content
-  where metadata @> filter
-  order by media_content.embedding <=> query_embedding
-  limit match_count;
+  -- Find candidates in the column that holds embeddings of the query's dimension,
+  -- through the quantized index if asked, then re-rank them on the full vectors
+  return query execute format(
+    'select
+        id,
+        media_url,
+        media_type,
+        platform,
+        author_id,
+        author_handle,
+        title,
+        description,
+        transcript,
+        summary,
+        metadata,
+        chunk_number,
+        publish_date,
+        document_creation_date,
+        document_crawl_date,
+        created_at,
+        1 - (%1$I <=> $1) as similarity
+      from (
+        select * from media_content
+        where metadata @> $2 and %1$I is not null
+        order by %2$s
+        limit $4
+      ) media_content
+      order by %1$I <=> $1
+      limit $3',
+    embedding_column(vector_dims(query_embedding)),
+    embedding_search_distance(embedding_column(vector_dims(query_embedding)), vector_dims(query_embedding), quantization)
+  ) using query_embedding, filter, match_count, match_count * greatest(rerank_factor, 1);
 end;
 $$;
 
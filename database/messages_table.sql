@@ -1,6 +1,8 @@
 -- Enable the pgvector extension
 create extension if not exists vector;
 
+-- Run embedding_dimensions.sql first: match functions use its embedding_column() helper
+
 -- Create the messages table
 create table messages (
     id bigserial primary key,
@@ -8,6 +10,7 @@ create table messages (
     role varchar not null,  -- 'user', 'assistant', 'system', etc.
     content text not null,
     embedding vector(1536),
+    embedding_768 vector(768),
     embedding_model varchar not null,
     conversation_id varchar not null,
     parent_message_id varchar,
@@ -20,6 +23,7 @@ create table messages (
 
 -- Create an index for better vector similarity search performance
 create index on messages using ivfflat (embedding vector_cosine_ops);
+create index on messages using ivfflat (embedding_768 vector_cosine_ops);
 
 -- Create an index on metadata for faster filtering
 create index idx_messages_metadata on messages using gin (metadata);
@@ -28,10 +32,14 @@ create index idx_messages_metadata on messages using gin (metadata);
 create index idx_messages_user_id on messages(user_id);
 
 -- Create a function to search for messages
+drop function if exists match_messages(vector, int, jsonb);
+drop function if exists match_messages(vector, int, jsonb, text, int);
 create function match_messages (
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default null,                          -- 'halfvec' or 'binary', see quantized_embeddings.sql
+  rerank_factor int default 4                              -- Candidates fetched per result when quantized
 ) returns table (
     id bigint,
     user_id varchar,  -- Added to return value
@@ -45,23 +53,31 @@ create function match_messages (
 )
 language plpgsql
 as $$
-#variable_conflict use_column
 begin
-  return query
-  select
-    id,
-    user_id,  -- Added to select
-    role,
-    content,
-    conversation_id,
-    parent_message_id,
-    metadata,
-    created_at,
-    1 - (messages.embedding <=> query_embedding) as similarity
-  from messages
-  where metadata @> filter
-  order by messages.embedding <=> query_embedding
-  limit match_count;
+  -- Find candidates in the column that holds embeddings of the query's dimension,
+  -- through the quantized index if asked, then re-rank them on the full vectors
+  return query execute format(
+    'select
+        id,
+        user_id,  -- Added to select
+        role,
+        content,
+        conversation_id,
+        parent_message_id,
+        metadata,
+        created_at,
+        1 - (%1$I <=> $1) as similarity
+      from (
+        select * from messages
+        where metadata @> $2 and %1$I is not null
+        order by %2$s
+        limit $4
+      ) messages
+      order by %1$I <=> $1
+      limit $3',
+    embedding_column(vector_dims(query_embedding)),
+    embedding_search_distance(embedding_column(vector_dims(query_embedding)), vector_dims(query_embedding), quantization)
+  ) using query_embedding, filter, match_count, match_count * greatest(rerank_factor, 1);
 end;
 $$;
 
@@ -0,0 +1,65 @@
+-- Quantized vector search
+--  Requires pgvector 0.7.0 or newer. Run embedding_dimensions.sql first.
+--  Open supabase studio.  localhost:3001
+--  Select SQL Editor from the left menu.
+--  Copy code from this script and paste into the editor window.
+--  Click Run.
+--
+-- Full-precision vectors stay in the table. Only the ANN index is built on a
+-- compact copy of them, so it stays small enough to fit in RAM:
+--   halfvec   16-bit floats, half the index size, near-identical recall
+--   binary    1 bit per dimension, 1/32 of the index size, relies on re-ranking
+-- Call the match_* functions with quantization => 'halfvec' or 'binary'
+-- (the crawler and UI read VECTOR_QUANTIZATION). They fetch
+-- match_count * rerank_factor candidates through the compact index and
+-- re-rank them by exact cosine distance on the full vectors.
+--
+-- Example, switching the nomic-embed-text column of the docs table to binary:
+--   select enable_embedding_quantization('dev_docs_site_pages', 768, 'binary');
+
+-- Build a compact HNSW index for one embedding column and drop its
+-- full-precision index, which quantized searches no longer use
+create or replace function enable_embedding_quantization(table_name text, dims int, quantization text)
+returns void
+language plpgsql
+as $$
+declare
+  column_name text := embedding_column(dims);
+  index_name text := format('idx_%s_%s_%s', table_name, column_name, quantization);
+begin
+  if quantization = 'halfvec' then
+    execute format(
+      'create index if not exists %I on %I using hnsw ((%I::halfvec(%s)) halfvec_cosine_ops)',
+      index_name, table_name, column_name, dims
+    );
+  elsif quantization = 'binary' then
+    execute format(
+      'create index if not exists %I on %I using hnsw ((binary_quantize(%I)::bit(%s)) bit_hamming_ops)',
+      index_name, table_name, column_name, dims
+    );
+  else
+    raise exception 'Unknown quantization: %', quantization;
+  end if;
+
+  -- Names given by the *_table.sql scripts and by crawler.common.embedding_migration
+  execute format('drop index if exists %I', format('%s_%s_idx', table_name, column_name));
+  execute format('drop index if exists %I', format('idx_%s_%s', table_name, column_name));
+end;
+$$;
+
+-- Go back to a full-precision ivfflat index for one embedding column
+create or replace function disable_embedding_quantization(table_name text, dims int)
+returns void
+language plpgsql
+as $$
+declare
+  column_name text := embedding_column(dims);
+begin
+  execute format(
+    'create index if not exists %I on %I using ivfflat (%I vector_cosine_ops)',
+    format('idx_%s_%s', table_name, column_name), table_name, column_name
+  );
+  execute format('drop index if exists %I', format('idx_%s_%s_halfvec', table_name, column_name));
+  execute format('drop index if exists %I', format('idx_%s_%s_binary', table_name, column_name));
+end;
+$$;
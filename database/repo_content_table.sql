@@ -1,12 +1,15 @@
 -- Enable the pgvector extension
 create extension if not exists vector;
 
+-- Run embedding_dimensions.sql first: match functions use its embedding_column() helper
+
 -- Create the repo content table
 create table repo_content (
     id bigserial primary key,
     repo_url text not null,                                     -- Repository URL
     file_path text not null,                                    -- File path within repo
     branch text not null,                                       -- Repository branch
+    blob_sha text,                                              -- Git blob SHA of the file, for incremental sync
     content text not null,                                      -- File content
     title text not null,                                        -- Generated title
     summary text not null,                                      -- Generated summary
@@ -14,7 +17,8 @@ create table repo_content (
                                                                -- ↳ commit_hash: str
                                                                -- ↳ author: str
                                                                -- ↳ date: timestamp
-    embedding vector(1536) not null,                           -- Content embedding
+    embedding vector(1536),                                    -- Content embedding (1536-dim models)
+    embedding_768 vector(768),                                 -- Content embedding (768-dim models, e.g. nomic-embed-text)
     embedding_model varchar not null,                          -- Model used for embedding
     chunk_number integer not null,                             -- For chunked content
     document_creation_date timestamp with time zone,           -- Commit date
@@ -27,10 +31,16 @@ create table repo_content (
 
 -- Create an index for better vector similarity search performance
 create index on repo_content using ivfflat (embedding vector_cosine_ops);
+create index on repo_content using ivfflat (embedding_768 vector_cosine_ops);
 
 -- Create an index on metadata for faster filtering
 create index idx_repo_content_metadata on repo_content using gin (metadata);
 
+-- Existing tables: alter table repo_content add column if not exists blob_sha text;
+-- branch is CURRENT_SOURCE_BRANCH (default 'main'), not the default branch the files are read from,
+-- so rows from earlier syncs keep matching. After changing CURRENT_SOURCE_BRANCH, move existing rows with
+-- update repo_content set branch = '<new branch>' where repo_url = '<repo url>' and branch = '<old branch>';
+
 -- Create indexes for common queries
 create index idx_repo_content_repo on repo_content(repo_url);
 create index idx_repo_content_file_path on repo_content(file_path);
@@ -39,10 +49,14 @@ create index idx_repo_content_created on repo_content(created_at);
 create index idx_repo_content_crawl_date on repo_content(document_crawl_date);
 
 -- Create a function to search for repository content
+drop function if exists match_repo_content(vector, int, jsonb);
+drop function if exists match_repo_content(vector, int, jsonb, text, int);
 create function match_repo_content (
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default null,                          -- 'halfvec' or 'binary', see quantized_embeddings.sql
+  rerank_factor int default 4                              -- Candidates fetched per result when quantized
 ) returns table (
     id bigint,
     repo_url text,
@@ -60,27 +74,35 @@ create function match_repo_content (
 )
 language plpgsql
 as $$
-#variable_conflict use_column
 begin
-  return query
-  select
-    id,
-    repo_url,
-    file_path,
-    branch,
-    content,
-    title,
-    summary,
-    metadata,
-    chunk_number,
-    document_creation_date,
-    document_crawl_date,
-    created_at,
-    1 - (repo_content.embedding <=> query_embedding) as similarity
-  from repo_content
-  where metadata @> filter
-  order by repo_content.embedding <=> query_embedding
-  limit match_count;
+  -- Find candidates in the column that holds embeddings of the query's dimension,
+  -- through the quantized index if asked, then re-rank them on the full vectors
+  return query execute format(
+    'select
+        id,
+        repo_url,
+        file_path,
+        branch,
+        content,
+        title,
+        summary,
+        metadata,
+        chunk_number,
+        document_creation_date,
+        document_crawl_date,
+        created_at,
+        1 - (%1$I <=> $1) as similarity
+      from (
+        select * from repo_content
+        where metadata @> $2 and %1$I is not null
+        order by %2$s
+        limit $4
+      ) repo_content
+      order by %1$I <=> $1
+      limit $3',
+    embedding_column(vector_dims(query_embedding)),
+    embedding_search_distance(embedding_column(vector_dims(query_embedding)), vector_dims(query_embedding), quantization)
+  ) using query_embedding, filter, match_count, match_count * greatest(rerank_factor, 1);
 end;
 $$;
 
@@ -1,6 +1,8 @@
 -- Enable the pgvector extension
 create extension if not exists vector;
 
+-- Run embedding_dimensions.sql first: match functions use its embedding_column() helper
+
 -- Create the social comments table
 create table social_comments (
     id bigserial primary key,
@@ -15,7 +17,8 @@ create table social_comments (
                                                                -- ↳ likes: int
                                                                -- ↳ replies: int
                                                                -- ↳ mentions: string[]
-    embedding vector(1536) not null,                           -- Content embedding
+    embedding vector(1536),                                    -- Content embedding (1536-dim models)
+    embedding_768 vector(768),                                 -- Content embedding (768-dim models, e.g. nomic-embed-text)
     embedding_model varchar not null,                          -- Model used for embedding
     comment_timestamp timestamp with time zone not null,        -- Original comment time
     document_creation_date timestamp with time zone,           -- When comment was created
@@ -28,6 +31,7 @@ create table social_comments (
 
 -- Create an index for better vector similarity search performance
 create index on social_comments using ivfflat (embedding vector_cosine_ops);
+create index on social_comments using ivfflat (embedding_768 vector_cosine_ops);
 
 -- Create an index on metadata for faster filtering
 create index idx_social_comments_metadata on social_comments using gin (metadata);
@@ -42,10 +46,14 @@ create index idx_social_comments_created on social_comments(created_at);
 create index idx_social_comments_crawl_date on social_comments(document_crawl_date);
 
 -- Create a function to search for social comments
+drop function if exists match_social_comments(vector, int, jsonb);
+drop function if exists match_social_comments(vector, int, jsonb, text, int);
 create function match_social_comments (
-  query_embedding vector(1536),
+  query_embedding vector,
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  quantization text default null,                          -- 'halfvec' or 'binary', see quantized_embeddings.sql
+  rerank_factor int default 4                              -- Candidates fetched per result when quantized
 ) returns table (
     id bigint,
     comment_url text,
@@ -64,28 +72,36 @@ create function match_social_comments (
 )
 language plpgsql
 as $$
-#variable_conflict use_column
 begin
-  return query
-  select
-    id,
-    comment_url,
-    parent_url,
-    platform,
-    author_id,
-    author_handle,
-    content,
-    summary,
-    metadata,
-    comment_timestamp,
-    document_creation_date,
-    document_crawl_date,
-    created_at,
-    1 - (social_comments.embedding <=> query_embedding) as similarity
-  from social_comments
-  where metadata @> filter
-  order by social_comments.embedding <=> query_embedding
-  limit match_count;
+  -- Find candidates in the column that holds embeddings of the query's dimension,
+  -- through the quantized index if asked, then re-rank them on the full vectors
+  return query execute format(
+    'select
+        id,
+        comment_url,
+        parent_url,
+        platform,
+        author_id,
+        author_handle,
+        content,
+        summary,
+        metadata,
+        comment_timestamp,
+        document_creation_date,
+        document_crawl_date,
+        created_at,
+        1 - (%1$I <=> $1) as similarity
+      from (
+        select * from social_comments
+        where metadata @> $2 and %1$I is not null
+        order by %2$s
+        limit $4
+      ) social_comments
+      order by %1$I <=> $1
+      limit $3',
+    embedding_column(vector_dims(query_embedding)),
+    embedding_search_distance(embedding_column(vector_dims(query_embedding)), vector_dims(query_embedding), quantization)
+  ) using query_embedding, filter, match_count, match_count * greatest(rerank_factor, 1);
 end;
 $$;
 
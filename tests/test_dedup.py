@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from crawler.common.dedup import NearDuplicateIndex, simhash, hamming_distance, fingerprint_text
+
+def make_text(seed: int, words: int = 400) -> str:
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" for i in range(2000)]
+    return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+def change_words(text: str, count: int) -> str:
+    words = text.split()
+    for i in range(count):
+        words[i * 37 % len(words)] = f"changed{i}"
+    return " ".join(words)
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex("test", path=str(tmp_path / "fingerprints.sqlite"), max_distance=6, min_words=50)
+    yield index
+    index.close()
+
+def test_simhash_is_stable_and_ignores_case():
+    text = make_text(1)
+    assert simhash(text) == simhash(text.upper())
+    assert 0 <= simhash(text) < 1 << 64
+
+def test_similar_texts_are_close_and_unrelated_texts_far_apart():
+    text = make_text(1)
+    assert hamming_distance(simhash(text), simhash(change_words(text, 4))) <= 6
+    assert hamming_distance(simhash(text), simhash(make_text(2))) > 16
+
+def test_hamming_distance():
+    assert hamming_distance(0b1011, 0b0010) == 2
+    assert hamming_distance(1 << 63, 0) == 1
+
+def test_short_texts_get_no_fingerprint():
+    assert fingerprint_text("just a few words", min_words=50) is None
+    assert fingerprint_text(make_text(1), min_words=50) is not None
+
+def test_first_copy_is_canonical_and_later_ones_link_to_it(index):
+    text = make_text(1)
+    assert index.check("https://example.com/a", text) is None
+    assert index.check("https://example.com/b", change_words(text, 4)) == "https://example.com/a"
+    assert index.check("https://example.com/c", make_text(2)) is None
+    assert index.get_duplicates() == {"https://example.com/b": "https://example.com/a"}
+    assert index.get_stats() == {"unique": 2, "duplicates": 1, "too_short": 0}
+
+def test_recrawling_a_page_does_not_match_itself(index):
+    text = make_text(1)
+    assert index.check("https://example.com/a", text) is None
+    assert index.check("https://example.com/a", text) is None
+
+def test_fingerprints_with_the_top_bit_set_round_trip(index):
+    fingerprint = (1 << 63) | 0xFF
+    assert index.check_fingerprint("https://example.com/a", fingerprint) is None
+    assert index.check_fingerprint("https://example.com/b", fingerprint ^ 0b11) == "https://example.com/a"
+
+def test_short_pages_are_never_duplicates(index):
+    assert index.check("https://example.com/a", "Page not found") is None
+    assert index.check("https://example.com/b", "Page not found") is None
+    assert index.get_stats()["too_short"] == 2
+
+def test_sources_are_separate(tmp_path):
+    path = str(tmp_path / "fingerprints.sqlite")
+    first = NearDuplicateIndex("first", path=path, min_words=50)
+    second = NearDuplicateIndex("second", path=path, min_words=50)
+    text = make_text(1)
+    first.check("https://example.com/a", text)
+    assert second.check("https://example.org/a", text) is None
+    first.reset()
+    assert first.check("https://example.com/b", text) is None
+    first.close()
+    second.close()
@@ -0,0 +1,17 @@
+import pytest
+
+from crawler.common.embedding_columns import embedding_column, embedding_search_distance
+
+def test_embedding_column():
+    assert embedding_column(1536) == "embedding"
+    assert embedding_column(768) == "embedding_768"
+
+def test_embedding_search_distance():
+    assert embedding_search_distance("embedding_768", 768) == "(embedding_768 <=> $1::vector)"
+    assert embedding_search_distance("embedding_768", 768, "none") == "(embedding_768 <=> $1::vector)"
+    assert embedding_search_distance("embedding_768", 768, "halfvec") == \
+        "(embedding_768::halfvec(768) <=> $1::vector::halfvec(768))"
+    assert embedding_search_distance("embedding", 1536, "binary") == \
+        "(binary_quantize(embedding)::bit(1536) <~> binary_quantize($1::vector))"
+    with pytest.raises(ValueError):
+        embedding_search_distance("embedding", 1536, "pq")
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from crawler.common.frontier import CrawlFrontier, QUEUED, IN_FLIGHT, DONE, FAILED, run_frontier_workers
+
+@pytest.fixture
+def frontier_path(tmp_path):
+    return str(tmp_path / "frontier.sqlite")
+
+@pytest.fixture
+def frontier(frontier_path):
+    frontier = CrawlFrontier("test", path=frontier_path, max_attempts=2)
+    yield frontier
+    frontier.close()
+
+def test_add_ignores_known_urls(frontier):
+    assert frontier.add("https://example.com/a")
+    assert not frontier.add("https://example.com/a")
+    assert frontier.add_many(["https://example.com/a", "https://example.com/b"]) == 1
+
+def test_next_returns_shallowest_first_and_claims_it(frontier):
+    frontier.add("https://example.com/deep", depth=2)
+    frontier.add("https://example.com/shallow", depth=1)
+    assert frontier.next() == ("https://example.com/shallow", 1)
+    assert frontier.get_state("https://example.com/shallow") == IN_FLIGHT
+    assert frontier.next() == ("https://example.com/deep", 2)
+    assert frontier.next() is None
+
+def test_mark_done(frontier):
+    frontier.add("https://example.com/a")
+    frontier.next()
+    frontier.mark_done("https://example.com/a")
+    assert frontier.get_state("https://example.com/a") == DONE
+    assert not frontier.add("https://example.com/a")
+
+def test_failed_url_is_retried_until_out_of_attempts(frontier):
+    frontier.add("https://example.com/a")
+    frontier.next()
+    assert frontier.mark_failed("https://example.com/a", "timeout")
+    assert frontier.get_state("https://example.com/a") == QUEUED
+    frontier.next()
+    assert not frontier.mark_failed("https://example.com/a", "timeout again")
+    assert frontier.get_state("https://example.com/a") == FAILED
+    assert frontier.get_failed() == {"https://example.com/a": "timeout again"}
+
+def test_mark_failed_without_retry(frontier):
+    frontier.add("https://example.com/a")
+    frontier.next()
+    assert not frontier.mark_failed("https://example.com/a", "disallowed", retry=False)
+    assert frontier.get_state("https://example.com/a") == FAILED
+
+def test_retry_failed_requeues_with_fresh_attempts(frontier):
+    frontier.add("https://example.com/a")
+    frontier.next()
+    frontier.mark_failed("https://example.com/a", "gone", retry=False)
+    assert frontier.retry_failed() == 1
+    frontier.next()
+    assert frontier.mark_failed("https://example.com/a", "gone")
+
+def test_add_many_as_done_is_never_crawled(frontier):
+    frontier.add_many(["https://example.com/a"], state=DONE)
+    assert frontier.next() is None
+    assert not frontier.add("https://example.com/a")
+
+def test_in_flight_urls_are_queued_again_on_restart(frontier_path):
+    frontier = CrawlFrontier("test", path=frontier_path)
+    frontier.add_many(["https://example.com/a", "https://example.com/b"])
+    frontier.next()
+    frontier.close()
+
+    frontier = CrawlFrontier("test", path=frontier_path)
+    frontier.start(resume=True)
+    assert frontier.get_counts()[QUEUED] == 2
+    frontier.close()
+
+def test_finished_crawl_starts_over(frontier):
+    frontier.add("https://example.com/a")
+    frontier.next()
+    frontier.mark_done("https://example.com/a")
+    frontier.start(resume=True)
+    assert frontier.get_urls() == []
+
+def test_no_resume_starts_over(frontier):
+    frontier.add("https://example.com/a")
+    frontier.start(resume=False)
+    assert frontier.get_urls() == []
+
+def test_crawls_sharing_a_file_are_separate(frontier_path):
+    first = CrawlFrontier("first", path=frontier_path)
+    second = CrawlFrontier("second", path=frontier_path)
+    first.add("https://example.com/a")
+    assert second.add("https://example.com/a")
+    assert second.get_urls() == ["https://example.com/a"]
+    first.close()
+    second.close()
+
+def test_workers_crawl_links_found_while_others_wait(frontier):
+    links = {
+        "https://example.com/": ["https://example.com/a", "https://example.com/b"],
+        "https://example.com/a": ["https://example.com/c"]
+    }
+    crawled = []
+
+    async def crawl_page(url, depth):
+        # The start page is slow, so idle workers have to wait for its links
+        await asyncio.sleep(0.02 if depth == 0 else 0)
+        crawled.append((url, depth))
+        frontier.add_many(links.get(url, []), depth + 1)
+        frontier.mark_done(url)
+        return True
+
+    frontier.add("https://example.com/")
+    assert asyncio.run(run_frontier_workers(frontier, crawl_page, workers=3)) == 4
+    assert sorted(crawled) == [
+        ("https://example.com/", 0),
+        ("https://example.com/a", 1),
+        ("https://example.com/b", 1),
+        ("https://example.com/c", 2)
+    ]
+
+def test_workers_stop_at_max_pages_and_skip_failures(frontier):
+    frontier.add_many([f"https://example.com/{i}" for i in range(10)])
+
+    async def crawl_page(url, depth):
+        if url.endswith("/0"):
+            frontier.mark_failed(url, "boom", retry=False)
+            return False
+        frontier.mark_done(url)
+        return True
+
+    assert asyncio.run(run_frontier_workers(frontier, crawl_page, workers=2, max_pages=5, pages_done=2)) == 5
+    counts = frontier.get_counts()
+    assert counts[DONE] == 3
+    assert counts[FAILED] == 1
+    assert counts[QUEUED] == 6
@@ -0,0 +1,119 @@
+import io
+import time
+import asyncio
+import tarfile
+
+import httpx
+import pytest
+
+from crawler.common.github_client import GitHubClient, iter_archive_files
+
+@pytest.fixture
+def client(tmp_path):
+    client = GitHubClient(token="test", cache_path=str(tmp_path / "etags.sqlite"), reserve=10)
+    yield client
+    asyncio.run(client.close())
+
+def make_archive(files, directories=()) -> io.BytesIO:
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        for name in directories:
+            info = tarfile.TarInfo(f"owner-repo-abc123/{name}")
+            info.type = tarfile.DIRTYPE
+            tar.addfile(info)
+        for name, data in files.items():
+            info = tarfile.TarInfo(f"owner-repo-abc123/{name}")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    archive.seek(0)
+    return archive
+
+def test_iter_archive_files_yields_text_files_without_the_root_directory():
+    archive = make_archive({
+        "README.md": b"# Project",
+        "src/main.py": "print('héllo')".encode("utf-8"),
+        "logo.png": b"\x89PNG\r\n\x1a\n\0\0\0",
+        "latin1.txt": "café".encode("latin-1"),
+        "big.txt": b"x" * 200
+    }, directories=["src"])
+    assert list(iter_archive_files(archive, max_file_bytes=100)) == [
+        ("README.md", "# Project"),
+        ("src/main.py", "print('héllo')")
+    ]
+
+def test_walk_tree_lists_truncated_trees_level_by_level(client, monkeypatch):
+    trees = {
+        "https://api.github.com/repos/owner/repo/git/trees/main?recursive=1": {"truncated": True, "tree": []},
+        "https://api.github.com/repos/owner/repo/git/trees/main": {"truncated": False, "tree": [
+            {"path": "README.md", "type": "blob", "sha": "a"},
+            {"path": "src", "type": "tree", "sha": "src-tree"},
+            {"path": "vendor", "type": "commit", "sha": "submodule"}
+        ]},
+        "https://api.github.com/repos/owner/repo/git/trees/src-tree?recursive=1": {"truncated": False, "tree": [
+            {"path": "pkg", "type": "tree", "sha": "pkg-tree"},
+            {"path": "pkg/main.py", "type": "blob", "sha": "b"}
+        ]}
+    }
+    requested = []
+
+    async def get_json(url):
+        requested.append(url)
+        return trees[url]
+
+    monkeypatch.setattr(client, "get_json", get_json)
+    blobs = asyncio.run(client.walk_tree("owner", "repo", "main"))
+    assert [(blob["path"], blob["sha"]) for blob in blobs] == [("README.md", "a"), ("src/pkg/main.py", "b")]
+    assert requested == list(trees)
+
+def rate_limited(status_code: int, remaining: str, reset: str = "2000000000", **headers) -> httpx.Response:
+    return httpx.Response(status_code, headers={
+        "x-ratelimit-limit": "5000",
+        "x-ratelimit-remaining": remaining,
+        "x-ratelimit-reset": reset,
+        **headers
+    })
+
+def test_update_quota_keeps_requests_counted_since_an_older_response(client):
+    client._update_quota(rate_limited(200, "100"))
+    assert (client.limit, client.remaining, client.reset_at) == (5000, 100, 2000000000.0)
+    client.remaining -= 3  # Three requests started
+    client._update_quota(rate_limited(200, "99"))
+    assert client.remaining == 97
+
+def test_update_quota_takes_the_header_in_a_new_window(client):
+    client._update_quota(rate_limited(200, "10"))
+    client._update_quota(rate_limited(200, "4999", reset="2000003600"))
+    assert (client.remaining, client.reset_at) == (4999, 2000003600.0)
+
+def test_update_quota_ignores_responses_without_or_with_bad_headers(client):
+    client._update_quota(httpx.Response(200))
+    client._update_quota(rate_limited(200, "soon"))
+    assert client.remaining is None
+
+def test_get_retry_wait(client, monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: 1000.0)
+    client.reset_at = 1100.0
+    assert client._get_retry_wait(httpx.Response(200)) is None
+    assert client._get_retry_wait(httpx.Response(403, headers={"retry-after": "30"})) == 30.0
+    assert client._get_retry_wait(rate_limited(403, "0")) == 101.0
+    assert client._get_retry_wait(httpx.Response(429)) == 60.0
+    # A plain permission error is not a rate limit
+    assert client._get_retry_wait(httpx.Response(403)) is None
+
+def test_not_modified_responses_use_no_quota(client):
+    def respond(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return rate_limited(304, "99")
+        return httpx.Response(200, content=b'{"name": "repo"}', headers={
+            "etag": '"v1"', "x-ratelimit-limit": "5000", "x-ratelimit-remaining": "99", "x-ratelimit-reset": "2000000000"
+        })
+
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(respond))
+    url = "https://api.github.com/repos/owner/repo"
+
+    async def fetch_twice():
+        return await client.get_json(url), await client.get_json(url)
+
+    assert asyncio.run(fetch_twice()) == ({"name": "repo"}, {"name": "repo"})
+    assert client.remaining == 99
+    assert client.get_stats()["not_modified"] == 1
@@ -0,0 +1,65 @@
+import lxml.html
+import pytest
+
+from crawler.common import html_parsing
+from crawler.common.html_parsing import convert_html, find_js_shell_reason, parse_html, transform_page
+
+ARTICLE = "<p>" + "Plenty of server-rendered documentation text. " * 10 + "</p>"
+
+def shell_reason(html: str, min_text_length: int = 100):
+    return find_js_shell_reason(lxml.html.document_fromstring(html), min_text_length)
+
+@pytest.mark.parametrize("html, reason", [
+    ('<html><body><noscript>Please enable JavaScript to view this site.</noscript></body></html>', "noscript warning"),
+    ('<html><body><main></main><footer>' + ARTICLE + '</footer></body></html>', "empty main"),
+    ('<html><body><div role="main"> </div></body></html>', "empty main"),
+    ('<html><body><div id="__next"></div><p>' + ARTICLE + '</p></body></html>', "empty #__next"),
+    ('<html><body><p>Short page</p></body></html>', "only 10 characters of text"),
+    ('<html><body><main>' + ARTICLE + '</main></body></html>', None),
+])
+def test_find_js_shell_reason(html, reason):
+    assert shell_reason(html) == reason
+
+def test_parse_html_canonicalizes_and_dedupes_links():
+    html = """<html><head><title> Guide </title></head><body>
+        <a href="/docs/api?utm_source=x">API</a>
+        <a href="api#section">API again</a>
+        <a href="#top">Top</a>
+        <a href="mailto:docs@example.com">Mail</a>
+        <a href="https://Other.example.org/">Other</a>
+    </body></html>"""
+    page = parse_html(html, "https://example.com/docs/")
+    assert page.title == "Guide"
+    assert page.links == ["https://example.com/docs/api", "https://other.example.org/"]
+
+def test_parse_html_uses_links_already_extracted():
+    page = parse_html("", "https://example.com/docs/", links=["../blog/", "#top"])
+    assert page.links == ["https://example.com/blog/"]
+
+def test_convert_html_reports_shells_without_converting():
+    reason, page = convert_html('<html><body><div id="root"></div></body></html>', "https://example.com/", 100)
+    assert reason == "empty #root"
+    assert page.markdown == "" and page.links == []
+
+def test_convert_html_reads_everything_from_one_parse(monkeypatch):
+    converted = []
+    monkeypatch.setattr(html_parsing, "html_to_markdown", lambda html, url: converted.append(html) or "markdown")
+    html = ('<html><head><title>Docs</title><script>track()</script></head><body>'
+            '<noscript>Tracking pixel</noscript><a href="/next">Next</a>' + ARTICLE + '</body></html>')
+    reason, page = convert_html(html, "https://example.com/docs/", 100)
+    assert reason is None
+    assert page.title == "Docs"
+    assert page.links == ["https://example.com/next"]
+    assert page.markdown == "markdown"
+    assert "track()" not in converted[0] and "Tracking pixel" not in converted[0]
+
+def test_transform_page_chunks_markdown_with_iter_chunks(monkeypatch):
+    monkeypatch.setenv("CHUNK_MAX_TOKENS", "50")
+    markdown = "# Install\n\n```bash\npip install package\n```\n\n" + "\n\n".join(
+        f"Paragraph {i} " + "with some words " * 5 for i in range(10)
+    )
+    page = transform_page("", "https://example.com/", markdown, [], min_words=5)
+    assert len(page.chunks) > 1
+    assert page.chunks[0].startswith("# Install\n\n```bash\npip install package\n```")
+    assert all(len(chunk) <= 200 for chunk in page.chunks)
+    assert page.fingerprint is not None
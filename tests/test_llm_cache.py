@@ -0,0 +1,23 @@
+from crawler.common.llm_cache import LLMCache
+
+def test_set_many_is_read_back_from_disk(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite")
+    cache = LLMCache(path=path)
+    cache.set_many("embedding", "model/768", [("first", [0.1, 0.2]), ("second", [0.3, 0.4])])
+    cache.set("title_summary", "llm", "first", {"title": "First", "summary": "The first text"})
+    cache.close()
+
+    cache = LLMCache(path=path)
+    assert cache.get("embedding", "model/768", "second") == [0.3, 0.4]
+    assert cache.get("embedding", "other/768", "second") is None
+    assert cache.get("title_summary", "llm", "first") == {"title": "First", "summary": "The first text"}
+    assert cache.get_stats()["embedding"] == {"memory_hits": 0, "disk_hits": 1, "misses": 1, "hit_rate": 0.5}
+    cache.close()
+
+def test_memory_is_bounded(tmp_path):
+    cache = LLMCache(path=str(tmp_path / "llm_cache.sqlite"), max_memory_entries=2)
+    cache.set_many("embedding", "model", [(str(i), [i]) for i in range(5)])
+    assert len(cache.memory) == 2
+    assert cache.get("embedding", "model", "0") == [0]
+    assert cache.get_stats()["embedding"]["disk_hits"] == 1
+    cache.close()
@@ -0,0 +1,86 @@
+import asyncio
+
+from crawler.common.llm_scheduler import LLMScheduler
+
+def test_concurrency_is_capped():
+    scheduler = LLMScheduler(max_concurrent=2)
+    active = 0
+    peak = 0
+
+    async def request():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    async def main():
+        await asyncio.gather(*[scheduler.run("embedding", request) for _ in range(10)])
+
+    asyncio.run(main())
+    assert peak == 2
+    assert scheduler.get_queue_depth()["active"] == 0
+    assert scheduler.get_queue_depth()["completed_by_kind"] == {"embedding": 10}
+
+def test_waiting_requests_start_by_priority_then_arrival():
+    scheduler = LLMScheduler(max_concurrent=1)
+    started = []
+
+    async def request(name):
+        started.append(name)
+        await asyncio.sleep(0.01)
+
+    async def main():
+        first = asyncio.create_task(scheduler.run("completion", request, "blocker"))
+        await asyncio.sleep(0)
+        tasks = [
+            asyncio.create_task(scheduler.run(kind, request, name))
+            for kind, name in [
+                ("completion", "completion"),
+                ("title_summary", "title 1"),
+                ("embedding", "embedding"),
+                ("title_summary", "title 2"),
+                ("unknown", "unknown")
+            ]
+        ]
+        await asyncio.sleep(0)
+        assert scheduler.get_queue_depth()["waiting_by_kind"] == {
+            "completion": 1, "title_summary": 2, "embedding": 1, "unknown": 1
+        }
+        await asyncio.gather(first, *tasks)
+
+    asyncio.run(main())
+    assert started == ["blocker", "embedding", "title 1", "title 2", "completion", "unknown"]
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    scheduler = LLMScheduler(max_concurrent=1)
+
+    async def main():
+        release = asyncio.Event()
+        blocker = asyncio.create_task(scheduler.run("embedding", release.wait))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.run("embedding", asyncio.sleep, 0))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        release.set()
+        await blocker
+        await asyncio.gather(waiter, return_exceptions=True)
+        # The slot is free again
+        await asyncio.wait_for(scheduler.run("embedding", asyncio.sleep, 0), timeout=1)
+
+    asyncio.run(main())
+    assert scheduler.get_queue_depth()["active"] == 0
+
+def test_failed_request_releases_its_slot():
+    scheduler = LLMScheduler(max_concurrent=1)
+
+    async def fail():
+        raise RuntimeError("Ollama is down")
+
+    async def main():
+        results = await asyncio.gather(scheduler.run("embedding", fail), scheduler.run("embedding", asyncio.sleep, 0),
+                                       return_exceptions=True)
+        assert isinstance(results[0], RuntimeError)
+
+    asyncio.run(main())
+    assert scheduler.get_queue_depth()["active"] == 0
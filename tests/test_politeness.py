@@ -0,0 +1,62 @@
+import asyncio
+from urllib.robotparser import RobotFileParser
+
+from crawler.common.politeness import RobotsCache, PolitenessScheduler
+
+def test_fractional_crawl_delay_is_rounded_up():
+    lines = RobotsCache._round_crawl_delays([
+        "User-agent: *",
+        "Crawl-delay: 0.5",
+        "crawl-delay : 2.1 # be gentle",
+        "Disallow: /private"
+    ])
+    assert lines == ["User-agent: *", "Crawl-delay: 1", "Crawl-delay: 3", "Disallow: /private"]
+
+    parser = RobotFileParser()
+    parser.parse(lines)
+    assert parser.crawl_delay("*") == 3
+
+def test_invalid_crawl_delay_is_left_alone():
+    assert RobotsCache._round_crawl_delays(["Crawl-delay: soon"]) == ["Crawl-delay: soon"]
+
+def make_scheduler(url: str, **kwargs) -> PolitenessScheduler:
+    scheduler = PolitenessScheduler(respect_robots=False, **kwargs)
+    asyncio.run(scheduler._get_host_state(url))
+    return scheduler
+
+def test_throttling_doubles_the_delay_up_to_the_maximum():
+    url = "https://example.com/page"
+    scheduler = make_scheduler(url, delay=2.0, max_delay=5.0)
+    scheduler.report(url, 429)
+    assert scheduler.hosts["https://example.com"].delay == 4.0
+    scheduler.report(url, 503)
+    assert scheduler.hosts["https://example.com"].delay == 5.0
+    assert scheduler.get_stats()["https://example.com"]["throttled"] == 2
+
+def test_retry_after_holds_the_host():
+    url = "https://example.com/page"
+    scheduler = make_scheduler(url, delay=0.5, max_delay=60.0)
+    scheduler.report(url, 429, {"Retry-After": "30"})
+    state = scheduler.hosts["https://example.com"]
+    assert state.delay == 30.0
+    assert state.next_request_at > 0
+
+def test_success_eases_back_to_the_base_delay():
+    url = "https://example.com/page"
+    scheduler = make_scheduler(url, delay=1.0)
+    state = scheduler.hosts["https://example.com"]
+    state.delay = 1.5
+    scheduler.report(url, 200)
+    assert state.delay == 1.35
+    for _ in range(10):
+        scheduler.report(url, 200)
+    assert state.delay == 1.0
+
+def test_client_errors_and_unknown_hosts_are_ignored():
+    url = "https://example.com/page"
+    scheduler = make_scheduler(url, delay=1.0)
+    scheduler.report(url, 404)
+    scheduler.report("https://other.example.com/", 429)
+    scheduler.report(url, None)
+    assert scheduler.hosts["https://example.com"].delay == 1.0
+    assert list(scheduler.hosts) == ["https://example.com"]
@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+from crawler.common.sitemap import parse_lastmod
+
+def test_full_datetime_is_converted_to_utc():
+    assert parse_lastmod("2024-03-05T10:30:00+02:00") == datetime(2024, 3, 5, 8, 30, tzinfo=timezone.utc)
+
+def test_z_suffix_means_utc():
+    assert parse_lastmod("2024-03-05T10:30:00Z") == datetime(2024, 3, 5, 10, 30, tzinfo=timezone.utc)
+
+def test_bare_date_means_end_of_day():
+    assert parse_lastmod("2024-03-05") == datetime(2024, 3, 6, tzinfo=timezone.utc)
+
+def test_time_without_zone_is_utc():
+    assert parse_lastmod("2024-03-05T10:30:00") == datetime(2024, 3, 5, 10, 30, tzinfo=timezone.utc)
+
+def test_database_timestamps_parse():
+    assert parse_lastmod("2024-03-05T10:30:00.123456+00:00") == datetime(2024, 3, 5, 10, 30, 0, 123456, tzinfo=timezone.utc)
+
+def test_missing_or_invalid_values_are_none():
+    assert parse_lastmod(None) is None
+    assert parse_lastmod("") is None
+    assert parse_lastmod("last tuesday") is None
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from crawler.common.storage_writer import StorageWriter
+from crawler.common.text_processing import ProcessedChunk
+
+def make_chunk(url: str, chunk_number: int) -> ProcessedChunk:
+    return ProcessedChunk(
+        content=f"{url} #{chunk_number}",
+        title="title",
+        summary="summary",
+        embedding=[0.1],
+        metadata={},
+        url=url,
+        chunk_number=chunk_number,
+        embedding_model="test"
+    )
+
+class FakeStore:
+    """Stands in for store_chunks, failing batches with a URL's chunks fail_times[url] times."""
+
+    def __init__(self, fail_times=None):
+        self.fail_times = dict(fail_times or {})
+        self.batches = []
+        self.calls = 0
+
+    async def __call__(self, chunks):
+        self.calls += 1
+        for url in {chunk.url for chunk in chunks}:
+            if self.fail_times.get(url, 0) > 0:
+                self.fail_times[url] -= 1
+                return False
+        self.batches.append([(chunk.url, chunk.chunk_number) for chunk in chunks])
+        return True
+
+def make_writer(store, **kwargs) -> StorageWriter:
+    options = dict(flush_size=2, flush_interval=0.01, max_retries=2, retry_delay=0.001, store=store)
+    options.update(kwargs)
+    return StorageWriter(**options)
+
+def test_close_flushes_everything_in_batches():
+    store = FakeStore()
+
+    async def main():
+        async with make_writer(store, flush_interval=10) as writer:
+            await writer.put([make_chunk("a", i) for i in range(5)])
+        return writer
+
+    writer = asyncio.run(main())
+    assert [len(batch) for batch in store.batches] == [2, 2, 1]
+    assert writer.get_stats() == {"stored": 5, "failed": 0, "pending": 0}
+
+def test_failed_batch_is_retried():
+    store = FakeStore(fail_times={"a": 1})
+
+    async def main():
+        async with make_writer(store) as writer:
+            await writer.put([make_chunk("a", 0)])
+        return writer
+
+    writer = asyncio.run(main())
+    assert store.calls == 2
+    assert writer.stored == 1
+    assert writer.failed_chunks == []
+
+def test_batch_is_given_up_on_after_max_retries():
+    store = FakeStore(fail_times={"a": 5})
+
+    async def main():
+        async with make_writer(store, max_retries=3) as writer:
+            await writer.put([make_chunk("a", 0)])
+        return writer
+
+    writer = asyncio.run(main())
+    assert store.calls == 3
+    assert writer.stored == 0
+    assert [chunk.url for chunk in writer.failed_chunks] == ["a"]
+
+def test_on_stored_waits_for_every_chunk_of_the_put():
+    store = FakeStore()
+    events = []
+
+    async def main():
+        async with make_writer(store, flush_interval=10) as writer:
+            async def remember():
+                events.append(("stored", len(store.batches)))
+            await writer.put([make_chunk("a", i) for i in range(3)], on_stored=remember)
+            # The first full batch leaves one chunk of the put unstored
+            await asyncio.sleep(0.01)
+            events.append(("after first batch", len(store.batches)))
+
+    asyncio.run(main())
+    assert events == [("after first batch", 1), ("stored", 2)]
+
+def test_on_stored_is_skipped_when_part_of_the_put_fails():
+    # Both attempts at b's first batch fail, its second batch is stored
+    store = FakeStore(fail_times={"b": 2})
+    stored = []
+
+    async def main():
+        async with make_writer(store, flush_size=1) as writer:
+            async def remember_a():
+                stored.append("a")
+            async def remember_b():
+                stored.append("b")
+            await writer.put([make_chunk("a", 0), make_chunk("a", 1)], on_stored=remember_a)
+            await writer.put([make_chunk("b", 0), make_chunk("b", 1)], on_stored=remember_b)
+        return writer
+
+    writer = asyncio.run(main())
+    assert stored == ["a"]
+    assert writer.stored == 3
+    assert [(chunk.url, chunk.chunk_number) for chunk in writer.failed_chunks] == [("b", 0)]
+
+def test_on_stored_runs_right_away_without_chunks():
+    stored = []
+
+    async def main():
+        async with make_writer(FakeStore()) as writer:
+            async def remember():
+                stored.append(True)
+            await writer.put([], on_stored=remember)
+            assert stored == [True]
+
+    asyncio.run(main())
+
+def test_put_after_close_raises():
+    async def main():
+        writer = make_writer(FakeStore())
+        with pytest.raises(RuntimeError):
+            await writer.put([make_chunk("a", 0)])
+        await writer.start()
+        await writer.close()
+        with pytest.raises(RuntimeError):
+            await writer.put([make_chunk("a", 0)])
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+from crawler.common.text_processing import CHARS_PER_TOKEN, iter_chunks, split_chunks
+
+def paragraphs(count: int, words: int = 40) -> str:
+    return "\n\n".join(" ".join(f"word{p}_{w}" for w in range(words)) + "." for p in range(count))
+
+def test_short_text_is_one_chunk():
+    text = "# Title\n\nOne paragraph.\n\nAnother paragraph."
+    assert list(iter_chunks(text, max_tokens=100, overlap_tokens=0)) == [text]
+
+def test_chunks_stay_within_budget():
+    max_tokens = 50
+    chunks = list(iter_chunks(paragraphs(20), max_tokens=max_tokens, overlap_tokens=0))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= max_tokens * CHARS_PER_TOKEN for chunk in chunks)
+
+def test_chunks_cover_every_paragraph_once_without_overlap():
+    text = paragraphs(20, 10)
+    chunks = list(iter_chunks(text, max_tokens=80, overlap_tokens=0))
+    assert "\n\n".join(chunks) == text
+
+def test_code_block_is_not_split_when_it_fits():
+    code = "```python\n" + "\n".join(f"x{i} = {i}" for i in range(20)) + "\n```"
+    text = f"{paragraphs(3)}\n\n{code}\n\n{paragraphs(3)}"
+    chunks = list(iter_chunks(text, max_tokens=100, overlap_tokens=0))
+    assert any(code in chunk for chunk in chunks)
+
+def test_oversized_code_block_keeps_its_fences():
+    code = "```python\n" + "\n".join(f"value_{i} = {i} * {i}" for i in range(100)) + "\n```"
+    chunks = list(iter_chunks(code, max_tokens=50, overlap_tokens=0))
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith("```python\n")
+        assert chunk.endswith("\n```")
+
+def test_oversized_table_repeats_its_header():
+    header = "| name | value |\n| --- | --- |"
+    rows = "\n".join(f"| row{i} | {i} |" for i in range(100))
+    chunks = list(iter_chunks(f"{header}\n{rows}", max_tokens=40, overlap_tokens=0))
+    assert len(chunks) > 1
+    assert all(chunk.startswith(header + "\n") for chunk in chunks)
+
+def test_heading_is_not_left_at_the_end_of_a_chunk():
+    text = "\n\n".join(f"## Section {i}\n\n{paragraphs(1, 30)}" for i in range(6))
+    for chunk in iter_chunks(text, max_tokens=100, overlap_tokens=0):
+        assert not chunk.splitlines()[-1].startswith("#")
+
+def test_overlap_repeats_the_end_of_the_previous_chunk():
+    text = paragraphs(20, 5)
+    chunks = list(iter_chunks(text, max_tokens=60, overlap_tokens=30))
+    assert len(chunks) > 1
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.split("\n\n")[0] in previous
+
+def test_split_chunks_matches_iter_chunks():
+    text = paragraphs(30)
+    assert split_chunks(text) == list(iter_chunks(text))
@@ -0,0 +1,65 @@
+import pytest
+
+from crawler.common.urls import (
+    BloomFilter, VisitedSet, canonicalize_url, extract_canonical_link, get_canonical_url, is_url_in_scope
+)
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/docs/", "https://example.com/docs/"),
+    ("http://example.com:8080", "http://example.com:8080/"),
+    ("https://example.com/docs/#install", "https://example.com/docs/"),
+    ("https://example.com/a/./b/../c/", "https://example.com/a/c/"),
+    ("https://example.com//a//b", "https://example.com/a/b"),
+    ("https://example.com/?b=2&utm_source=x&a=1&fbclid=y", "https://example.com/?a=1&b=2"),
+    ("https://example.com/search?q=", "https://example.com/search?q="),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+def test_canonicalize_url_resolves_relative_links():
+    assert canonicalize_url("../api", "https://example.com/docs/guide/") == "https://example.com/docs/api"
+
+def test_extra_tracking_params_from_env(monkeypatch):
+    monkeypatch.setenv("URL_TRACKING_PARAMS", "Session, ref")
+    assert canonicalize_url("https://example.com/?session=1&ref=x&page=2") == "https://example.com/?page=2"
+
+def test_declared_canonical_on_the_same_host_wins():
+    html = '<html><head><link href="/docs/" rel="canonical"></head><body></body></html>'
+    assert extract_canonical_link(html, "https://example.com/docs/index.html") == "https://example.com/docs/"
+    assert get_canonical_url("https://example.com/old", "https://example.com/docs/index.html", html) == "https://example.com/docs/"
+
+def test_canonical_on_another_host_is_ignored():
+    html = '<head><link rel="canonical" href="https://mirror.example.org/docs/"></head>'
+    assert get_canonical_url("https://example.com/docs", "https://example.com/docs/", html) == "https://example.com/docs/"
+
+@pytest.mark.parametrize("url, in_scope", [
+    ("https://example.com/docs", True),
+    ("http://EXAMPLE.com/docs/api", True),
+    ("https://example.com/docs-old/", False),
+    ("https://other.com/docs/", False),
+    ("mailto:docs@example.com", False),
+])
+def test_is_url_in_scope(url, in_scope):
+    assert is_url_in_scope(url, "https://example.com/docs/") is in_scope
+
+def test_bloom_filter_never_misses_added_items():
+    bloom = BloomFilter(1000, 0.01)
+    items = [f"https://example.com/page/{i}" for i in range(1000)]
+    assert all(bloom.add(item) for item in items)
+    assert all(item in bloom for item in items)
+    assert not bloom.add(items[0])
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"https://example.com/page/{i}")
+    false_positives = sum(f"https://example.com/other/{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+def test_visited_set_compares_canonical_urls():
+    visited = VisitedSet(expected_urls=100)
+    assert visited.add("https://example.com/docs/?utm_source=x")
+    assert not visited.add("HTTPS://example.com/docs/#top")
+    assert "https://example.com:443/docs/" in visited
+    assert "https://example.com/api/" not in visited
+    assert len(visited) == 1
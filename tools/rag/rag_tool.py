@@ -121,14 +121,18 @@ class RAGTool(BaseTool):
                 try:
                     query_embedding = await self.get_embedding(query)
                     
-                    result = self.supabase.rpc(
-                        mapping["match_function"],
-                        {
-                            'query_embedding': query_embedding,
-                            'match_count': limit,
-                            'filter': {}
-                        }
-                    ).execute()
+                    params = {
+                        'query_embedding': query_embedding,
+                        'match_count': limit,
+                        'filter': {}
+                    }
+                    
+                    # Search through the quantized index and re-rank if configured
+                    if os.getenv("VECTOR_QUANTIZATION"):
+                        params['quantization'] = os.getenv("VECTOR_QUANTIZATION")
+                        params['rerank_factor'] = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+                    
+                    result = self.supabase.rpc(mapping["match_function"], params).execute()
                     
                     if result.data:
                         for doc in result.data:
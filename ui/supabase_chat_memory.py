@@ -6,6 +6,8 @@ import json
 import httpx
 from dotenv import load_dotenv
 
+from crawler.common.embedding_columns import embedding_column
+
 # Load environment variables
 load_dotenv(override=True)
 
@@ -15,32 +17,25 @@ supabase: Client = create_client(
     os.getenv("SUPABASE_SERVICE_KEY")
 )
 
+EMBEDDING_MODEL = "nomic-embed-text"
+EMBEDDING_DIMENSION = 768
+
 async def get_embedding(text: str) -> List[float]:
     """
     Get embedding vector from Ollama using nomic-embed-text.
-    Pads the 768-dimensional vector to 1536 dimensions by repeating and adding zeros.
+    Returns the model's native 768-dimensional vector.
     """
     try:
         async with httpx.AsyncClient() as client:
             response = await client.post(
                 "http://localhost:11434/api/embeddings",
-                json={"model": "nomic-embed-text", "prompt": text}
+                json={"model": EMBEDDING_MODEL, "prompt": text}
             )
-            embedding = response.json()["embedding"]
-            
-            # Pad to 1536 dimensions
-            if len(embedding) == 768:
-                # First repeat the vector
-                padded = embedding * 2
-                # If we need more dimensions, pad with zeros
-                if len(padded) < 1536:
-                    padded.extend([0.0] * (1536 - len(padded)))
-                return padded
-            return embedding
+            return response.json()["embedding"]
             
     except Exception as e:
         print(f"Error getting embedding: {e}")
-        return [0.0] * 1536  # Return zero vector on error
+        return [0.0] * EMBEDDING_DIMENSION  # Return zero vector on error
 
 async def add_message(user_id: str, conversation_id: str, role: str, content: str, parent_message_id: str = None, metadata: Dict[str, Any] = None):
     """
@@ -69,8 +64,8 @@ async def add_message(user_id: str, conversation_id: str, role: str, content: st
                 **(metadata or {}),
                 "user_id": user_id  # Also add to metadata for filtering
             },
-            "embedding": embedding,
-            "embedding_model": "nomic-embed-text",
+            embedding_column(len(embedding)): embedding,
+            "embedding_model": EMBEDDING_MODEL,
             "created_at": datetime.utcnow().isoformat()
         }
         
@@ -132,17 +127,21 @@ async def get_relevant_messages(user_id: str, conversation_id: str, query: str,
         query_embedding = await get_embedding(query)
         
         # Use Supabase's vector similarity search with user filtering
-        result = supabase.rpc(
-            'match_messages',
-            {
-                'query_embedding': query_embedding,
-                'match_count': top_k,
-                'filter': {
-                    'conversation_id': conversation_id,
-                    'user_id': user_id  # Only match messages for this user
-                }
+        params = {
+            'query_embedding': query_embedding,
+            'match_count': top_k,
+            'filter': {
+                'conversation_id': conversation_id,
+                'user_id': user_id  # Only match messages for this user
             }
-        ).execute()
+        }
+        
+        # Search through the quantized index and re-rank if configured
+        if os.getenv("VECTOR_QUANTIZATION"):
+            params['quantization'] = os.getenv("VECTOR_QUANTIZATION")
+            params['rerank_factor'] = int(os.getenv("VECTOR_RERANK_FACTOR", "4"))
+        
+        result = supabase.rpc('match_messages', params).execute()
         
         return result.data if result.data else []
         